@@ -0,0 +1,140 @@
+"""
+Reportes sobre el registro de respuestas (ver events.py).
+
+Todo se calcula por columnas: los qid se convierten una sola vez en códigos
+enteros (pd.factorize) y las métricas por pregunta salen de agregaciones
+agrupadas de pandas o de np.bincount, sin recorrer eventos en Python. Un
+reporte sobre millones de eventos tarda segundos.
+
+    python analytics.py report                  # precisión y latencia por pregunta
+    python analytics.py report --out reporte.csv
+    python analytics.py histogram --bins 5      # distribución de latencias (segundos)
+    python analytics.py compact                 # une las partes de data/events
+"""
+import argparse
+import os
+import sys
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+import events
+import questions
+
+
+def load_events(events_dir: str) -> pd.DataFrame:
+    """
+    Eventos como DataFrame. qid y session quedan como Categorical: los bytes
+    se decodifican una vez por valor distinto, no por evento.
+    """
+    cols = events.read_parts(events_dir)
+    data: Dict[str, object] = {}
+    for name, values in cols.items():
+        if values.dtype.kind == "S":
+            codes, uniques = pd.factorize(values)
+            data[name] = pd.Categorical.from_codes(codes, [u.decode("ascii", "replace") for u in uniques])
+        else:
+            data[name] = values
+    data["ts"] = (cols["ts"] * 1000).astype("int64").astype("datetime64[ms]")
+    return pd.DataFrame(data)
+
+
+def question_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Una fila por pregunta: respuestas, precisión, tasa de tiempo agotado,
+    tasa de bonus, puntos promedio y latencia (media, p50, p90, en segundos).
+    """
+    if df.empty:
+        return pd.DataFrame(columns=[
+            "answers", "accuracy", "timeout_rate", "bonus_rate", "avg_points",
+            "latency_mean", "latency_p50", "latency_p90",
+        ])
+    work = pd.DataFrame({
+        "qid": df["qid"],
+        "correct": df["correct"].to_numpy(dtype=np.float64),
+        "timeout": (df["selected"].to_numpy() < 0).astype(np.float64),
+        "bonus": (df["bonus"].to_numpy() > 0).astype(np.float64),
+        "points": df["points"].to_numpy(dtype=np.float64),
+        "latency": df["elapsed_ms"].to_numpy(dtype=np.float64) / 1000.0,
+    })
+    g = work.groupby("qid", observed=True, sort=False)
+    out = pd.DataFrame({
+        "answers": g.size(),
+        "accuracy": g["correct"].mean(),
+        "timeout_rate": g["timeout"].mean(),
+        "bonus_rate": g["bonus"].mean(),
+        "avg_points": g["points"].mean(),
+        "latency_mean": g["latency"].mean(),
+    })
+    q = g["latency"].quantile([0.5, 0.9]).unstack()
+    out["latency_p50"] = q[0.5]
+    out["latency_p90"] = q[0.9]
+    return out.sort_values(["accuracy", "answers"], ascending=[True, False])
+
+
+def latency_histogram(df: pd.DataFrame, bins: int = 6, time_limit_s: int | None = None) -> pd.DataFrame:
+    """
+    Conteos de respuestas por pregunta y tramo de latencia (tramos iguales de
+    0 al límite de tiempo). Una sola pasada con np.bincount sobre
+    código_de_pregunta * bins + tramo.
+    """
+    qid = df["qid"].astype("category")
+    limit = float(time_limit_s or (int(df["time_limit_s"].max()) if len(df) else 1))
+    edges = np.linspace(0.0, limit, bins + 1)
+    latency = df["elapsed_ms"].to_numpy(dtype=np.float64) / 1000.0
+    slot = np.clip(np.searchsorted(edges, latency, side="right") - 1, 0, bins - 1)
+    codes = qid.cat.codes.to_numpy(dtype=np.int64)
+    n_q = len(qid.cat.categories)
+    counts = np.bincount(codes * bins + slot, minlength=n_q * bins).reshape(n_q, bins)
+    labels = [f"{edges[i]:.0f}-{edges[i + 1]:.0f}s" for i in range(bins)]
+    return pd.DataFrame(counts, index=pd.Index(qid.cat.categories, name="qid"), columns=labels)
+
+
+def with_questions(stats: pd.DataFrame, bank) -> pd.DataFrame:
+    """Agrega el texto de la pregunta al reporte (bank: questions.QuestionBank)."""
+    text = {q.qid: q.question for q in bank.questions}
+    return stats.assign(question=[text.get(qid, "") for qid in stats.index])
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(prog="analytics.py", description="Reportes del registro de respuestas")
+    parser.add_argument("--dir", default=os.path.join(here, "data", "events"))
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("report", help="precisión y latencia por pregunta")
+    rp.add_argument("--out", default=None, help="CSV de salida (por defecto, a la consola)")
+    rp.add_argument("--csv", default=os.path.join(here, "data", "preguntas.csv"),
+                    help="banco para mostrar el texto de cada pregunta")
+    hp = sub.add_parser("histogram", help="distribución de latencias por pregunta")
+    hp.add_argument("--bins", type=int, default=6)
+    hp.add_argument("--out", default=None)
+    sub.add_parser("compact", help="une las partes en un solo archivo")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "compact":
+        parts, n = events.compact(args.dir)
+        print(f"{args.dir}: {parts} partes unidas ({n} eventos)")
+        return 0
+
+    df = load_events(args.dir)
+    if df.empty:
+        print(f"{args.dir}: no hay eventos", file=sys.stderr)
+        return 1
+    if args.cmd == "report":
+        result = question_stats(df)
+        if args.csv and os.path.exists(args.csv):
+            result = with_questions(result, questions.load_bank_auto(args.csv))
+    else:
+        result = latency_histogram(df, args.bins)
+    if args.out:
+        result.to_csv(args.out)
+        print(f"{args.out}: {len(result)} preguntas, {len(df)} eventos")
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", 160):
+            print(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
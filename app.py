@@ -1,341 +1,658 @@
+import time
+
+_IMPORTS_STARTED = time.perf_counter()
+
 import base64
+import functools
+import hashlib
 import importlib
+import json
 import os
 import re
-import unicodedata
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, wait as futures_wait
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Callable, Iterator, List, Dict, Any
 
-import pandas as pd
-import random
 import streamlit as st
-from pandas.errors import EmptyDataError
 import streamlit.components.v1 as components  # música / sfx
 
+import bundle
+import cssbundle
+import difficulty
+import events
+import images
+import leaderboard
+import metrics
+import questions
+import render
+import warmup
+from render import get_rank
+
+_IMPORTS_S = time.perf_counter() - _IMPORTS_STARTED
+
 # ==========================
 # CONFIG
 # ==========================
 st.set_page_config(page_title="Terraloteos", page_icon="🦊", layout="centered")
+_RUN_STARTED = time.perf_counter()  # solo se reinicia en reruns completos
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ASSETS_DIR = os.path.join(BASE_DIR, "assets")
-DATA_DIR = os.path.join(BASE_DIR, "data")
+# TERRA_DATA_DIR permite apuntar a otra carpeta de datos (por ejemplo, en loadtest.py)
+DATA_DIR = os.environ.get("TERRA_DATA_DIR") or os.path.join(BASE_DIR, "data")
+# Streamlit sirve BASE_DIR/static en app/static/ con server.enableStaticServing
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+STATIC_URL_PREFIX = "app/static"
+# variantes AVIF/WebP de memes y fondo (python images.py build)
+IMAGES_DIR = os.path.join(STATIC_DIR, "img")
+IMAGES_URL_PREFIX = f"{STATIC_URL_PREFIX}/img"
 
 os.makedirs(ASSETS_DIR, exist_ok=True)
 os.makedirs(DATA_DIR, exist_ok=True)
 
 LOGO_PATH = os.path.join(ASSETS_DIR, "logo_terraloteos.png")
 BG_PATH = os.path.join(ASSETS_DIR, "background.png")
-LEADERBOARD_PATH = os.path.join(DATA_DIR, "leaderboard.csv")
 QUESTIONS_PATH = os.path.join(DATA_DIR, "preguntas.csv")
+# registro de respuestas (ver events.py / analytics.py); TERRA_EVENT_LOG=0 lo apaga
+EVENTS_DIR = os.path.join(DATA_DIR, "events")
+EVENT_LOG = os.environ.get("TERRA_EVENT_LOG", "1") != "0"
+# estadísticas de dificultad por pregunta (ver difficulty.py)
+DIFFICULTY_PATH = os.path.join(DATA_DIR, "difficulty.json")
+# endpoint Prometheus local (127.0.0.1:<puerto>/metrics); TERRA_METRICS_PORT=0 lo apaga
+METRICS_PORT = int(os.environ.get("TERRA_METRICS_PORT", "9464") or 0)
+# arranque: "lazy" (default) no importa pandas/numpy hasta que hagan falta y
+# precalienta banco, assets y ranking en un hilo de fondo; "eager" los importa
+# en el precalentado y parsea el CSV con pandas
+STARTUP_MODE = os.environ.get("TERRA_STARTUP", "lazy")
+LAZY_STARTUP = STARTUP_MODE != "eager"
+
+# límite del cache de assets en memoria (data URIs + snippets HTML)
+ASSET_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# modo assets estáticos: se publican con hash en /static y se referencian por URL
+# (TERRA_STATIC_ASSETS=0 fuerza los data URIs en base64)
+STATIC_ASSETS = (
+    os.environ.get("TERRA_STATIC_ASSETS", "1") != "0"
+    and bool(st.get_option("server.enableStaticServing"))
+)
 
 # ==========================
-# ESTILOS / FONDO
+# CACHE DE ASSETS
 # ==========================
-def load_css() -> None:
-    css_path = os.path.join(ASSETS_DIR, "styles.css")
-    if os.path.exists(css_path):
-        with open(css_path, "r", encoding="utf-8") as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+class _AssetCache:
+    """
+    Cache LRU compartido por todo el proceso para los data URIs en base64.
+    La clave incluye (ruta, mtime, tamaño): si el archivo cambia en disco,
+    la próxima lectura lo vuelve a codificar y descarta la versión vieja.
+
+    Con static_dir, los assets se copian ahí con el hash del contenido en el
+    nombre y se devuelve la URL en lugar del data URI.
+    """
 
-def inject_background_image(path: str) -> None:
-    if os.path.exists(path):
+    def __init__(self, max_bytes: int, static_dir: str | None = None):
+        self.max_bytes = max_bytes
+        self.static_dir = static_dir
+        self._items: "OrderedDict[tuple, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key: tuple) -> str | None:
+        with self._lock:
+            val = self._items.get(key)
+            if val is not None:
+                self._items.move_to_end(key)
+            return val
+
+    def _put(self, key: tuple, val: str) -> None:
+        size = len(val)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # descarta versiones viejas del mismo archivo/variante
+            stale = [k for k in self._items if k[:2] == key[:2] and k != key]
+            for k in stale:
+                self._bytes -= len(self._items.pop(k))
+            if key in self._items:
+                self._bytes -= len(self._items.pop(key))
+            self._items[key] = val
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._items:
+                _, old = self._items.popitem(last=False)
+                self._bytes -= len(old)
+
+    def data_uri(self, path: str, mime: str) -> str:
+        """data:<mime>;base64,... del archivo, o "" si no existe."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return ""
+        key = (path, f"uri:{mime}", stat.st_mtime_ns, stat.st_size)
+        val = self._get(key)
+        if val is None:
+            val = self._encode(path, mime)
+            self._put(key, val)
+        return val
+
+    @staticmethod
+    def _encode(path: str, mime: str) -> str:
         with open(path, "rb") as f:
             b64 = base64.b64encode(f.read()).decode("utf-8")
-        st.markdown(
-            f"""
-            <style>
-            [data-testid="stAppViewContainer"] {{
-              background-image: url("data:image/png;base64,{b64}") !important;
+        return f"data:{mime};base64,{b64}"
+
+    def _publish(self, path: str) -> str:
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(os.path.basename(path))
+        name = f"{stem}.{digest}{ext}"
+        dest = os.path.join(self.static_dir, name)
+        if not os.path.exists(dest):
+            os.makedirs(self.static_dir, exist_ok=True)
+            tmp = f"{dest}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, dest)
+            # borra versiones anteriores del mismo asset
+            old_re = re.compile(rf"^{re.escape(stem)}\.[0-9a-f]{{12}}{re.escape(ext)}$")
+            for other in os.listdir(self.static_dir):
+                if other != name and old_re.match(other):
+                    try:
+                        os.remove(os.path.join(self.static_dir, other))
+                    except OSError:
+                        pass
+        # el hash en el nombre hace que cada versión tenga su propia URL: un cambio
+        # nunca se sirve desde una copia vieja. Que el navegador lo guarde depende
+        # de su cache: Streamlit no manda Cache-Control para app/static.
+        return f"{STATIC_URL_PREFIX}/{name}"
+
+    def url(self, path: str, mime: str) -> str:
+        """URL estática con hash si el modo está activo; si no, el data URI."""
+        if not self.static_dir:
+            return self.data_uri(path, mime)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return ""
+        key = (path, "url", stat.st_mtime_ns, stat.st_size)
+        val = self._get(key)
+        if val is None:
+            val = self._publish(path)
+            self._put(key, val)
+        return val
+
+    def snippet(self, path: str, mime: str, variant: str, render: Callable[[str], str]) -> str:
+        """
+        HTML ya armado a partir de la URL del asset (render recibe la URL).
+        Con data URIs solo se guarda el HTML: el URI ya va adentro y
+        cachearlo aparte duplicaría el asset en memoria.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return ""
+        key = (path, f"html:{variant}", stat.st_mtime_ns, stat.st_size)
+        val = self._get(key)
+        if val is None:
+            uri = self.url(path, mime) if self.static_dir else self._encode(path, mime)
+            if not uri:
+                return ""
+            val = render(uri)
+            self._put(key, val)
+        return val
+
+@st.cache_resource(show_spinner=False)
+def _asset_cache() -> _AssetCache:
+    return _AssetCache(ASSET_CACHE_MAX_BYTES, STATIC_DIR if STATIC_ASSETS else None)
+
+@st.cache_resource(show_spinner=False)
+def _image_manifest() -> images.Manifest:
+    """Manifest de las variantes optimizadas ({} si no se compilaron)."""
+    return images.load_manifest(IMAGES_DIR)
+
+_IMAGE_MIMES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp"}
+
+@functools.lru_cache(maxsize=None)
+def _asset_source(name: str) -> str:
+    """Original de assets/ para `name`: las extensiones se prueban una vez por proceso."""
+    return images.find_source(ASSETS_DIR, name)
+
+def _image_snippet(name: str, min_width: int, variant: str, render: Callable[[str], str]) -> str:
+    """
+    HTML de una sola imagen (sin srcset): la variante WebP de min_width del
+    manifest o, si no hay, el original. Se usa con data URIs, donde mandar
+    varias variantes inflaría el HTML.
+    """
+    entry = _image_manifest().get(name)
+    picked = images.pick(entry, min_width) if entry else None
+    if picked:
+        path, mime = os.path.join(IMAGES_DIR, picked["file"]), images.FORMATS[picked["format"]][0]
+    else:
+        path = _asset_source(name)
+        mime = _IMAGE_MIMES.get(os.path.splitext(path)[1].lower(), "")
+    return _asset_cache().snippet(path, mime, variant, render) if path else ""
+
+# ==========================
+# MÉTRICAS
+# ==========================
+# ?perf=1 muestra cuánto tarda cada tick frente a un rerun completo
+SHOW_PERF = st.query_params.get("perf") == "1"
+# ?admin=1 muestra información para capacitadores (errores del CSV, etc.)
+SHOW_ADMIN = st.query_params.get("admin") == "1"
+# ?admin=metrics abre la página de métricas del proceso (oculta)
+SHOW_METRICS = st.query_params.get("admin") == "metrics"
+
+@st.cache_resource
+def _metrics() -> metrics.Registry:
+    """Métricas del proceso; si METRICS_PORT > 0 también se sirven en /metrics."""
+    registry = metrics.Registry()
+    registry.startup("imports", _IMPORTS_S)
+    if METRICS_PORT > 0:
+        metrics.serve(registry, METRICS_PORT)
+    return registry
+
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex[:12]
+_metrics().rerun(st.session_state.session_id)
+
+def _perf_record(label: str, ms: float) -> None:
+    st.session_state.setdefault("perf", {})[label] = ms
+    _metrics().observe(label, ms / 1000)
+
+@contextmanager
+def _timed(label: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _perf_record(label, (time.perf_counter() - t0) * 1000)
+
+def _profiled(phase: str) -> Callable[[Callable], Callable]:
+    """Mide cada llamada; si devuelve HTML, suma sus bytes al payload de la fase."""
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _timed(phase):
+                out = fn(*args, **kwargs)
+            if isinstance(out, str):
+                _metrics().payload(phase, len(out.encode("utf-8")))
+            return out
+        return wrapper
+    return deco
+
+def _emit(phase: str, html: str) -> None:
+    """st.markdown con HTML, contando los bytes enviados (para HTML que no sale de una función con _profiled)."""
+    _metrics().payload(phase, len(html.encode("utf-8")))
+    st.markdown(html, unsafe_allow_html=True)
+
+# ==========================
+# ESTILOS / FONDO
+# ==========================
+STYLES_PATH = os.path.join(ASSETS_DIR, "styles.css")
+_BG_SELECTOR = '[data-testid="stAppViewContainer"]'
+# ancho de la variante del fondo cuando va como data URI (una sola imagen)
+BG_DATA_URI_WIDTH = 1024
+
+def _background_rules(uri: str = "", image_css: str = "") -> str:
+    image = f'background-image: url("{uri}") !important;' if uri else ""
+    return f"""
+            {_BG_SELECTOR} {{
+              {image}
               background-size: cover !important;
               background-position: center center !important;
               background-attachment: fixed !important;
             }}
-            [data-testid="stAppViewContainer"]::before {{ display:none !important; }}
-            </style>
-            """,
-            unsafe_allow_html=True
-        )
+            {image_css}
+            {_BG_SELECTOR}::before {{ display:none !important; }}
+            """
+
+@functools.lru_cache(maxsize=None)
+def _responsive_background(name: str) -> str:
+    """Fondo con una variante por ancho de ventana y formato (modo estático + manifest)."""
+    css = images.background_css(_image_manifest()[name], IMAGES_URL_PREFIX, _BG_SELECTOR)
+    return _background_rules(image_css=css)
+
+def _background_css(path: str) -> str:
+    name = os.path.splitext(os.path.basename(path))[0]
+    if STATIC_ASSETS and name in _image_manifest():
+        return _responsive_background(name)
+    return _image_snippet(name, BG_DATA_URI_WIDTH, "background", _background_rules)
+
+@functools.lru_cache(maxsize=4)
+def _build_css(mtime_ns: int, size: int, background: str) -> cssbundle.Bundle:
+    """styles.css + fondo, minificados; la clave cambia si styles.css cambia en disco."""
+    css = ""
+    if size >= 0:
+        with open(STYLES_PATH, "r", encoding="utf-8") as f:
+            css = f.read()
+    return cssbundle.make_bundle(css, background)
+
+def _css_bundle() -> cssbundle.Bundle:
+    try:
+        stat = os.stat(STYLES_PATH)
+        key = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        key = (0, -1)
+    return _build_css(*key, _background_css(BG_PATH))
+
+# corre en un iframe de altura 0 y deja el bundle como <style> en el <head>
+# del documento raíz (id terra-css); si ya está con el mismo hash no hace nada.
+# También en modo estático va inline: app/static no garantiza servir .css
+# como text/css en todas las versiones de Streamlit.
+_CSS_INJECTOR_JS = """
+(function(){
+  var d = (window.parent || window).document;
+  var old = d.getElementById('terra-css');
+  if (old && old.getAttribute('data-hash') === __HASH__) return;
+  var el = d.createElement('style');
+  el.textContent = __CSS__;
+  el.setAttribute('data-hash', __HASH__);
+  if (old) old.remove();
+  el.id = 'terra-css';
+  d.head.appendChild(el);
+})();
+"""
+
+@_profiled("load_css")
+def load_css() -> None:
+    """
+    Estilos y fondo, una vez por sesión: el primer rerun inyecta el bundle en
+    el <head> y los siguientes no mandan nada mientras el hash no cambie.
+    """
+    css = _css_bundle()
+    if st.session_state.get("css_hash") == css.digest:
+        st.empty()  # conserva la posición de los elementos siguientes
+        return
+    js = (
+        _CSS_INJECTOR_JS.replace("__HASH__", json.dumps(css.digest))
+        .replace("__CSS__", json.dumps(css.css).replace("</", "<\\/"))
+    )
+    html = f"<script>{js}</script>"
+    _metrics().payload("load_css", len(html.encode("utf-8")))
+    components.html(html, height=0, width=0)
+    st.session_state.css_hash = css.digest
+
+def _logo_snippet(width: int) -> str:
+    return _asset_cache().snippet(
+        LOGO_PATH, "image/png", f"logo:{width}",
+        lambda uri: f'<img src="{uri}" style="width:{width}px;max-width:100%;height:auto;display:block;margin:0 auto;" />'
+    )
 
+@_profiled("get_logo_html")
 def get_logo_html(width: int) -> str:
-    """Logo como <img> en base64 para centrarlo con columnas."""
-    if os.path.exists(LOGO_PATH):
-        with open(LOGO_PATH, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode("utf-8")
-        return f'<img src="data:image/png;base64,{b64}" style="width:{width}px;max-width:100%;height:auto;display:block;margin:0 auto;" />'
-    return ""
+    """Logo como <img> (URL estática o base64) para centrarlo con columnas."""
+    return _logo_snippet(width)
 
 # ==========================
 # FOX ROAD (GYMTONIC -> Terra)
 # ==========================
-def _trees_positions(n: int = 8) -> list[float]:
-    if n < 1:
-        return []
-    step = 100 / (n + 1)
-    return [round(step * (i + 1), 2) for i in range(n)]
-
-def foxy_scene_html(progress_pct: int, trees: int = 8) -> str:
-    """Escena del zorro. progress_pct en 0..100 (ligado al avance del quiz)."""
-    p = max(0, min(100, int(progress_pct)))
-    # margen para que no tape los endpoints
-    left_pct = 2 + (p * 0.96)
-
-    # Árboles alternando arriba/abajo
-    tpos = _trees_positions(trees)
-    trees_html = []
-    for i, pos in enumerate(tpos):
-        side = "top" if i % 2 == 0 else "bottom"
-        trees_html.append(f'<div class="foxy-tree {side}" style="left:{pos}%; transform: translateX(-50%);">🌳</div>')
+# (el HTML se arma en render.py; acá solo se mide)
+foxy_scene_html = _profiled("foxy_scene_html")(render.foxy_scene_html)
+FOXY_TREES = 9
 
-    return f"""
-    <div class="foxy-wrap">
-      <div class="foxy-title">Ayudá a Foxy a llegar a tiempo con el cliente — {p}%</div>
-
-      <div class="foxy-endpoints">
-        <!-- 2) Sin texto 'GYMTONIC', solo el emoji de ubicación -->
-        <div class="foxy-left">📍</div>
-        <!-- 3) Texto más grande junto al edificio -->
-        <div class="foxy-right">🏢<span class="foxy-endcap label-dark big">Oficina de Terraloteos</span></div>
-      </div>
-
-      <div class="foxy-scene">
-        <div class="foxy-road"></div>
-        {''.join(trees_html)}
-        <div class="foxy-fox" style="left:{left_pct}%;">🦊</div>
-      </div>
-    </div>
+_foxy_component = components.declare_component(
+    "terra_foxy_road", path=os.path.join(BASE_DIR, "components", "foxy_road")
+)
+
+@functools.lru_cache(maxsize=4)
+def _foxy_scene(trees: int) -> tuple[str, str]:
+    html = render.foxy_scene_html(0, trees=trees)
+    return html, hashlib.sha1(html.encode("utf-8")).hexdigest()[:12]
+
+def show_foxy_road(progress_pct: int) -> None:
+    """
+    Camino del zorro como componente. La escena viaja una vez por sesión (como
+    el bundle de load_css) y el navegador la guarda; después cada avance manda
+    solo el porcentaje. Si el iframe se recrea sin la escena, avisa con "" y se
+    vuelve a mandar.
     """
+    with _timed("foxy_scene_html"):
+        html, digest = _foxy_scene(FOXY_TREES)
+        args: Dict[str, Any] = {"p": max(0, min(100, int(progress_pct))), "digest": digest}
+        if st.session_state.get("foxy_scene") != digest or st.session_state.get("foxy_road") == "":
+            args["scene"] = html
+        _metrics().payload("foxy_scene_html", len(json.dumps(args).encode("utf-8")))
+        _foxy_component(**args, key="foxy_road", default=None)
+        st.session_state.foxy_scene = digest
 
 # ==========================
 # HELPERS RANGO / IMÁGENES
 # ==========================
-def _slugify(text: str) -> str:
-    text = unicodedata.normalize("NFD", text)
-    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
-    text = re.sub(r"[^a-zA-Z0-9\s\.-]", "", text)
-    text = text.lower().strip().replace(".", "")
-    text = re.sub(r"[\s_]+", "-", text)
-    return text
+# imagen por rango: assets/<nombre>.jpg (o .jpeg, .png, .webp) y sus variantes
+RANK_MEMES = {
+    "Aprendiz Terra": "aprendiz-terra",
+    "Asesor Jr.": "asesor-jr",
+    "Asesor Senior.": "asesor-senior",
+    "Maestro Terra": "maestro-terra",
+}
+# los memes se ven a 380px (260px en mobile, ver .rank-meme en styles.css)
+MEME_WIDTH = 380
+MEME_SIZES = "(max-width: 640px) 260px, 380px"
+
+@functools.lru_cache(maxsize=None)
+def _meme_picture(name: str, rank: str) -> str:
+    pic = images.picture_html(_image_manifest()[name], IMAGES_URL_PREFIX, MEME_SIZES, f"Imagen {rank}", MEME_WIDTH)
+    return f"<div class='rank-meme'>{pic}</div>"
+
+def _rank_meme_html(rank: str) -> str:
+    name = RANK_MEMES.get(rank.strip(), "")
+    if not name:
+        return ""
+    if STATIC_ASSETS and name in _image_manifest():
+        return _meme_picture(name, rank)
+    # data URI: una sola variante, al doble del ancho para pantallas densas
+    return _image_snippet(
+        name, MEME_WIDTH * 2, f"meme:{rank}",
+        lambda uri: f"<div class='rank-meme'><img src='{uri}' alt='Imagen {rank}'/></div>"
+    )
 
 def show_rank_meme(rank: str) -> None:
-    """
-    Muestra UNA imagen según el rango (busca en /assets con estos nombres EXACTOS):
-      - Aprendiz Terra  ->  aprendiz-terra.jpg
-      - Asesor Jr.      ->  asesor-jr.jpg
-      - Asesor Senior.  ->  asesor-senior.jpg
-      - Maestro Terra   ->  maestro-terra.jpg
-    Si no encuentra .jpg, intenta .jpeg, .png, .webp.
-    """
-    mapping = {
-        "Aprendiz Terra": "aprendiz-terra",
-        "Asesor Jr.": "asesor-jr",
-        "Asesor Senior.": "asesor-senior",
-        "Maestro Terra": "maestro-terra",
-    }
-    base = mapping.get(rank.strip(), "")
-    if not base:
-        return
-    mime_map = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp"}
-    for ext in (".jpg", ".jpeg", ".png", ".webp"):
-        path = os.path.join(ASSETS_DIR, base + ext)
-        if os.path.exists(path):
-            with open(path, "rb") as f:
-                b64 = base64.b64encode(f.read()).decode("utf-8")
-            st.markdown(
-                f"<div class='rank-meme'><img src='data:{mime_map[ext]};base64,{b64}' alt='Imagen {rank}'/></div>",
-                unsafe_allow_html=True
-            )
-            return
+    """Muestra UNA imagen según el rango (ver RANK_MEMES)."""
+    html = _rank_meme_html(rank)
+    if html:
+        _emit("rank_meme", html)
 
 # ==========================
 # AUDIO
 # ==========================
-def mount_quiz_music() -> None:
-    """Inserta un <audio> en el documento raíz y trata de reproducirlo."""
-    path = os.path.join(ASSETS_DIR, "music_quiz.mp3")
-    if not os.path.exists(path):
-        return
-    with open(path, "rb") as f:
-        b64 = base64.b64encode(f.read()).decode("utf-8")
-    components.html(
-        f"""
-        <script>
-        (function(){{
-          const root = window.parent || window;
-          if (root.__terra_bgm__) return;
-          const a = root.document.createElement('audio');
-          a.src = "data:audio/mpeg;base64,{b64}";
-          a.loop = true;
-          a.autoplay = true;
-          a.volume = 0.5;
-          a.style.display = 'none';
-          root.document.body.appendChild(a);
-          root.__terra_bgm__ = a;
-          function tryPlay() {{ a.play().catch(function(){{}}); }}
-          tryPlay();
-          ['click','touchstart','keydown'].forEach(function(ev){{
-            root.addEventListener(ev, tryPlay, {{ once: true, passive: true }});
-            window.addEventListener(ev, tryPlay, {{ once: true, passive: true }});
-          }});
-        }})();
-        </script>
-        """,
-        height=0, width=0
+# Un único controlador por sesión: se instala en el documento raíz, precarga
+# las pistas una sola vez y recibe órdenes cortas ("seq:play:quack") a través
+# de un <div> oculto en el markdown, sin crear un iframe por sonido.
+# En modo estático los mp3 salen de app/static (Streamlit los sirve como
+# text/plain, pero <audio> detecta el formato por contenido).
+AUDIO_TRACKS = {
+    # nombre: (archivo, loop, volumen)
+    "bgm": ("music_quiz.mp3", True, 0.5),
+    "quack": ("sfx_quack.mp3", False, 0.8),
+    "final10": ("sfx_final10.mp3", False, 0.9),
+}
+AUDIO_CMD_HISTORY = 8  # órdenes recientes que se reenvían (el navegador descarta repetidas)
+
+_AUDIO_CONTROLLER_JS = """
+(function(){
+  var w = window;
+  if (w.__terra_audio__) return;
+  var tracks = __TRACKS__;
+  var els = {}, pending = [], last = 0;
+  Object.keys(tracks).forEach(function(name){
+    var t = tracks[name];
+    if (!t.src) return;
+    var a = new Audio();
+    a.preload = 'auto'; a.loop = !!t.loop; a.volume = t.volume; a.src = t.src;
+    els[name] = a;
+  });
+  function play(a){ a.play().catch(function(){ if (pending.indexOf(a) < 0) pending.push(a); }); }
+  function run(cmd, name){
+    var a = els[name];
+    if (!a) return;
+    try {
+      if (cmd === 'play'){ if (!a.loop) a.currentTime = 0; play(a); }
+      else if (cmd === 'resume'){ play(a); }
+      else if (cmd === 'pause'){ a.pause(); }
+      else if (cmd === 'stop'){ a.pause(); a.currentTime = 0; }
+      if (cmd !== 'play' && cmd !== 'resume'){ var i = pending.indexOf(a); if (i >= 0) pending.splice(i, 1); }
+    } catch(e){}
+  }
+  function scan(){
+    var cmds = [];
+    document.querySelectorAll('.terra-audio-cmd').forEach(function(n){
+      (n.getAttribute('data-cmds') || '').split(';').forEach(function(c){
+        var p = c.split(':');
+        if (p.length === 3 && +p[0] > last) cmds.push(p);
+      });
+    });
+    cmds.sort(function(x, y){ return x[0] - y[0]; });
+    cmds.forEach(function(p){ if (+p[0] > last){ last = +p[0]; run(p[1], p[2]); } });
+  }
+  function unlock(){ var q = pending.splice(0); q.forEach(play); }
+  ['click','touchstart','keydown'].forEach(function(ev){
+    document.addEventListener(ev, unlock, { passive: true });
+  });
+  new MutationObserver(scan).observe(document.body, { childList: true, subtree: true });
+  w.__terra_audio__ = { run: run, scan: scan };
+  scan();
+})();
+"""
+
+def _audio_tracks_json() -> str:
+    tracks = {}
+    for name, (filename, loop, volume) in AUDIO_TRACKS.items():
+        src = _asset_cache().url(os.path.join(ASSETS_DIR, filename), "audio/mpeg")
+        tracks[name] = {"src": src, "loop": loop, "volume": volume}
+    return json.dumps(tracks)
+
+@functools.lru_cache(maxsize=4)
+def _build_audio_loader(key: tuple) -> tuple[str, str]:
+    loader = (
+        "<script>(function(){"
+        "var root = window.parent || window;"
+        "if (root.__terra_audio__) return;"
+        "var s = root.document.createElement('script');"
+        f"s.textContent = {json.dumps(_AUDIO_CONTROLLER_JS.replace('__TRACKS__', _audio_tracks_json()))};"
+        "root.document.body.appendChild(s);"
+        "})();</script>"
     )
+    return loader, hashlib.sha1(loader.encode("utf-8")).hexdigest()[:12]
+
+def _audio_loader() -> tuple[str, str]:
+    """(HTML del cargador, hash); se rearma solo si cambia alguna pista o el modo de assets."""
+    key = [STATIC_ASSETS]
+    for filename, _, _ in AUDIO_TRACKS.values():
+        try:
+            stat = os.stat(os.path.join(ASSETS_DIR, filename))
+            key.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            key.append((0, -1))
+    return _build_audio_loader(tuple(key))
+
+def mount_audio_controller() -> None:
+    """
+    Monta el controlador de audio, una vez por sesión: como load_css, el primer
+    rerun manda el cargador (el controlador queda en el documento raíz) y los
+    siguientes no lo repiten mientras el hash no cambie. Las órdenes pendientes
+    se mandan siempre.
+    """
+    loader, digest = _audio_loader()
+    if st.session_state.get("audio_loader") == digest:
+        st.empty()  # conserva la posición de los elementos siguientes
+    else:
+        _metrics().payload("audio", len(loader.encode("utf-8")))
+        components.html(loader, height=0, width=0)
+        st.session_state.audio_loader = digest
+    _audio_flush()
+
+def _audio_flush() -> None:
+    cmds = st.session_state.audio_cmds
+    if cmds:
+        data = ";".join(f"{seq}:{cmd}:{track}" for seq, cmd, track in cmds)
+        _emit("audio", f"<div class='terra-audio-cmd' data-cmds='{data}'></div>")
+
+def _audio_cmd(cmd: str, track: str) -> None:
+    st.session_state.audio_seq += 1
+    cmds = st.session_state.audio_cmds
+    cmds.append((st.session_state.audio_seq, cmd, track))
+    del cmds[:-AUDIO_CMD_HISTORY]
+    _audio_flush()
+
+def mount_quiz_music() -> None:
+    """Controlador de audio + música base (arranca una vez por partida)."""
+    mount_audio_controller()
+    if not st.session_state.bgm_started:
+        st.session_state.bgm_started = True
+        _audio_cmd("play", "bgm")
 
 def stop_quiz_music() -> None:
-    components.html(
-        """
-        <script>
-        (function(){
-          const root = window.parent || window;
-          if (root.__terra_bgm__) {
-            try { root.__terra_bgm__.pause(); root.__terra_bgm__.currentTime = 0; } catch(e){}
-          }
-        })();
-        </script>
-        """,
-        height=0, width=0
-    )
+    if st.session_state.bgm_started:
+        st.session_state.bgm_started = False
+        _audio_cmd("stop", "bgm")
 
 # 5) Pausar / reanudar música base (para últimos 10s)
 def pause_quiz_music() -> None:
-    components.html(
-        """
-        <script>
-        (function(){
-          const root = window.parent || window;
-          const a = root.__terra_bgm__;
-          if (a){ try{ a.pause(); }catch(e){} }
-        })();
-        </script>
-        """,
-        height=0, width=0
-    )
+    _audio_cmd("pause", "bgm")
 
 def resume_quiz_music() -> None:
-    components.html(
-        """
-        <script>
-        (function(){
-          const root = window.parent || window;
-          const a = root.__terra_bgm__;
-          if (a){ try{ a.play().catch(function(){}); }catch(e){} }
-        })();
-        </script>
-        """,
-        height=0, width=0
-    )
+    _audio_cmd("resume", "bgm")
 
 def play_quack() -> None:
     """Reproduce un sonido corto 'cuack'."""
-    path = os.path.join(ASSETS_DIR, "sfx_quack.mp3")
-    if not os.path.exists(path):
-        return
-    with open(path, "rb") as f:
-        b64 = base64.b64encode(f.read()).decode("utf-8")
-    components.html(
-        f"""
-        <script>
-        (function(){{
-          const root = window.parent || window;
-          const a = root.document.createElement('audio');
-          a.src = "data:audio/mpeg;base64,{b64}";
-          a.autoplay = true;
-          a.volume = 0.8;
-          a.style.display = 'none';
-          root.document.body.appendChild(a);
-          a.addEventListener('ended', function(){{ try{{ a.remove(); }}catch(e){{}} }});
-          function tryPlay(){{ a.play().catch(function(){{}}); }}
-          tryPlay();
-          ['click','touchstart','keydown'].forEach(function(ev){{
-            root.addEventListener(ev, tryPlay, {{ once:true, passive:true }});
-          }});
-        }})();
-        </script>
-        """,
-        height=0, width=0
-    )
+    _audio_cmd("play", "quack")
 
 def play_final10() -> None:
     """Reproduce una pista para los últimos 10 segundos (una sola vez por pregunta)."""
-    path = os.path.join(ASSETS_DIR, "sfx_final10.mp3")
-    if not os.path.exists(path):
-        return
-    with open(path, "rb") as f:
-        b64 = base64.b64encode(f.read()).decode("utf-8")
-    components.html(
-        f"""
-        <script>
-        (function(){{
-          const root = window.parent || window;
-          if (root.__terra_final10__) return;
-          const a = root.document.createElement('audio');
-          a.src = "data:audio/mpeg;base64,{b64}";
-          a.autoplay = true;
-          a.volume = 0.9;
-          a.style.display = 'none';
-          root.document.body.appendChild(a);
-          root.__terra_final10__ = a;
-          a.addEventListener('ended', function(){{
-            try{{ a.remove(); root.__terra_final10__ = null; }}catch(e){{}}
-          }});
-          function tryPlay(){{ a.play().catch(function(){{}}); }}
-          tryPlay();
-          ['click','touchstart','keydown'].forEach(function(ev){{
-            root.addEventListener(ev, tryPlay, {{ once:true, passive:true }});
-          }});
-        }})();
-        </script>
-        """,
-        height=0, width=0
-    )
+    _audio_cmd("play", "final10")
 
 def stop_final10() -> None:
     """Corta inmediatamente la música de los últimos 10s si está sonando."""
-    components.html(
-        """
-        <script>
-        (function(){
-          const root = window.parent || window;
-          const a = root.__terra_final10__;
-          if (a){
-            try { a.pause(); a.currentTime = 0; a.remove(); } catch(e){}
-            try { root.__terra_final10__ = null; } catch(e){}
-          }
-        })();
-        </script>
-        """,
-        height=0, width=0
-    )
+    _audio_cmd("stop", "final10")
 
 # cargar estilos y fondo lo antes posible
 load_css()
-inject_background_image(BG_PATH)
 
 # ==========================
 # CONSTANTES
 # ==========================
-def count_questions() -> int:
-    if os.path.exists(QUESTIONS_PATH):
-        try:
-            df = pd.read_csv(QUESTIONS_PATH)
-            return int(len(df.dropna(subset=["question"])))
-        except Exception:
-            return 0
-    return 0
+@st.cache_resource(show_spinner=False)
+def _bank_watcher() -> questions.BankWatcher:
+    """Banco compartido (solo lectura); se recarga solo cuando cambia el CSV."""
+    return questions.BankWatcher(QUESTIONS_PATH, prefer_pandas=not LAZY_STARTUP)
+
+def question_bank() -> questions.QuestionBank:
+    return _bank_watcher().bank
 
 TIME_LIMIT       = 30
 POINTS_CORRECT   = 10
 BONUS_FAST       = 5
 BONUS_FAST_THRESHOLD = 10
-
-RANKS = [
-    (0, 30, "Aprendiz Terra"),
-    (31, 80, "Asesor Jr."),
-    (81, 120, "Asesor Senior."),
-    (121, 9999, "Maestro Terra"),
-]
+FINAL_STRETCH    = 10   # últimos segundos con música de suspenso
+TIMER_GRACE      = 1    # tolerancia (s) por latencia entre navegador y servidor
+
+# "client": cuenta regresiva en el navegador (components/countdown), el servidor
+# solo se entera de los eventos. "server": rerun cada 1s con st_autorefresh.
+TIMER_MODE = os.environ.get("TERRA_TIMER_MODE", "client")
+
+# "live": una pregunta por vez con el servidor. "offline": el quiz entero viaja
+# firmado al navegador (sin respuestas) y vuelve en un solo envío (ver bundle.py)
+QUIZ_MODE = os.environ.get("TERRA_QUIZ_MODE", "live")
+
+# preguntas por quiz (0 = todo el banco) y estrategia de muestreo
+# (ver questions.SAMPLING_STRATEGIES: "institutional_first", "stratified")
+QUIZ_SIZE     = int(os.environ.get("TERRA_QUIZ_SIZE", "0") or 0)
+QUIZ_STRATEGY = os.environ.get("TERRA_QUIZ_STRATEGY", "institutional_first")
+if QUIZ_STRATEGY not in questions.SAMPLING_STRATEGIES:
+    QUIZ_STRATEGY = "institutional_first"
+# orden dentro del quiz: "random" (default) o según la dificultad observada
+# (ver difficulty.ORDERINGS: "mixed" alterna fáciles y difíciles, "ramp" de fácil a difícil)
+QUIZ_ORDER = os.environ.get("TERRA_QUIZ_ORDER", "random")
+if QUIZ_ORDER not in difficulty.ORDERINGS:
+    QUIZ_ORDER = "random"
+
+LEADERBOARD_TOP_N     = 5
+LEADERBOARD_PAGE_SIZE = 20
+# ventanas del ranking (ver leaderboard.WINDOWS); la primera es la default
+LEADERBOARD_WINDOWS = {"week": "Esta semana", "day": "Hoy", "all": "Histórico"}
 
 # nombre válido (solo letras y espacios, con acentos) 2–40
 NAME_RE = re.compile(r"^[A-Za-zÁÉÍÓÚÜÑáéíóúüñ ]{2,40}$")
@@ -343,121 +660,243 @@ NAME_RE = re.compile(r"^[A-Za-zÁÉÍÓÚÜÑáéíóúüñ ]{2,40}$")
 # ==========================
 # UTILS
 # ==========================
-def _is_institutional(question: str, category_val: str) -> bool:
-    if category_val:
-        if str(category_val).strip().lower().startswith("inst"):
-            return True
-    q = (question or "").lower()
-    terms = [
-        "terraloteos", "terra", "institucional", "misión", "vision", "visión",
-        "valores", "empresa", "oficinas", "beneficios", "plusvalía", "rentabilidad"
-    ]
-    return any(t in q for t in terms)
-
-def load_questions() -> List[Dict[str, Any]]:
-    questions_all: List[Dict[str, Any]] = []
-    if os.path.exists(QUESTIONS_PATH) and os.path.getsize(QUESTIONS_PATH) > 0:
-        try:
-            df = pd.read_csv(QUESTIONS_PATH)
-            for _, row in df.iterrows():
-                if pd.isna(row.get("question")):
-                    continue
-                opts = []
-                for i in range(1, 4 + 1):
-                    val = row.get(f"option{i}")
-                    if pd.notna(val):
-                        opts.append(str(val))
-                if not opts:
-                    continue
-                raw_idx = row.get("answer_index")
-                if raw_idx is None or str(raw_idx).strip() == "":
-                    continue
-                try:
-                    ans = int(float(str(raw_idx).strip()))
-                except (ValueError, TypeError):
-                    continue
-                if not (0 <= ans < len(opts)):
-                    continue
-                category_val = ""
-                if "category" in df.columns:
-                    category_val = row.get("category", "")
-                elif "categoria" in df.columns:
-                    category_val = row.get("categoria", "")
-                questions_all.append({
-                    "question": str(row["question"]),
-                    "options": opts,
-                    "answer": ans,
-                    "category": category_val
-                })
-        except (EmptyDataError, FileNotFoundError):
-            pass
-
-    instit, otras = [], []
-    for q in questions_all:
-        (instit if _is_institutional(q.get("question", ""), q.get("category", "")) else otras).append(q)
-    random.shuffle(instit)
-    random.shuffle(otras)
-    return instit + otras
-
-def ensure_leaderboard() -> None:
-    cols = ["name", "score", "rank", "timestamp"]
-    if not os.path.exists(LEADERBOARD_PATH):
-        pd.DataFrame(columns=cols).to_csv(LEADERBOARD_PATH, index=False)
-        return
-    try:
-        df = pd.read_csv(LEADERBOARD_PATH)
-    except Exception:
-        pd.DataFrame(columns=cols).to_csv(LEADERBOARD_PATH, index=False)
+def load_questions() -> None:
+    """Toma el banco compartido y guarda en la sesión solo el orden de índices."""
+    bank = question_bank()
+    st.session_state.bank = bank
+    order = bank.sample(QUIZ_SIZE, QUIZ_STRATEGY)
+    if QUIZ_ORDER != "random":
+        order = difficulty.reorder(
+            bank, order, _difficulty_stats(), QUIZ_ORDER,
+            institutional_first=QUIZ_STRATEGY == "institutional_first",
+        )
+    st.session_state.order = order
+
+def current_question() -> questions.Question:
+    return st.session_state.bank[st.session_state.order[st.session_state.idx]]
+
+@st.cache_resource(show_spinner=False)
+def _leaderboard() -> leaderboard.LeaderboardBackend:
+    """Backend del ranking según LEADERBOARD_BACKEND (sqlite | csv | redis); esquema y migración una vez por proceso."""
+    backend = leaderboard.backend_from_env(DATA_DIR)
+    backend.ensure()
+    return backend
+
+def ensure_leaderboard() -> leaderboard.LeaderboardBackend:
+    return _leaderboard()
+
+@st.cache_resource(show_spinner=False)
+def _score_writer() -> leaderboard.ScoreWriter:
+    """Hilo escritor único del proceso: agrupa los guardados simultáneos."""
+    return leaderboard.ScoreWriter(ensure_leaderboard())
+
+def submit_score(name: str, score: int, rank: str) -> Future:
+    """Encola el puntaje sin bloquear; el Future se resuelve con el id de la fila."""
+    t0 = time.perf_counter()
+    registry = _metrics()
+    fut = _score_writer().submit(name, score, rank)
+    # save_score: desde el clic hasta la confirmación del lote (hilo escritor)
+    fut.add_done_callback(lambda _: registry.observe("save_score", time.perf_counter() - t0))
+    return fut
+
+@st.cache_resource(show_spinner=False)
+def _event_log() -> events.EventLog:
+    """Buffer de eventos del proceso: un hilo escribe las partes por lotes."""
+    return events.EventLog(EVENTS_DIR)
+
+@st.cache_resource(show_spinner=False)
+def _difficulty_stats() -> difficulty.DifficultyStats:
+    """Dificultad por pregunta del proceso; sin archivo previo, arranca del registro."""
+    stats = difficulty.DifficultyStats(DIFFICULTY_PATH)
+    if len(stats) == 0 and os.path.isdir(EVENTS_DIR):
+        cols = events.read_parts(EVENTS_DIR)
+        stats.seed(cols["qid"], cols["correct"], cols["elapsed_ms"])
+    return stats
+
+def log_answer(q: questions.Question, selected: int | None, elapsed: float, pts: int) -> None:
+    """Registra una respuesta (selected=None: se venció el tiempo)."""
+    correct = selected is not None and selected == q.answer
+    # el mismo tiempo (acotado al límite) para la dificultad en vivo y el registro,
+    # así analytics.py y difficulty.json coinciden para las mismas respuestas
+    elapsed_ms = int(min(elapsed, TIME_LIMIT + TIMER_GRACE) * 1000)
+    _difficulty_stats().update(q.qid, correct, elapsed_ms)
+    if not EVENT_LOG:
         return
-    changed = False
-    if "rank" not in df.columns:
-        df["rank"] = ""
-        changed = True
-    for c in cols:
-        if c not in df.columns:
-            df[c] = "" if c in ("name", "rank", "timestamp") else 0
-            changed = True
-    if changed:
-        df = df[cols]
-        df.to_csv(LEADERBOARD_PATH, index=False)
-
-def save_score(name: str, score: int, rank: str) -> None:
-    """Guarda el puntaje (robusto)."""
-    ensure_leaderboard()
-    try:
-        df = pd.read_csv(LEADERBOARD_PATH)
-    except Exception:
-        df = pd.DataFrame(columns=["name", "score", "rank", "timestamp"])
-    ts = datetime.now().isoformat(timespec='seconds')
-    new_row = {"name": name.strip()[:40], "score": int(score), "rank": rank, "timestamp": ts}
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df = df.sort_values(["score", "timestamp"], ascending=[False, True]).reset_index(drop=True)
-    df.to_csv(LEADERBOARD_PATH, index=False)
-
-def get_rank(score: int) -> str:
-    for lo, hi, label in RANKS:
-        if lo <= score <= hi:
-            return label
-    return RANKS[-1][2]
+    _event_log().record(events.AnswerEvent(
+        ts=time.time(),
+        session=st.session_state.session_id,
+        qid=q.qid,
+        selected=-1 if selected is None else int(selected),
+        correct=correct,
+        elapsed_ms=elapsed_ms,
+        time_limit_s=TIME_LIMIT,
+        points=pts,
+        bonus=max(0, pts - POINTS_CORRECT),
+    ))
 
 def reset_quiz() -> None:
-    st.session_state.questions = load_questions()
+    load_questions()
     st.session_state.idx = 0
     st.session_state.score = 0
     st.session_state.start_time = datetime.now()
     st.session_state.answered = False
     st.session_state.selected = None
     st.session_state.saved_pos = None
+    st.session_state.pending_save = None
     st.session_state.final10_played = False
+    st.session_state.bundle = None
+
+def score_answer(is_correct: bool, elapsed: float) -> int:
+    """Puntos de una respuesta según el tiempo medido en el servidor."""
+    if not is_correct or elapsed > TIME_LIMIT + TIMER_GRACE:
+        return 0
+    pts = POINTS_CORRECT
+    if int(elapsed) <= BONUS_FAST_THRESHOLD:
+        pts += BONUS_FAST
+    return pts
+
+_countdown_component = components.declare_component(
+    "terra_countdown", path=os.path.join(BASE_DIR, "components", "countdown")
+)
+
+def countdown_timer(remaining: float) -> str | None:
+    """
+    Muestra la cuenta regresiva en el navegador y devuelve el último evento
+    de la pregunta actual ("final10" / "timeout") o None.
+    """
+    idx = st.session_state.idx
+    value = _countdown_component(
+        idx=idx,
+        remaining_ms=int(remaining * 1000),
+        final_secs=FINAL_STRETCH,
+        final10_sent=bool(st.session_state.final10_played),
+        key=f"timer_{idx}",
+        default=None,
+    )
+    if isinstance(value, dict) and value.get("idx") == idx:
+        return value.get("event")
+    return None
+
+_quiz_bundle_component = components.declare_component(
+    "terra_quiz_bundle", path=os.path.join(BASE_DIR, "components", "quiz_bundle")
+)
+
+@st.cache_resource
+def _bundle_secret() -> bytes:
+    """Clave de firma de los quizzes offline (TERRA_BUNDLE_SECRET o una al azar por proceso)."""
+    secret = os.environ.get("TERRA_BUNDLE_SECRET")
+    return secret.encode("utf-8") if secret else bundle.new_secret()
+
+def offline_quiz() -> None:
+    """
+    Modo offline: manda el quiz una vez y espera el lote de respuestas. Al
+    recibirlo puntúa y registra todo junto y salta a la pantalla final.
+    """
+    if st.session_state.bundle is None:
+        picked = [st.session_state.bank[i] for i in st.session_state.order]
+        st.session_state.bundle = bundle.make_bundle(picked, _bundle_secret(), st.session_state.session_id)
+    issued = st.session_state.bundle
+    value = _quiz_bundle_component(
+        bundle=issued,
+        time_limit=TIME_LIMIT,
+        final_secs=FINAL_STRETCH,
+        fox_html=foxy_scene_html(0, trees=FOXY_TREES),
+        css=_css_bundle().css,
+        key="quiz_bundle",
+        default=None,
+    )
+    if not isinstance(value, dict) or (value.get("token") or {}).get("nonce") != issued["token"]["nonce"]:
+        return
+    with _timed("offline_submit"):
+        bank = st.session_state.bank
+        by_qid = {bank[i].qid: bank[i] for i in st.session_state.order}
+        try:
+            scored = bundle.score_submission(
+                value.get("token"), value.get("sig"), value.get("answers"),
+                _bundle_secret(), by_qid.get, score_answer, TIME_LIMIT, TIMER_GRACE,
+            )
+        except bundle.BundleError as e:
+            st.error(f"No se pudieron validar las respuestas: {e}")
+            return
+        for a in scored:
+            log_answer(a.question, a.selected, a.elapsed, a.points)
+    st.session_state.score = sum(a.points for a in scored)
+    st.session_state.idx = len(st.session_state.order)
+    st.session_state.bundle = None
+    st.rerun()
+
+# Fragmentos (st.fragment; st.experimental_fragment en versiones viejas)
+_FRAGMENT_API = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+_HAS_FRAGMENTS = _FRAGMENT_API is not None
+
+def _fragment(run_every: float | None = None) -> Callable[[Callable], Callable]:
+    if not _HAS_FRAGMENTS:
+        return lambda fn: fn
+
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def counted(*args, **kwargs):
+            _metrics().rerun(st.session_state.session_id, fn.__name__)
+            return fn(*args, **kwargs)
+        return _FRAGMENT_API(run_every=run_every)(counted)
+    return deco
+
+@_profiled("leaderboard_table_html")
+def leaderboard_table_html(rows: List[Dict[str, Any] | None], me_id: int | None = None) -> str:
+    return render.leaderboard_table_html(rows, me_id, LEADERBOARD_TOP_N)
 
 def _valid_name(name: str) -> bool:
     return bool(NAME_RE.match(name.strip())) if name else False
 
+@functools.lru_cache(maxsize=None)
+def _st_autorefresh() -> Callable[..., Any]:
+    """st_autorefresh importado una sola vez (sin el paquete, no hace nada)."""
+    try:
+        return importlib.import_module("streamlit_autorefresh").st_autorefresh
+    except Exception:
+        return lambda *args, **kwargs: None
+
+# ==========================
+# PRECALENTADO
+# ==========================
+def _warm_assets() -> None:
+    _css_bundle()
+    for rank in RANK_MEMES:
+        _rank_meme_html(rank)
+    _logo_snippet(480)
+    _logo_snippet(360)
+    _audio_tracks_json()
+
+def _warm_leaderboard() -> None:
+    # el ranking se abre en la ventana default: deja su primera página en el cache de SQLite
+    ensure_leaderboard().top(LEADERBOARD_TOP_N, next(iter(LEADERBOARD_WINDOWS)))
+
+@st.cache_resource(show_spinner=False)
+def _warmup() -> threading.Thread:
+    """
+    Una vez por proceso, en el primer rerun: carga en un hilo de fondo lo que
+    la portada no necesita, así el primer "Comenzamos" / "Guardar" no lo espera.
+    """
+    steps: warmup.Steps = {
+        "question_bank": _bank_watcher,
+        "assets": _warm_assets,
+        "leaderboard": _warm_leaderboard,
+        "score_writer": _score_writer,
+        "difficulty": _difficulty_stats,
+    }
+    if EVENT_LOG:
+        steps["event_log"] = _event_log
+    if not LAZY_STARTUP:
+        steps["import_pandas"] = lambda: warmup.time_import("pandas")
+    return warmup.start(steps, _metrics().startup)
+
+_warmup()
+
 # ==========================
 # STATE
 # ==========================
-if "questions" not in st.session_state:
-    st.session_state.questions = load_questions()
+if "order" not in st.session_state:
+    load_questions()
 if "idx" not in st.session_state:
     st.session_state.idx = 0
 if "score" not in st.session_state:
@@ -472,16 +911,63 @@ if "name" not in st.session_state:
     st.session_state.name = ""
 if "saved_pos" not in st.session_state:
     st.session_state.saved_pos = None
+if "pending_save" not in st.session_state:
+    st.session_state.pending_save = None
+if "save_msg" not in st.session_state:
+    st.session_state.save_msg = None
 if "started" not in st.session_state:
     st.session_state.started = False
 if "final10_played" not in st.session_state:
     st.session_state.final10_played = False
-
-TOTAL_QUESTIONS = len(st.session_state.questions)
+if "lb_page" not in st.session_state:
+    st.session_state.lb_page = 0
+if "lb_window" not in st.session_state:
+    st.session_state.lb_window = next(iter(LEADERBOARD_WINDOWS))
+if "perf" not in st.session_state:
+    st.session_state.perf = {}
+if "audio_seq" not in st.session_state:
+    st.session_state.audio_seq = 0
+if "audio_cmds" not in st.session_state:
+    st.session_state.audio_cmds = []
+if "bgm_started" not in st.session_state:
+    st.session_state.bgm_started = False
+if "bundle" not in st.session_state:
+    st.session_state.bundle = None
+
+TOTAL_QUESTIONS = len(st.session_state.order)
 if TOTAL_QUESTIONS == 0:
     st.error("No hay preguntas cargadas en data/preguntas.csv")
     st.stop()
 
+# ==========================
+# ADMIN: MÉTRICAS (?admin=metrics)
+# ==========================
+if SHOW_METRICS:
+    registry = _metrics()
+    st.markdown("## Métricas del proceso")
+    rates = registry.session_rates()
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Sesiones activas", len(rates))
+    m2.metric("Reruns/min (media)", f"{sum(rates.values()) / len(rates):.1f}" if rates else "0")
+    m3.metric("Reruns/min (máx.)", f"{max(rates.values()):.1f}" if rates else "0")
+    st.markdown("#### Fases (últimas muestras, ms)")
+    st.dataframe(registry.phase_summary(), use_container_width=True)
+    st.markdown("#### Payload enviado (bytes)")
+    st.dataframe(
+        [{"phase": k, "bytes": v} for k, v in sorted(registry.payload_totals().items())],
+        use_container_width=True
+    )
+    st.markdown(f"#### Arranque ({STARTUP_MODE}, ms)")
+    st.dataframe(
+        [{"step": k, "ms": round(v * 1000, 1)} for k, v in sorted(registry.startup_timings().items())],
+        use_container_width=True
+    )
+    if METRICS_PORT > 0:
+        st.caption(f"Prometheus: http://127.0.0.1:{METRICS_PORT}/metrics")
+    with st.expander("Formato Prometheus"):
+        st.code(registry.render(), language="text")
+    st.stop()
+
 # ==========================
 # LANDING
 # ==========================
@@ -501,11 +987,19 @@ if not st.session_state.started:
         b1, b2, b3 = st.columns([4, 2, 4])
         with b2:
             start = st.button("Comenzamos 🦊", key="start_btn")
+        bank_errors = _bank_watcher().last_errors
+        if SHOW_ADMIN and bank_errors:
+            st.warning(
+                f"preguntas.csv: {len(bank_errors)} filas descartadas\n\n"
+                + "\n".join(f"- {e}" for e in bank_errors[:20])
+            )
     if start:
         st.session_state.started = True
         st.session_state.start_time = datetime.now()
         st.session_state.final10_played = False
         st.rerun()
+    # desde el primer rerun del proceso hasta la primera portada lista
+    _metrics().startup("first_landing", time.perf_counter() - _RUN_STARTED)
     st.stop()
 
 # ==========================
@@ -517,57 +1011,84 @@ ql, qc, qr = st.columns([1, 10, 1])
 with qc:
     st.markdown(get_logo_html(360), unsafe_allow_html=True)
 
-# KPIs
-current_q = min(st.session_state.idx + 1, TOTAL_QUESTIONS)
-st.markdown(
-    "<div class='kpi-floating'>"
-    f"<div class='pill'>Preguntas: {current_q}/{TOTAL_QUESTIONS}</div>"
-    f"<div class='pill'>Puntos: <span class='score'>{st.session_state.score}</span></div>"
-    "</div>",
-    unsafe_allow_html=True
-)
+# modo offline: timer, zorro y sonidos corren en el navegador; el servidor
+# vuelve a correr recién con el lote de respuestas
+if QUIZ_MODE == "offline" and st.session_state.idx < TOTAL_QUESTIONS:
+    offline_quiz()
+    _perf_record("rerun", (time.perf_counter() - _RUN_STARTED) * 1000)
+    st.stop()
 
-# ====== Progreso del quiz (para el zorro) ======
-completed = st.session_state.idx  # preguntas finalizadas
-foxy_pct = int(100 * completed / TOTAL_QUESTIONS) if TOTAL_QUESTIONS > 0 else 0
+# Cada bloque es un fragmento: un tick del timer (o un cambio en el radio)
+# vuelve a ejecutar solo su fragmento, no el script completo.
+@_fragment()
+def kpi_pills() -> None:
+    current_q = min(st.session_state.idx + 1, TOTAL_QUESTIONS)
+    _emit(
+        "kpi_pills",
+        "<div class='kpi-floating'>"
+        f"<div class='pill'>Preguntas: {current_q}/{TOTAL_QUESTIONS}</div>"
+        f"<div class='pill'>Puntos: <span class='score'>{st.session_state.score}</span></div>"
+        "</div>",
+    )
 
-# ====== SOLO mostrar FOX ROAD durante el quiz (1) evita duplicado al final ======
-if st.session_state.idx < TOTAL_QUESTIONS:
-    st.markdown(foxy_scene_html(foxy_pct, trees=9), unsafe_allow_html=True)
+@_fragment()
+def fox_road() -> None:
+    # ====== Progreso del quiz (para el zorro) ======
+    completed = st.session_state.idx  # preguntas finalizadas
+    foxy_pct = int(100 * completed / TOTAL_QUESTIONS) if TOTAL_QUESTIONS > 0 else 0
+    show_foxy_road(foxy_pct)
+
+@_fragment(run_every=1 if TIMER_MODE == "server" else None)
+def timer_panel() -> None:
+    with _timed("timer"):
+        now = datetime.now()
+        elapsed = (now - st.session_state.start_time).total_seconds()
+        remaining = max(0, TIME_LIMIT - int(elapsed))
+        if TIMER_MODE == "server":
+            if not _HAS_FRAGMENTS:
+                _st_autorefresh()(interval=1000, key=f"tick_{st.session_state.idx}")
+            _emit("timer", f"**Tiempo:** <span class='timer'>{remaining:02d}s</span>")
+            timer_event = None
+        else:
+            timer_event = countdown_timer(max(0.0, TIME_LIMIT - elapsed))
+
+        # 5) Últimos 10s: pausar música base y reproducir suspenso
+        #    (el evento del navegador se valida contra el reloj del servidor)
+        in_final_stretch = 0 < remaining <= FINAL_STRETCH + (TIMER_GRACE if timer_event else 0)
+        if TIMER_MODE == "server" or timer_event in ("final10", "timeout"):
+            if in_final_stretch and (not st.session_state.final10_played) and (not st.session_state.answered):
+                pause_quiz_music()
+                play_final10()
+                st.session_state.final10_played = True
+
+        # Tiempo agotado -> avanza (rerun completo)
+        timed_out = remaining == 0 or (timer_event == "timeout" and elapsed >= TIME_LIMIT - TIMER_GRACE)
+        if timed_out and not st.session_state.answered:
+            log_answer(current_question(), None, elapsed, 0)
+            stop_final10()
+            resume_quiz_music()  # reanuda música al pasar de pregunta
+            st.session_state.idx += 1
+            st.session_state.start_time = datetime.now()
+            st.session_state.selected = None
+            st.session_state.answered = False
+            st.session_state.final10_played = False
+            st.rerun()
 
-    # ----- Timer y pregunta actual -----
-    now = datetime.now()
-    elapsed = (now - st.session_state.start_time).total_seconds()
-    remaining = max(0, TIME_LIMIT - int(elapsed))
-    try:
-        st_autorefresh = importlib.import_module("streamlit_autorefresh").st_autorefresh
-    except Exception:
-        def st_autorefresh(*args, **kwargs): return None
-    st_autorefresh(interval=1000, key=f"tick_{st.session_state.idx}")
-    st.markdown(f"**Tiempo:** <span class='timer'>{remaining:02d}s</span>", unsafe_allow_html=True)
-
-    # 5) Últimos 10s: pausar música base y reproducir suspenso
-    if (remaining <= 10) and (remaining > 0) and (not st.session_state.final10_played) and (not st.session_state.answered):
-        pause_quiz_music()
-        play_final10()
-        st.session_state.final10_played = True
-
-    # Tiempo agotado -> avanza
-    if remaining == 0 and not st.session_state.answered:
-        stop_final10()
-        resume_quiz_music()  # reanuda música al pasar de pregunta
-        st.session_state.idx += 1
-        st.session_state.start_time = datetime.now()
-        st.session_state.selected = None
-        st.session_state.answered = False
-        st.session_state.final10_played = False
-        st.rerun()
+    if SHOW_PERF:
+        perf = st.session_state.perf
+        st.caption(
+            f"⏱ tick {perf.get('timer', 0):.1f} ms · "
+            f"rerun completo {perf.get('rerun', 0):.1f} ms"
+        )
 
-    q = st.session_state.questions[st.session_state.idx]
-    st.subheader(q["question"])
+@_fragment()
+@_profiled("question")
+def question_panel() -> None:
+    q = current_question()
+    st.subheader(q.question)
     choice = st.radio(
         "Elegí una opción:",
-        options=list(enumerate(q["options"])),
+        options=list(enumerate(q.options)),
         format_func=lambda x: x[1],
         index=0 if st.session_state.selected is None else st.session_state.selected,
         disabled=st.session_state.answered
@@ -580,15 +1101,18 @@ if st.session_state.idx < TOTAL_QUESTIONS:
 
     if submit and not st.session_state.answered:
         st.session_state.answered = True
-        is_correct = (st.session_state.selected == q["answer"])
+        is_correct = (st.session_state.selected == q.answer)
         stop_final10()
         resume_quiz_music()  # vuelve la música normal tras responder
-        if is_correct:
-            pts = POINTS_CORRECT
-            if (TIME_LIMIT - remaining) <= BONUS_FAST_THRESHOLD:
-                pts += BONUS_FAST
+        # el tiempo se mide en el servidor, no se confía en el reloj del navegador
+        elapsed = (datetime.now() - st.session_state.start_time).total_seconds()
+        pts = score_answer(is_correct, elapsed)
+        log_answer(q, st.session_state.selected, elapsed, pts)
+        if pts:
             st.session_state.score += pts
             st.success(f"Correcto. Sumaste {pts} puntos.")
+        elif is_correct:
+            st.warning("Tiempo agotado.")
         else:
             st.error("Respuesta incorrecta.")
             play_quack()
@@ -612,12 +1136,21 @@ if st.session_state.idx < TOTAL_QUESTIONS:
             st.session_state.final10_played = False
             st.rerun()
 
+kpi_pills()
+
+# ====== SOLO mostrar FOX ROAD durante el quiz (1) evita duplicado al final ======
+if st.session_state.idx < TOTAL_QUESTIONS:
+    fox_road()
+    timer_panel()
+    question_panel()
+    _perf_record("rerun", (time.perf_counter() - _RUN_STARTED) * 1000)
+
 # ==========================
 # FINAL
 # ==========================
 if st.session_state.idx >= TOTAL_QUESTIONS:
     # zorro al 100% en pantalla final (1) solo una vez
-    st.markdown(foxy_scene_html(100, trees=9), unsafe_allow_html=True)
+    show_foxy_road(100)
 
     st.markdown("## Resultado final")
     total = st.session_state.score
@@ -649,6 +1182,26 @@ if st.session_state.idx >= TOTAL_QUESTIONS:
     else:
         st.balloons()
 
+    # Guardado en segundo plano: este fragmento consulta el Future sin bloquear
+    # el resto de la página y, al confirmarse, refresca la tabla.
+    @_fragment(run_every=0.25)
+    def save_status() -> None:
+        fut = st.session_state.pending_save
+        if fut is None:
+            return
+        if not _HAS_FRAGMENTS:
+            futures_wait([fut], timeout=30)
+        if not fut.done():
+            st.caption("Guardando puntaje…")
+            return
+        st.session_state.pending_save = None
+        try:
+            st.session_state.saved_pos = fut.result()
+            st.session_state.save_msg = ("ok", "Puntaje guardado en el ranking.")
+        except Exception as e:
+            st.session_state.save_msg = ("error", f"No se pudo guardar el ranking: {e}")
+        st.rerun()  # refresca la tabla con la posición del jugador
+
     # INPUT + BOTÓN (nombre obligatorio y campo BLANCO)
     col_input, col_btn = st.columns([2,1])
 
@@ -664,57 +1217,74 @@ if st.session_state.idx >= TOTAL_QUESTIONS:
 
     with col_btn:
         st.markdown("<div style='height: 14px'></div>", unsafe_allow_html=True)
-        if st.button("Guardar en Ranking", key="save_rank_btn", disabled=not _valid_name(name)):
+        saving = st.session_state.pending_save is not None
+        if st.button("Guardar en Ranking", key="save_rank_btn", disabled=saving or not _valid_name(name)):
             if _valid_name(name):
-                try:
-                    save_score(name, total, rank)
-                    st.success("Puntaje guardado en el ranking.")
-                    st.session_state.name = name
-                    st.session_state.saved_pos = True
-                    st.rerun()  # refresca la tabla inmediatamente
-                except Exception as e:
-                    st.error(f"No se pudo guardar el ranking: {e}")
+                st.session_state.name = name
+                st.session_state.pending_save = submit_score(name, total, rank)
+                st.rerun()
             else:
                 st.error("El nombre no es válido. Solo letras y espacios.")
+        if st.session_state.save_msg:
+            kind, msg = st.session_state.save_msg
+            st.session_state.save_msg = None
+            (st.success if kind == "ok" else st.error)(msg)
 
-    # Ranking
-    ensure_leaderboard()
-    try:
-        df = pd.read_csv(LEADERBOARD_PATH)
-    except Exception:
-        df = pd.DataFrame(columns=["name", "rank", "score", "timestamp"])
+    if st.session_state.pending_save is not None:
+        save_status()
 
-    if not df.empty:
+    with _timed("leaderboard"):
+        # Ranking: Top N + la posición del jugador, solo del período elegido
         st.markdown("### 🏆 Ranking")
-        df = df.sort_values(["score", "timestamp"], ascending=[False, True]).reset_index(drop=True)
-
-        rows_html = []
-        for pos, (_, row) in enumerate(df.iterrows(), start=1):
-            name = str(row.get("name", ""))
-            rango = str(row.get("rank", ""))
-            puntaje = int(row.get("score", 0))
-            info = str(row.get("timestamp", ""))
-            cls = "leaderboard-row top5" if pos <= 5 else "leaderboard-row"
-            rows_html.append(
-                f"<tr class='{cls}'>"
-                f"<td class='pos'>#{pos}</td>"
-                f"<td>{name}</td>"
-                f"<td>{rango}</td>"
-                f"<td class='score-cell'>{puntaje}</td>"
-                f"<td class='ts'>{info}</td>"
-                f"</tr>"
-            )
-
-        table_html = (
-            "<div class='leaderboard-box'>"
-            "<table class='leaderboard-table'>"
-            "<thead><tr>"
-            "<th>#</th><th>Nombre</th><th>Rango</th><th>Puntaje</th><th>Información</th>"
-            "</tr></thead>"
-            f"<tbody>{''.join(rows_html)}</tbody>"
-            "</table>"
-            "</div>"
+        st.radio(
+            "Período",
+            list(LEADERBOARD_WINDOWS),
+            format_func=LEADERBOARD_WINDOWS.get,
+            key="lb_window",
+            horizontal=True,
+            label_visibility="collapsed",
+            on_change=lambda: st.session_state.update(lb_page=0),
         )
-        st.markdown(table_html, unsafe_allow_html=True)
-    else:
-        st.info("Aún no hay puntajes guardados.")
+        window = st.session_state.lb_window
+        board = ensure_leaderboard()
+        try:
+            top_rows = board.top(LEADERBOARD_TOP_N, window)
+            mine = board.around(st.session_state.saved_pos, window=window) if st.session_state.saved_pos else []
+        except Exception:
+            top_rows, mine = [], []
+
+        if top_rows:
+            shown = {r["id"] for r in top_rows}
+            rows = list(top_rows)
+            extra = [r for r in mine if r["id"] not in shown]
+            if extra:
+                if extra[0]["pos"] > rows[-1]["pos"] + 1:
+                    rows.append(None)  # separador "…"
+                rows.extend(extra)
+            st.markdown(leaderboard_table_html(rows, st.session_state.saved_pos), unsafe_allow_html=True)
+
+            total_rows = board.count(window)
+            if total_rows > LEADERBOARD_TOP_N:
+                with st.expander("Ver ranking completo"):
+                    pages = (total_rows + LEADERBOARD_PAGE_SIZE - 1) // LEADERBOARD_PAGE_SIZE
+                    page_no = min(st.session_state.lb_page, pages - 1)
+                    st.markdown(
+                        leaderboard_table_html(
+                            board.page(page_no, LEADERBOARD_PAGE_SIZE, window),
+                            st.session_state.saved_pos,
+                        ),
+                        unsafe_allow_html=True
+                    )
+                    p1, p2, p3 = st.columns([1, 2, 1])
+                    with p1:
+                        if st.button("← Anterior", key="lb_prev", disabled=page_no == 0):
+                            st.session_state.lb_page = page_no - 1
+                            st.rerun()
+                    with p2:
+                        st.caption(f"Página {page_no + 1} de {pages}")
+                    with p3:
+                        if st.button("Siguiente →", key="lb_next", disabled=page_no >= pages - 1):
+                            st.session_state.lb_page = page_no + 1
+                            st.rerun()
+        else:
+            st.info("Aún no hay puntajes en este período.")
@@ -0,0 +1,293 @@
+"""
+Micro-benchmarks de los caminos calientes, con datos sintéticos.
+
+Cubre la carga del banco y el orden de cada sesión (load_questions),
+_is_institutional, ensure_leaderboard (migración en frío y arranque en
+caliente), save_score, las consultas del ranking, get_rank, foxy_scene_html y
+la tabla HTML del ranking. Los tamaños van de 10 a 100k preguntas y de 100 a
+1M filas de ranking (--quick corta en 10k / 100k).
+
+Cada caso informa el mejor tiempo por llamada de varias repeticiones. Con
+--save se guardan como línea base; con --compare se comparan contra ella y
+el comando falla si algún caso empeoró más que --tolerance:
+
+    python bench.py --save                  # escribe bench_baseline.json
+    python bench.py --compare               # exit 1 si hay regresiones
+    python bench.py --quick --only leaderboard
+
+Las líneas base dependen de la máquina: conviene generarlas y compararlas en
+el mismo equipo (o el mismo runner de CI).
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import leaderboard
+import questions
+import render
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "bench_baseline.json")
+
+QUESTION_SIZES = (10, 1_000, 100_000)
+LEADERBOARD_SIZES = (100, 10_000, 1_000_000)
+QUICK_LIMIT_QUESTIONS = 10_000
+QUICK_LIMIT_ROWS = 100_000
+
+# tiempo mínimo de cada repetición (se ajusta la cantidad de llamadas)
+MIN_REPEAT_S = 0.05
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, setup: Callable[[], None] | None = None) -> float:
+    """
+    Mejor tiempo por llamada (segundos) de `repeat` repeticiones. Sin setup,
+    cada repetición encadena llamadas hasta durar MIN_REPEAT_S; con setup
+    (estado que la llamada consume), cada repetición es una sola llamada.
+    """
+    best = float("inf")
+    if setup is not None:
+        for _ in range(repeat):
+            setup()
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        return best
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= MIN_REPEAT_S or number >= 1 << 20:
+            break
+        number *= 2 if dt == 0 else max(2, int(MIN_REPEAT_S / dt) + 1)
+    best = dt / number
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best
+
+
+# ==========================
+# DATOS SINTÉTICOS
+# ==========================
+_WORDS = ("lote", "cuota", "cliente", "entrega", "financiación", "bonificación",
+          "escritura", "barrio", "servicios", "plano", "contrato", "reserva")
+
+
+def _question_text(rng: random.Random, i: int) -> str:
+    words = " ".join(rng.choice(_WORDS) for _ in range(12))
+    # ~1 de cada 8 menciona un término institucional
+    tail = " de Terraloteos" if i % 8 == 0 else ""
+    return f"¿Pregunta {i}: {words}{tail}?"
+
+
+def write_questions_csv(path: str, n: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["question", "option1", "option2", "option3", "option4", "answer_index", "category"])
+        for i in range(n):
+            w.writerow([
+                _question_text(rng, i),
+                *(f"Opción {k} de la pregunta {i}" for k in range(1, 5)),
+                rng.randrange(4),
+                rng.choice(("institucional", "comercial", "postventa", "")),
+            ])
+
+
+def write_leaderboard_csv(path: str, n: int, seed: int = 0) -> None:
+    """CSV legado (timestamps "09/09/2025 at:10:15a.m") como el que migra ensure_db."""
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["name", "score", "rank", "timestamp"])
+        for i in range(n):
+            score = rng.randrange(0, 200)
+            hour, minute = rng.randrange(1, 13), rng.randrange(60)
+            w.writerow([
+                f"Jugador {i}", f" {score}", render.get_rank(score),
+                f"{rng.randrange(1, 29):02d}/{rng.randrange(1, 13):02d}/2025 "
+                f"at:{hour:02d}:{minute:02d}{rng.choice(('a', 'p'))}.m",
+            ])
+
+
+def sample_rows(n: int, seed: int = 0) -> List[Dict[str, object]]:
+    rng = random.Random(seed)
+    return [
+        {"id": i, "pos": i, "name": f"Jugador {i}", "score": rng.randrange(200),
+         "rank": "Asesor Jr.", "timestamp": "2025-09-09T10:15:00"}
+        for i in range(1, n + 1)
+    ]
+
+
+# ==========================
+# CASOS
+# ==========================
+Case = Tuple[str, str, int, Callable[[], float]]  # (grupo, nombre, tamaño, medir)
+
+
+def question_cases(tmp: str, sizes: Sequence[int]) -> List[Case]:
+    cases: List[Case] = []
+    for n in sizes:
+        path = os.path.join(tmp, f"preguntas-{n}.csv")
+        write_questions_csv(path, n)
+        bank = questions.load_bank(path)
+        texts = [(q.question, q.category) for q in bank.questions]
+        rng = random.Random(1)
+
+        def is_institutional(texts=texts):
+            for question, category in texts:
+                questions._is_institutional(question, category)
+
+        cases += [
+            ("questions", "load_bank", n, lambda path=path: measure(lambda: questions.load_bank(path), repeat=3)),
+            # lo que hace load_questions en cada sesión nueva: orden completo y quiz de 20
+            ("questions", "load_questions", n, lambda bank=bank: measure(lambda: bank.sample(0, "institutional_first", rng))),
+            ("questions", "load_questions_k20", n,
+             lambda bank=bank: measure(lambda: bank.sample(20, "stratified", rng))),
+            ("questions", "_is_institutional", n, lambda f=is_institutional: measure(f, repeat=3)),
+        ]
+    return cases
+
+
+def leaderboard_cases(tmp: str, sizes: Sequence[int]) -> List[Case]:
+    cases: List[Case] = []
+    for n in sizes:
+        base = os.path.join(tmp, f"lb-{n}")
+        os.makedirs(base, exist_ok=True)
+        csv_path = os.path.join(base, "leaderboard.csv")
+        write_leaderboard_csv(csv_path, n)
+        db_path = os.path.join(base, "leaderboard.db")
+        cold_db = os.path.join(base, "cold.db")
+
+        def reset_cold(cold_db=cold_db):
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(cold_db + suffix):
+                    os.remove(cold_db + suffix)
+
+        board = leaderboard.SqliteLeaderboard(db_path, csv_path)
+        board.ensure()
+        writer = leaderboard.ScoreWriter(board)
+        mid = max(1, n // 2)
+        repeat = 1 if n >= 1_000_000 else 3
+
+        cases += [
+            ("leaderboard", "ensure_leaderboard_cold", n,
+             lambda cold_db=cold_db, csv_path=csv_path, reset=reset_cold, repeat=repeat: measure(
+                 lambda: leaderboard.SqliteLeaderboard(cold_db, csv_path).ensure(), repeat=repeat, setup=reset)),
+            ("leaderboard", "ensure_leaderboard_warm", n, lambda board=board: measure(board.ensure)),
+            ("leaderboard", "save_score", n,
+             lambda writer=writer: measure(lambda: writer.submit("Bench", 100, "Maestro Terra").result(timeout=30))),
+            ("leaderboard", "top_around_count", n,
+             lambda board=board, mid=mid: measure(lambda: (board.top(5), board.around(mid), board.count()))),
+            ("leaderboard", "top_week", n, lambda board=board: measure(lambda: board.top(5, "week"))),
+        ]
+    return cases
+
+
+def render_cases() -> List[Case]:
+    scores = list(range(0, 200))
+    cases: List[Case] = [
+        ("render", "get_rank", len(scores), lambda: measure(lambda: [render.get_rank(s) for s in scores])),
+        ("render", "foxy_scene_html", 9, lambda: measure(lambda: render.foxy_scene_html(57, trees=9))),
+    ]
+    for n in (10, 20, 1_000):
+        rows = sample_rows(n)
+        cases.append(("render", "leaderboard_table_html", n,
+                      lambda rows=rows: measure(lambda: render.leaderboard_table_html(rows, me_id=3))))
+    return cases
+
+
+# ==========================
+# LÍNEA BASE
+# ==========================
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Casos más lentos que baseline * (1 + tolerance)."""
+    bad = []
+    for key, seconds in sorted(results.items()):
+        ref = baseline.get(key)
+        if ref and seconds > ref * (1 + tolerance):
+            bad.append(f"{key}: {_fmt(seconds)} (base {_fmt(ref)}, +{(seconds / ref - 1) * 100:.0f}%)")
+    return bad
+
+
+def _fmt(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="bench.py", description="Micro-benchmarks con línea base")
+    parser.add_argument("--quick", action="store_true", help="hasta 10k preguntas y 100k filas")
+    parser.add_argument("--only", default=None, help="solo un grupo: questions | leaderboard | render")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="guarda los resultados como línea base")
+    parser.add_argument("--compare", action="store_true", help="falla si algo empeoró más que --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="margen de regresión (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    q_sizes = [n for n in QUESTION_SIZES if not args.quick or n <= QUICK_LIMIT_QUESTIONS]
+    lb_sizes = [n for n in LEADERBOARD_SIZES if not args.quick or n <= QUICK_LIMIT_ROWS]
+    tmp = tempfile.mkdtemp(prefix="terra-bench-")
+    results: Dict[str, float] = {}
+    try:
+        groups = {
+            "questions": lambda: question_cases(tmp, q_sizes),
+            "leaderboard": lambda: leaderboard_cases(tmp, lb_sizes),
+            "render": render_cases,
+        }
+        for group, build in groups.items():
+            if args.only and group != args.only:
+                continue
+            for grp, name, size, run in build():
+                key = f"{grp}.{name}[{size}]"
+                results[key] = run()
+                print(f"{key:<52} {_fmt(results[key]):>12}", flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.save:
+        data = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                old = json.load(f).get("results", {})
+            # --only / --quick actualizan solo sus casos
+            data["results"] = {**old, **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"{args.baseline}: {len(results)} casos guardados")
+
+    if args.compare:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)["results"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"{args.baseline}: no hay línea base ({e})", file=sys.stderr)
+            return 2
+        bad = compare(results, baseline, args.tolerance)
+        for line in bad:
+            print(f"REGRESIÓN {line}", file=sys.stderr)
+        missing = sorted(set(results) - set(baseline))
+        if missing:
+            print(f"sin línea base: {', '.join(missing)}", file=sys.stderr)
+        return 1 if bad else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
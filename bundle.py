@@ -0,0 +1,148 @@
+"""
+Quiz offline: el navegador recibe el quiz entero una vez y devuelve todas las
+respuestas juntas al final.
+
+make_bundle arma el paquete que viaja al cliente: texto de cada pregunta con
+sus opciones ya mezcladas, sin la respuesta correcta. El token (qids, orden
+de opciones, sesión, emisión y un nonce) va firmado con HMAC-SHA256, así que
+al recibir las respuestas el servidor puede verificar que corresponden a un
+quiz que él emitió sin guardar nada más que el secreto.
+
+score_submission valida firma, vencimiento y tiempos, traduce cada opción
+elegida al índice original y puntúa con la misma función que el modo en
+vivo. Los tiempos los mide el navegador: se acotan a lo posible (cada uno a
+time_limit + grace, y la suma al tiempo real desde la emisión), pero no se
+puede probar que no se informaron de menos.
+"""
+import hashlib
+import hmac
+import json
+import math
+import random
+import secrets
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence
+
+from questions import Question
+
+BUNDLE_VERSION = 1
+# margen (s) entre emisión y envío, aparte del tiempo de las preguntas:
+# portada del quiz, latencia, pausas entre preguntas
+BUNDLE_SLACK_S = 300.0
+
+
+class BundleError(ValueError):
+    """Envío rechazado: firma, vencimiento o formato de las respuestas."""
+
+
+class ScoredAnswer(NamedTuple):
+    question: Question
+    selected: int | None  # índice en q.options (None: se venció el tiempo)
+    elapsed: float  # segundos
+    points: int
+
+
+def new_secret() -> bytes:
+    return secrets.token_bytes(32)
+
+
+def _canonical(token: Dict[str, Any]) -> bytes:
+    return json.dumps(token, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def sign(token: Dict[str, Any], secret: bytes) -> str:
+    return hmac.new(secret, _canonical(token), hashlib.sha256).hexdigest()
+
+
+def make_bundle(picked: Sequence[Question], secret: bytes, session: str = "",
+                rng: random.Random | None = None, now: float | None = None) -> Dict[str, Any]:
+    """
+    Paquete para el cliente: {"token", "sig", "items"}. items[i] tiene el
+    texto y las opciones en el orden que se muestran; token["q"][i] es
+    [qid, orden] con orden[k] = índice original de la opción mostrada k.
+    """
+    rng = rng or random
+    entries, items = [], []
+    for q in picked:
+        perm = list(range(len(q.options)))
+        rng.shuffle(perm)
+        entries.append([q.qid, perm])
+        items.append({"text": q.question, "options": [q.options[j] for j in perm]})
+    token = {
+        "v": BUNDLE_VERSION,
+        "sid": session,
+        "iat": int(time.time() if now is None else now),
+        "nonce": secrets.token_hex(8),
+        "q": entries,
+    }
+    return {"token": token, "sig": sign(token, secret), "items": items}
+
+
+def verify(token: Any, sig: Any, secret: bytes) -> Dict[str, Any]:
+    """El token si la firma es válida; si no, BundleError."""
+    if not isinstance(token, dict) or not isinstance(sig, str):
+        raise BundleError("paquete incompleto")
+    if not hmac.compare_digest(sign(token, secret), sig):
+        raise BundleError("firma inválida")
+    if token.get("v") != BUNDLE_VERSION:
+        raise BundleError(f"versión {token.get('v')!r} no soportada")
+    return token
+
+
+def score_submission(
+    token: Any,
+    sig: Any,
+    answers: Any,
+    secret: bytes,
+    lookup: Callable[[str], Question | None],
+    score_fn: Callable[[bool, float], int],
+    time_limit: float,
+    grace: float = 1.0,
+    now: float | None = None,
+    slack: float = BUNDLE_SLACK_S,
+) -> List[ScoredAnswer]:
+    """
+    Puntúa un envío del cliente. answers: una entrada por pregunta del token,
+    {"choice": índice mostrado o None, "ms": tiempo de respuesta}.
+    lookup(qid) devuelve la pregunta tal como se emitió.
+    """
+    token = verify(token, sig, secret)
+    now = time.time() if now is None else now
+    entries = token.get("q") or []
+    age = now - float(token.get("iat", 0))
+    if age < -5:
+        raise BundleError("emitido en el futuro")
+    if age > len(entries) * (time_limit + grace) + slack:
+        raise BundleError("paquete vencido")
+    if not isinstance(answers, list) or len(answers) != len(entries):
+        raise BundleError(f"se esperaban {len(entries)} respuestas")
+
+    cap = time_limit + grace
+    out: List[ScoredAnswer] = []
+    total = 0.0
+    for (qid, perm), ans in zip(entries, answers):
+        q = lookup(qid)
+        if q is None:
+            raise BundleError(f"pregunta desconocida: {qid}")
+        if not isinstance(ans, dict):
+            raise BundleError("respuesta mal formada")
+        choice = ans.get("choice")
+        try:
+            ms = float(ans.get("ms", cap * 1000))
+        except (TypeError, ValueError):
+            raise BundleError("tiempo mal formado") from None
+        if not math.isfinite(ms):  # "nan" pasaría por max/min y rompería int(elapsed) al puntuar
+            raise BundleError("tiempo mal formado")
+        elapsed = min(max(ms, 0.0) / 1000, cap)
+        if choice is None:
+            selected = None
+        elif isinstance(choice, int) and 0 <= choice < len(perm):
+            selected = perm[choice]
+        else:
+            raise BundleError(f"opción inválida en {qid}")
+        total += elapsed
+        out.append(ScoredAnswer(q, selected, elapsed, score_fn(selected == q.answer, elapsed)))
+    # el cliente no puede haber tardado más que el tiempo real desde la emisión
+    if total > age + grace * len(entries) + 5:
+        raise BundleError("tiempos inconsistentes")
+    return out
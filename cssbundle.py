@@ -0,0 +1,100 @@
+"""
+Hoja de estilos minificada y con hash del contenido.
+
+make_bundle junta y minifica los CSS de la app (assets/styles.css y el bloque
+del fondo) y calcula su hash. app.py lo inyecta como <style> una sola vez por
+sesión en el <head> del documento (ver load_css): los reruns siguientes no lo
+reenvían, salvo que cambie el hash.
+
+    python cssbundle.py                 # escribe static/styles.<hash>.min.css
+
+El CLI deja el bundle de styles.css en un archivo para revisarlo o servirlo
+desde otro lado e informa cuánto se achicó; la app no lo usa.
+
+El minificador es conservador: saca comentarios y espacios sobrantes, pero
+no toca strings ni el contenido de url(...).
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+from typing import NamedTuple, Sequence
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PREFIX = "styles"
+
+# strings, url(...) y comentarios; lo demás se compacta
+_TOKEN_RE = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\([^)]*\))|/\*.*?\*/""", re.S)
+_SPACE_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"\s*([{};,>])\s*")
+_COLON_RE = re.compile(r":\s+")
+
+
+class Bundle(NamedTuple):
+    css: str
+    digest: str  # sha256 del css (12 caracteres)
+
+    @property
+    def filename(self) -> str:
+        return f"{PREFIX}.{self.digest}.min.css"
+
+
+def minify(css: str) -> str:
+    kept = []
+
+    def protect(m: re.Match) -> str:
+        if not m.group(1):  # comentario
+            return " "
+        kept.append(m.group(1))  # string o url(): tal cual
+        return f"\0{len(kept) - 1}\0"
+
+    code = _TOKEN_RE.sub(protect, css)
+    code = _SPACE_RE.sub(" ", code)
+    code = _PUNCT_RE.sub(r"\1", code)
+    code = _COLON_RE.sub(":", code).replace(";}", "}").strip()
+    return re.sub(r"\0(\d+)\0", lambda m: kept[int(m.group(1))], code)
+
+
+def make_bundle(*parts: str) -> Bundle:
+    css = "".join(minify(p) for p in parts if p)
+    return Bundle(css, hashlib.sha256(css.encode("utf-8")).hexdigest()[:12])
+
+
+def publish(bundle: Bundle, static_dir: str, prune: bool = True) -> str:
+    """Escribe el bundle en static_dir (si no estaba) y devuelve el nombre; prune borra versiones viejas."""
+    name = bundle.filename
+    dest = os.path.join(static_dir, name)
+    if not os.path.exists(dest):
+        os.makedirs(static_dir, exist_ok=True)
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(bundle.css)
+        os.replace(tmp, dest)
+    if prune:
+        old_re = re.compile(rf"^{PREFIX}\.[0-9a-f]{{12}}\.min\.css$")
+        for other in os.listdir(static_dir):
+            if other != name and old_re.match(other):
+                try:
+                    os.remove(os.path.join(static_dir, other))
+                except OSError:
+                    pass
+    return name
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="cssbundle.py", description="Minifica y publica la hoja de estilos")
+    parser.add_argument("--src", default=os.path.join(HERE, "assets", "styles.css"))
+    parser.add_argument("--out", default=os.path.join(HERE, "static"))
+    args = parser.parse_args(argv)
+
+    with open(args.src, encoding="utf-8") as f:
+        source = f.read()
+    bundle = make_bundle(source)
+    name = publish(bundle, args.out)
+    print(f"{os.path.join(args.out, name)}: {len(source.encode('utf-8'))} -> {len(bundle.css.encode('utf-8'))} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
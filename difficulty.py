@@ -0,0 +1,192 @@
+"""
+Dificultad y tiempo de respuesta por pregunta, acumulados en línea.
+
+Cada respuesta actualiza contadores de la pregunta en O(1): cantidad,
+aciertos y media/varianza de la latencia (Welford). No se recalcula nada
+sobre el historial. La dificultad es 1 - precisión suavizada con un prior,
+así una pregunta con pocas respuestas no salta a los extremos.
+
+Las estadísticas viven en memoria (una instancia por proceso) y un hilo de
+fondo las guarda cada tanto en data/difficulty.json. Si el archivo no existe
+se arrancan una vez desde el registro de respuestas (events.py).
+
+ORDERINGS reordena las preguntas ya elegidas de un quiz según la dificultad.
+"""
+import atexit
+import json
+import math
+import os
+import random
+import threading
+from array import array
+from typing import TYPE_CHECKING, Callable, Dict, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# prior de la precisión: equivale a PRIOR_WEIGHT respuestas con PRIOR_ACCURACY de aciertos
+PRIOR_ACCURACY = 0.6
+PRIOR_WEIGHT = 5.0
+
+
+class DifficultyStats:
+    """
+    Contadores por qid: [respuestas, aciertos, media_ms, m2_ms]. update() toma
+    un lock global apenas para unas sumas; las lecturas para ordenar un quiz
+    leen las listas sin lock (en el peor caso ven una respuesta de menos).
+    """
+
+    def __init__(self, path: str | None = None, save_every: float = 30.0):
+        self.path = path
+        self.save_every = save_every
+        self._stats: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        if path and os.path.exists(path):
+            try:
+                self.load(path)
+            except (OSError, ValueError):
+                pass  # archivo dañado: se reconstruye con las respuestas nuevas
+        if path:
+            self._thread = threading.Thread(target=self._run, name="terra-difficulty", daemon=True)
+            self._thread.start()
+            atexit.register(self.save)
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    def update(self, qid: str, correct: bool, elapsed_ms: float) -> None:
+        with self._lock:
+            s = self._stats.get(qid)
+            if s is None:
+                s = self._stats[qid] = [0.0, 0.0, 0.0, 0.0]
+            s[0] += 1
+            s[1] += 1 if correct else 0
+            delta = elapsed_ms - s[2]
+            s[2] += delta / s[0]
+            s[3] += delta * (elapsed_ms - s[2])
+            self._dirty = True
+
+    def answers(self, qid: str) -> int:
+        s = self._stats.get(qid)
+        return int(s[0]) if s else 0
+
+    def accuracy(self, qid: str) -> float:
+        """Precisión suavizada con el prior (PRIOR_ACCURACY sin respuestas)."""
+        s = self._stats.get(qid)
+        n, ok = (s[0], s[1]) if s else (0.0, 0.0)
+        return (ok + PRIOR_ACCURACY * PRIOR_WEIGHT) / (n + PRIOR_WEIGHT)
+
+    def difficulty(self, qid: str) -> float:
+        """0 = todos aciertan, 1 = nadie acierta."""
+        return 1.0 - self.accuracy(qid)
+
+    def latency(self, qid: str) -> Tuple[float, float]:
+        """(media, desvío) del tiempo de respuesta en ms; (nan, nan) sin datos."""
+        s = self._stats.get(qid)
+        if not s:
+            return math.nan, math.nan
+        std = math.sqrt(s[3] / (s[0] - 1)) if s[0] > 1 else 0.0
+        return s[2], std
+
+    # ---------- persistencia ----------
+    def snapshot(self) -> Dict[str, List[float]]:
+        with self._lock:
+            return {qid: list(s) for qid, s in self._stats.items()}
+
+    def load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            self._stats = {str(qid): [float(x) for x in s] for qid, s in data.items() if len(s) == 4}
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.save_every):
+            try:
+                self.save()
+            except OSError:
+                self._dirty = True
+
+    def seed(self, qid: "np.ndarray", correct: "np.ndarray", elapsed_ms: "np.ndarray") -> None:
+        """
+        Arranque desde eventos ya registrados (columnas de events.read_parts),
+        agregados por pregunta con np.bincount. Reemplaza lo que hubiera.
+        """
+        import numpy as np
+
+        if qid.size == 0:
+            return
+        uniques, codes = np.unique(qid, return_inverse=True)
+        lat = elapsed_ms.astype(np.float64)
+        n = np.bincount(codes)
+        ok = np.bincount(codes, weights=correct.astype(np.float64))
+        mean = np.bincount(codes, weights=lat) / n
+        m2 = np.bincount(codes, weights=(lat - mean[codes]) ** 2)
+        stats = {
+            (u.decode("ascii", "replace") if isinstance(u, bytes) else str(u)): [float(a), float(b), float(c), float(d)]
+            for u, a, b, c, d in zip(uniques, n, ok, mean, m2)
+        }
+        with self._lock:
+            self._stats = stats
+            self._dirty = True
+
+
+def _by_difficulty(indices: Sequence[int], qids: Dict[int, str], stats: DifficultyStats,
+                   rng: random.Random, jitter: float) -> List[int]:
+    # un poco de ruido para que dos sesiones no vean exactamente el mismo orden
+    return sorted(indices, key=lambda i: stats.difficulty(qids[i]) + rng.uniform(-jitter, jitter))
+
+
+def _order_ramp(indices, qids, stats, rng) -> List[int]:
+    """De la más fácil a la más difícil."""
+    return _by_difficulty(indices, qids, stats, rng, 0.05)
+
+
+def _order_mixed(indices, qids, stats, rng) -> List[int]:
+    """Alterna fáciles y difíciles: fácil, difícil, la siguiente fácil, ..."""
+    ranked = _by_difficulty(indices, qids, stats, rng, 0.05)
+    out: List[int] = []
+    lo, hi = 0, len(ranked) - 1
+    while lo <= hi:
+        out.append(ranked[lo])
+        if lo != hi:
+            out.append(ranked[hi])
+        lo, hi = lo + 1, hi - 1
+    return out
+
+
+ORDERINGS: Dict[str, Callable[[Sequence[int], Dict[int, str], DifficultyStats, random.Random], List[int]]] = {
+    "ramp": _order_ramp,
+    "mixed": _order_mixed,
+}
+
+
+def reorder(bank, order: array, stats: DifficultyStats, mode: str,
+            rng: random.Random | None = None, institutional_first: bool = False) -> array:
+    """
+    Reordena las preguntas ya elegidas de un quiz (order: índices del banco).
+    Con institutional_first se ordena cada bloque por separado y las
+    institucionales siguen yendo primero.
+    """
+    rng = rng or random
+    arrange = ORDERINGS[mode]
+    picked = {i: bank[i] for i in order}
+    qids = {i: q.qid for i, q in picked.items()}
+    if institutional_first:
+        blocks = [[i for i in order if picked[i].institutional], [i for i in order if not picked[i].institutional]]
+    else:
+        blocks = [list(order)]
+    return array(order.typecode, [i for block in blocks for i in arrange(block, qids, stats, rng)])
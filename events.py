@@ -0,0 +1,255 @@
+"""
+Registro de respuestas (un evento por pregunta respondida o vencida).
+
+Cada evento guarda la pregunta, la opción elegida, si fue correcta, el tiempo
+de respuesta medido en el servidor contra el límite y los puntos/bonus. Los
+eventos se encolan sin bloquear la sesión; un único hilo por proceso los junta
+y escribe cada lote como una parte columnar (.npz, un array por columna) en
+data/events/. `compact` une las partes en un solo archivo.
+
+El escritor compacta solo: cada compact_every partes propias (y al cambiar
+el día o cerrar) las une con su acumulado del día, así queda más o menos un
+archivo por proceso y por día. Toda compactación toma el mismo lock
+(.compact.lock), de modo que la automática y la de analytics.py no unen dos
+veces las mismas partes.
+
+Los reportes (precisión y latencia por pregunta) están en analytics.py.
+"""
+import atexit
+import contextlib
+import glob
+import io
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+# numpy se importa recién al escribir o leer partes (fuera del arranque de la app)
+if TYPE_CHECKING:
+    import numpy as np
+
+log = logging.getLogger(__name__)
+
+# columnas y tipos del formato en disco; qid y session son ids cortos en ASCII
+COLUMNS: Dict[str, str] = {
+    "ts":           "f8",   # epoch en segundos
+    "session":      "S12",
+    "qid":          "S12",
+    "selected":     "i1",   # índice de la opción elegida; -1 si se venció el tiempo
+    "correct":      "?",
+    "elapsed_ms":   "i4",
+    "time_limit_s": "i2",
+    "points":       "i2",
+    "bonus":        "i2",
+}
+
+PART_GLOB = "events-*.npz"
+LOCK_NAME = ".compact.lock"
+
+
+class AnswerEvent(NamedTuple):
+    ts: float
+    session: str
+    qid: str
+    selected: int
+    correct: bool
+    elapsed_ms: int
+    time_limit_s: int
+    points: int
+    bonus: int
+
+
+def to_columns(batch: List[AnswerEvent]) -> Dict[str, "np.ndarray"]:
+    """Pasa una lista de eventos a un array por columna."""
+    import numpy as np
+
+    cols = list(zip(*batch)) if batch else [()] * len(COLUMNS)
+    return {
+        name: np.asarray(
+            [v.encode("ascii", "replace")[:12] if isinstance(v, str) else v for v in values]
+            if dtype.startswith("S") else values,
+            dtype=dtype,
+        )
+        for (name, dtype), values in zip(COLUMNS.items(), cols)
+    }
+
+
+def write_part(path: str, columns: Dict[str, "np.ndarray"]) -> None:
+    """Escribe una parte .npz de forma atómica (tmp + rename)."""
+    import numpy as np
+
+    buf = io.BytesIO()
+    np.savez(buf, **columns)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(buf.getbuffer())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _concat(paths: List[str]) -> Dict[str, "np.ndarray"]:
+    import numpy as np
+
+    chunks: Dict[str, list] = {name: [] for name in COLUMNS}
+    for path in paths:
+        with np.load(path) as part:
+            for name in COLUMNS:
+                chunks[name].append(part[name])
+    return {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=COLUMNS[name])
+        for name, parts in chunks.items()
+    }
+
+
+def read_parts(events_dir: str) -> Dict[str, "np.ndarray"]:
+    """Todas las partes de events_dir concatenadas, columna por columna."""
+    return _concat(sorted(glob.glob(os.path.join(events_dir, PART_GLOB))))
+
+
+@contextlib.contextmanager
+def _compact_lock(events_dir: str) -> Iterator[None]:
+    """Lock de compactación entre procesos (espera si otro lo tiene)."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(events_dir, LOCK_NAME), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _merge(paths: Sequence[str], out_path: str) -> int:
+    """Une paths en out_path y los borra (con el lock tomado). Devuelve los eventos."""
+    merged = _concat(list(paths))
+    write_part(out_path, merged)
+    for path in paths:
+        if path != out_path:
+            os.remove(path)
+    return int(merged["ts"].size)
+
+
+def compact(events_dir: str) -> Tuple[int, int]:
+    """
+    Une las partes existentes en una sola y borra las originales.
+    Devuelve (partes unidas, eventos). Las partes nuevas que aparezcan
+    mientras tanto quedan para la próxima vez.
+    """
+    with _compact_lock(events_dir):
+        paths = sorted(glob.glob(os.path.join(events_dir, PART_GLOB)))
+        if len(paths) < 2:
+            return 0, 0
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        n = _merge(paths, os.path.join(events_dir, f"events-{stamp}-compact-{os.getpid()}.npz"))
+    return len(paths), n
+
+
+class EventLog:
+    """
+    Buffer de eventos con un hilo escritor. record() no bloquea; el hilo
+    escribe una parte cuando junta max_batch eventos o pasan max_wait
+    segundos desde el primero pendiente. Al salir del proceso se vacía.
+
+    Cada compact_every partes el hilo une las suyas con su acumulado del día
+    (las de otros procesos no las toca); compact_every=0 lo desactiva.
+    """
+
+    def __init__(self, events_dir: str, max_batch: int = 1000, max_wait: float = 2.0, compact_every: int = 50):
+        self.events_dir = events_dir
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.compact_every = compact_every
+        self._seq = 0
+        # pid + sufijo al azar: dos registros del mismo proceso no pisan sus partes
+        self._tag = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        # partes propias sin compactar (la primera puede ser el acumulado) y su día
+        self._own: List[str] = []
+        self._own_day = ""
+        self._queue: "queue.Queue[AnswerEvent | None]" = queue.Queue()
+        os.makedirs(events_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="terra-event-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close, 5.0)
+
+    def record(self, event: AnswerEvent) -> None:
+        self._queue.put(event)
+
+    def close(self, timeout: float | None = None) -> None:
+        """Escribe lo pendiente y termina el hilo."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _next_batch(self, first: AnswerEvent) -> Tuple[List[AnswerEvent], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _flush(self, batch: List[AnswerEvent]) -> None:
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        if self._own and stamp[:8] != self._own_day:
+            self._compact_own()  # cierra el día anterior
+            self._own = []
+        self._own_day = stamp[:8]
+        path = self._part_path(stamp)
+        try:
+            write_part(path, to_columns(batch))
+        except OSError:
+            # el registro es secundario: nunca debe tirar abajo el quiz
+            log.exception("events: no se pudo escribir %s", path)
+            return
+        self._own.append(path)
+        if self.compact_every and len(self._own) > self.compact_every:
+            # espera si otro proceso está compactando: este hilo no atiende sesiones
+            self._compact_own()
+
+    def _part_path(self, stamp: str) -> str:
+        self._seq += 1
+        return os.path.join(self.events_dir, f"events-{stamp}-{self._tag}-{self._seq:06d}.npz")
+
+    def _compact_own(self) -> None:
+        """Une las partes propias en una (el nuevo acumulado del día)."""
+        try:
+            with _compact_lock(self.events_dir):
+                # analytics.py compact puede haberse llevado alguna
+                paths = [p for p in self._own if os.path.exists(p)]
+                if len(paths) < 2:
+                    self._own = paths
+                    return
+                out = self._part_path(os.path.basename(paths[0])[7:21])
+                _merge(paths, out)
+                self._own = [out]
+        except (OSError, ValueError):
+            log.exception("events: no se pudo compactar %s", self.events_dir)
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._next_batch(first)
+            self._flush(batch)
+            if stop:
+                break
+        if self.compact_every:
+            self._compact_own()
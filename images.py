@@ -0,0 +1,264 @@
+"""
+Variantes optimizadas de las imágenes grandes (memes de rango y fondo).
+
+`python images.py build` toma cada imagen de IMAGES desde assets/, la achica a
+los anchos de su lista (sin agrandar nunca), la recomprime en AVIF y WebP y
+deja los archivos con el hash del contenido en el nombre en static/img/, junto
+con static/img/manifest.json. Solo se regenera lo que cambió (por sha256 del
+original). La compilación necesita Pillow (pip install pillow); la app solo
+lee el manifest.
+
+La app arma con el manifest un <picture> con srcset por formato (memes) y
+reglas @media con image-set() (fondo). Sin manifest, o si una imagen no está
+en él, sigue usando el archivo original.
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import sys
+from typing import Any, Dict, List, Sequence
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# nombre lógico -> anchos a generar (px). Los memes se muestran a 380px (260px en
+# mobile) y el fondo cubre la ventana.
+IMAGES: Dict[str, Sequence[int]] = {
+    "aprendiz-terra": (260, 380, 760),
+    "asesor-jr": (260, 380, 760),
+    "asesor-senior": (260, 380, 760),
+    "maestro-terra": (260, 380, 760),
+    "background": (640, 1024, 1600, 2400),
+}
+SOURCE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+
+# formato -> (mime, opciones de Pillow); el orden es el de preferencia en <picture>
+FORMATS: Dict[str, tuple] = {
+    "avif": ("image/avif", {"quality": 50}),
+    "webp": ("image/webp", {"quality": 78, "method": 6}),
+}
+
+Manifest = Dict[str, Dict[str, Any]]
+
+
+def find_source(assets_dir: str, name: str) -> str:
+    """Ruta del original de `name` (primera extensión de SOURCE_EXTS que exista) o ""."""
+    for ext in SOURCE_EXTS:
+        path = os.path.join(assets_dir, name + ext)
+        if os.path.exists(path):
+            return path
+    return ""
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ==========================
+# COMPILACIÓN
+# ==========================
+def _available_formats(wanted: Sequence[str]) -> List[str]:
+    from PIL import features
+
+    out = []
+    for fmt in wanted:
+        if fmt not in FORMATS:
+            raise ValueError(f"formato desconocido: {fmt}")
+        if features.check(fmt):
+            out.append(fmt)
+    return out
+
+
+def _encode(img, fmt: str) -> bytes:
+    import io
+
+    buf = io.BytesIO()
+    img.save(buf, format=fmt.upper(), **FORMATS[fmt][1])
+    return buf.getvalue()
+
+
+def _build_one(src: str, name: str, widths: Sequence[int], formats: Sequence[str], out_dir: str) -> Dict[str, Any]:
+    from PIL import Image
+
+    with Image.open(src) as im:
+        im.load()
+        img = im.convert("RGBA" if im.mode in ("RGBA", "LA") or "transparency" in im.info else "RGB")
+    src_w, src_h = img.size
+    targets = sorted({min(w, src_w) for w in widths})
+    variants = []
+    for w in targets:
+        h = max(1, round(src_h * w / src_w))
+        resized = img if w == src_w else img.resize((w, h), Image.LANCZOS)
+        for fmt in formats:
+            data = _encode(resized, fmt)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            filename = f"{name}-{w}w.{digest}.{fmt}"
+            dest = os.path.join(out_dir, filename)
+            if not os.path.exists(dest):
+                tmp = f"{dest}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, dest)
+            variants.append({"file": filename, "format": fmt, "width": w, "height": h, "bytes": len(data)})
+    return {
+        "source": os.path.basename(src),
+        "source_hash": _sha256(src),
+        "source_bytes": os.path.getsize(src),
+        "width": src_w,
+        "height": src_h,
+        "variants": variants,
+    }
+
+
+def build(assets_dir: str, out_dir: str, formats: Sequence[str] = tuple(FORMATS),
+          images: Dict[str, Sequence[int]] = IMAGES, force: bool = False) -> Manifest:
+    """Genera las variantes que falten y reescribe el manifest. Devuelve el manifest."""
+    formats = _available_formats(formats)
+    if not formats:
+        raise RuntimeError("Pillow no puede escribir ninguno de los formatos pedidos")
+    os.makedirs(out_dir, exist_ok=True)
+    old = load_manifest(out_dir)
+    entries: Manifest = {}
+    for name, widths in images.items():
+        src = find_source(assets_dir, name)
+        if not src:
+            continue
+        prev = old.get(name)
+        if (not force and prev and prev.get("source_hash") == _sha256(src)
+                and sorted({v["format"] for v in prev["variants"]}) == sorted(formats)
+                and all(os.path.exists(os.path.join(out_dir, v["file"])) for v in prev["variants"])):
+            entries[name] = prev
+            continue
+        entries[name] = _build_one(src, name, widths, formats, out_dir)
+
+    keep = {v["file"] for e in entries.values() for v in e["variants"]}
+    for other in os.listdir(out_dir):
+        if other != MANIFEST_NAME and other not in keep and not other.endswith(".tmp"):
+            try:
+                os.remove(os.path.join(out_dir, other))
+            except OSError:
+                pass
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "images": entries}, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+    return entries
+
+
+# ==========================
+# LECTURA (app)
+# ==========================
+def load_manifest(out_dir: str) -> Manifest:
+    """Entradas del manifest de out_dir; {} si no hay o es de otra versión."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("images") or {}
+
+
+def _url(prefix: str, variant: Dict[str, Any]) -> str:
+    # el hash ya está en el nombre: cada versión tiene su propia URL
+    return f"{prefix}/{variant['file']}"
+
+
+def _by_format(entry: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for v in sorted(entry["variants"], key=lambda v: v["width"]):
+        groups.setdefault(v["format"], []).append(v)
+    return {fmt: groups[fmt] for fmt in FORMATS if fmt in groups}
+
+
+def pick(entry: Dict[str, Any], min_width: int, fmt: str = "webp") -> Dict[str, Any] | None:
+    """La variante más chica de `fmt` con al menos min_width (o la más grande)."""
+    group = _by_format(entry).get(fmt) or []
+    for v in group:
+        if v["width"] >= min_width:
+            return v
+    return group[-1] if group else None
+
+
+def srcset(entry: Dict[str, Any], fmt: str, prefix: str) -> str:
+    return ", ".join(f"{_url(prefix, v)} {v['width']}w" for v in _by_format(entry).get(fmt, []))
+
+
+def picture_html(entry: Dict[str, Any], prefix: str, sizes: str, alt: str = "", fallback_width: int = 0) -> str:
+    """<picture> con un <source> por formato; el <img> usa WebP de fallback_width."""
+    groups = _by_format(entry)
+    sources = [
+        f'<source type="{FORMATS[fmt][0]}" srcset="{srcset(entry, fmt, prefix)}" sizes="{sizes}"/>'
+        for fmt in groups
+    ]
+    fallback = pick(entry, fallback_width, "webp") or pick(entry, fallback_width, next(iter(groups)))
+    return (
+        "<picture>" + "".join(sources)
+        + f'<img src="{_url(prefix, fallback)}" width="{fallback["width"]}" height="{fallback["height"]}"'
+        f' alt="{html.escape(alt, quote=True)}" loading="lazy" decoding="async"/>'
+        "</picture>"
+    )
+
+
+def background_css(entry: Dict[str, Any], prefix: str, selector: str) -> str:
+    """
+    background-image por ancho de ventana: una regla base con la variante más
+    grande y una @media (max-width) por cada variante menor, cada una con
+    image-set() por formato (url() WebP antes, para navegadores sin image-set).
+    """
+    groups = _by_format(entry)
+    widths = sorted({v["width"] for v in entry["variants"]})
+
+    def rule(w: int) -> str:
+        chosen = [(fmt, next(v for v in groups[fmt] if v["width"] == w)) for fmt in groups
+                  if any(v["width"] == w for v in groups[fmt])]
+        plain = dict(chosen).get("webp") or chosen[-1][1]
+        options = ", ".join(f'url("{_url(prefix, v)}") type("{FORMATS[fmt][0]}")' for fmt, v in chosen)
+        return (f'{selector} {{ background-image: url("{_url(prefix, plain)}") !important;'
+                f" background-image: image-set({options}) !important; }}")
+
+    css = [rule(widths[-1])]
+    for w in reversed(widths[:-1]):
+        css.append(f"@media (max-width: {w}px) {{ {rule(w)} }}")
+    return "\n".join(css)
+
+
+# ==========================
+# CLI
+# ==========================
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="images.py", description="Variantes AVIF/WebP de las imágenes grandes")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="genera las variantes y static/img/manifest.json")
+    b.add_argument("--assets", default=os.path.join(HERE, "assets"))
+    b.add_argument("--out", default=os.path.join(HERE, "static", "img"))
+    b.add_argument("--formats", default=",".join(FORMATS), help="formatos separados por coma (avif,webp)")
+    b.add_argument("--force", action="store_true", help="regenera aunque el original no haya cambiado")
+    args = parser.parse_args(argv)
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("images.py build necesita Pillow (pip install pillow)", file=sys.stderr)
+        return 2
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    entries = build(args.assets, args.out, formats, force=args.force)
+    for name, e in sorted(entries.items()):
+        sizes = [v["bytes"] / 1024 for v in e["variants"]]
+        print(f"{name:<16} {e['source']:<22} {e['source_bytes'] / 1024:8.0f} KB -> "
+              f"{len(sizes)} variantes de {min(sizes):.0f} a {max(sizes):.0f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
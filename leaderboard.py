@@ -0,0 +1,756 @@
+"""
+Ranking de Terraloteos.
+
+LeaderboardBackend define la interfaz (agregar, Top N, posición de un
+jugador, páginas) con tres implementaciones, elegidas con la variable
+LEADERBOARD_BACKEND (ver backend_from_env):
+
+  - "sqlite" (por defecto): SQLite en modo WAL. Cada puntaje es un INSERT
+    atómico y el índice (score DESC, timestamp) deja el ranking ordenado.
+  - "csv": el leaderboard.csv de siempre, solo agregando filas al final.
+  - "redis": sorted set compartido entre varias réplicas de la app; Top N y
+    posición en O(log n).
+
+ScoreWriter es una cola write-behind: un único hilo escritor junta los
+puntajes que llegan a la vez y los guarda por lotes. Cada envío devuelve un
+Future que se resuelve con el id recién cuando el lote quedó confirmado.
+
+Las consultas aceptan una ventana ("day", "week" o "all"). Cada fila guarda
+su día y su semana ISO, y hay un índice de ranking por ventana, así el
+ranking de la semana se lee sin tocar las semanas anteriores. Las semanas
+viejas se archivan a CSV (ver archive_old).
+"""
+import abc
+import csv
+import importlib
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+Entry = Tuple[str, int, str, str]  # (name, score, rank, timestamp ISO)
+
+WINDOWS = ("day", "week", "all")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    name      TEXT    NOT NULL,
+    score     INTEGER NOT NULL,
+    rank      TEXT    NOT NULL DEFAULT '',
+    timestamp TEXT    NOT NULL,
+    day       TEXT,
+    week      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_scores_ranking ON scores (score DESC, timestamp, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# ranking precalculado por ventana: índice (período, score DESC, timestamp, id)
+PARTITION_SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_scores_day  ON scores (day,  score DESC, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_scores_week ON scores (week, score DESC, timestamp, id);
+"""
+
+# "09/09/2025 at:10:15a.m" (formato cargado a mano en el CSV original)
+_LEGACY_TS_RE = re.compile(
+    r"^\s*(\d{1,2})/(\d{1,2})/(\d{4})\s*(?:at:?)?\s*(\d{1,2}):(\d{2})\s*([ap])\.?\s*m\.?\s*$",
+    re.IGNORECASE,
+)
+
+
+def connect(db_path: str, synchronous: str = "NORMAL") -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=10, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={synchronous}")
+    return conn
+
+
+def parse_timestamp(raw: Any) -> str:
+    """Normaliza un timestamp del CSV a ISO (segundos). Vacío si no se entiende."""
+    text = str(raw or "").strip()
+    if not text:
+        return ""
+    m = _LEGACY_TS_RE.match(text)
+    if m:
+        day, month, year, hour, minute, ampm = m.groups()
+        hour = int(hour) % 12 + (12 if ampm.lower() == "p" else 0)
+        try:
+            return datetime(int(year), int(month), int(day), hour, int(minute)).isoformat(timespec="seconds")
+        except ValueError:
+            return ""
+    try:
+        return datetime.fromisoformat(text).isoformat(timespec="seconds")
+    except ValueError:
+        return ""
+
+
+def period_keys(ts: str) -> Tuple[str, str]:
+    """(día "2025-09-09", semana ISO "2025-W37") de un timestamp ISO."""
+    try:
+        dt = datetime.fromisoformat(ts)
+    except (TypeError, ValueError):
+        dt = datetime(1970, 1, 1)
+    year, week, _ = dt.isocalendar()
+    return dt.date().isoformat(), f"{year}-W{week:02d}"
+
+
+def window_key(window: str, now: datetime | None = None) -> str | None:
+    """Clave del período vigente para la ventana (None para "all")."""
+    if window not in WINDOWS:
+        raise ValueError(f"ventana desconocida: {window!r}")
+    if window == "all":
+        return None
+    day, week = period_keys((now or datetime.now()).isoformat(timespec="seconds"))
+    return day if window == "day" else week
+
+
+def _migrate_partitions(conn: sqlite3.Connection) -> None:
+    """Agrega day/week a bases creadas antes del particionado y las completa."""
+    cols = {r["name"] for r in conn.execute("PRAGMA table_info(scores)")}
+    for col in ("day", "week"):
+        if col not in cols:
+            conn.execute(f"ALTER TABLE scores ADD COLUMN {col} TEXT")
+    pending = conn.execute("SELECT id, timestamp FROM scores WHERE day IS NULL OR week IS NULL").fetchall()
+    conn.executemany(
+        "UPDATE scores SET day = ?, week = ? WHERE id = ?",
+        [(*period_keys(r["timestamp"]), r["id"]) for r in pending],
+    )
+
+
+def _migrate_csv(conn: sqlite3.Connection, csv_path: str) -> int:
+    """Importa el leaderboard.csv viejo una sola vez (queda marcado en meta)."""
+    done = conn.execute("SELECT value FROM meta WHERE key = 'csv_migrated'").fetchone()
+    if done:
+        return 0
+    rows = []
+    if csv_path and os.path.exists(csv_path):
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                name = (row.get("name") or "").strip()
+                try:
+                    score = int(float(str(row.get("score", "")).strip()))
+                except (ValueError, OverflowError):  # vacío, texto, inf
+                    continue
+                if not name:
+                    continue
+                ts = parse_timestamp(row.get("timestamp")) or "1970-01-01T00:00:00"
+                rows.append((name[:40], score, (row.get("rank") or "").strip(), ts, *period_keys(ts)))
+    conn.executemany(
+        "INSERT INTO scores (name, score, rank, timestamp, day, week) VALUES (?, ?, ?, ?, ?, ?)", rows
+    )
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES ('csv_migrated', ?)",
+        (datetime.now().isoformat(timespec="seconds"),),
+    )
+    return len(rows)
+
+
+def ensure_db(db_path: str, csv_path: str | None = None) -> None:
+    """Crea el esquema y migra el CSV si hace falta."""
+    conn = connect(db_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _migrate_partitions(conn)
+            _migrate_csv(conn, csv_path or "")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.executescript(PARTITION_SCHEMA)
+    finally:
+        conn.close()
+
+
+def insert_many(conn: sqlite3.Connection, entries: Sequence[Tuple[str, int, str, str]]) -> List[int]:
+    """Inserta (name, score, rank, timestamp) en una sola transacción; devuelve los ids."""
+    ids = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for name, score, rank, ts in entries:
+            cur = conn.execute(
+                "INSERT INTO scores (name, score, rank, timestamp, day, week) VALUES (?, ?, ?, ?, ?, ?)",
+                (name.strip()[:40], int(score), rank, ts, *period_keys(ts)),
+            )
+            ids.append(int(cur.lastrowid))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return ids
+
+
+class ScoreWriter:
+    """
+    Cola write-behind para el ranking. submit() no bloquea: encola y devuelve
+    un Future. El hilo escritor espera hasta max_wait segundos para juntar
+    hasta max_batch puntajes y los confirma juntos con backend.add_many.
+    """
+
+    def __init__(self, backend: "LeaderboardBackend", max_batch: int = 200, max_wait: float = 0.05):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[Tuple[str, int, str, str], Future] | None]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="terra-score-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, name: str, score: int, rank: str, ts: str | None = None) -> Future:
+        fut: Future = Future()
+        ts = ts or datetime.now().isoformat(timespec="seconds")
+        self._queue.put(((name, int(score), rank, ts), fut))
+        return fut
+
+    def close(self, timeout: float | None = None) -> None:
+        """Procesa lo pendiente y termina el hilo."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _next_batch(self, first) -> Tuple[list, bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=max(0.0, remaining)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._next_batch(first)
+            live = [(entry, fut) for entry, fut in batch if fut.set_running_or_notify_cancel()]
+            try:
+                ids = self.backend.add_many([entry for entry, _ in live])
+            except Exception as e:
+                for _, fut in live:
+                    fut.set_exception(e)
+            else:
+                for (_, fut), entry_id in zip(live, ids):
+                    fut.set_result(entry_id)
+            if stop:
+                return
+
+
+_COLUMNS = "id, name, score, rank, timestamp"
+_ORDER = "score DESC, timestamp ASC, id ASC"
+
+# filas que van antes de (score, timestamp, id) en el ranking
+_AHEAD = "(score > ? OR (score = ? AND (timestamp < ? OR (timestamp = ? AND id < ?))))"
+# filas que van después
+_BEHIND = "(score < ? OR (score = ? AND (timestamp > ? OR (timestamp = ? AND id > ?))))"
+
+
+def _key_params(entry: sqlite3.Row) -> tuple:
+    s, ts, i = entry["score"], entry["timestamp"], entry["id"]
+    return (s, s, ts, ts, i)
+
+
+def _window_where(window: str, now: datetime | None) -> Tuple[str, tuple]:
+    """Filtro SQL de la ventana (las columnas day/week tienen su índice)."""
+    key = window_key(window, now)
+    if key is None:
+        return "", ()
+    return f"{window} = ? AND ", (key,)
+
+
+def top(db_path: str, n: int = 5, window: str = "all", now: datetime | None = None) -> List[Dict[str, Any]]:
+    """Los primeros n del ranking de la ventana, con su posición."""
+    where, params = _window_where(window, now)
+    conn = connect(db_path)
+    try:
+        cur = conn.execute(
+            f"SELECT {_COLUMNS} FROM scores WHERE {where}1 ORDER BY {_ORDER} LIMIT ?", params + (int(n),)
+        )
+        return [dict(r, pos=i) for i, r in enumerate(cur.fetchall(), start=1)]
+    finally:
+        conn.close()
+
+
+def count(db_path: str, window: str = "all", now: datetime | None = None) -> int:
+    where, params = _window_where(window, now)
+    conn = connect(db_path)
+    try:
+        return int(conn.execute(f"SELECT COUNT(*) FROM scores WHERE {where}1", params).fetchone()[0])
+    finally:
+        conn.close()
+
+
+def page(
+    db_path: str, page_no: int, size: int = 20, window: str = "all", now: datetime | None = None
+) -> List[Dict[str, Any]]:
+    """Página page_no (desde 0) del ranking de la ventana."""
+    where, params = _window_where(window, now)
+    offset = max(0, int(page_no)) * int(size)
+    conn = connect(db_path)
+    try:
+        cur = conn.execute(
+            f"SELECT {_COLUMNS} FROM scores WHERE {where}1 ORDER BY {_ORDER} LIMIT ? OFFSET ?",
+            params + (int(size), offset),
+        )
+        return [dict(r, pos=i) for i, r in enumerate(cur.fetchall(), start=offset + 1)]
+    finally:
+        conn.close()
+
+
+def around(
+    db_path: str, entry_id: int, radius: int = 2, window: str = "all", now: datetime | None = None
+) -> List[Dict[str, Any]]:
+    """
+    La fila entry_id con su posición y hasta `radius` vecinos de cada lado,
+    dentro de la ventana (vacío si la fila no pertenece a la ventana).
+    Usa el índice del ranking: no recorre la tabla completa.
+    """
+    where, params = _window_where(window, now)
+    conn = connect(db_path)
+    try:
+        entry = conn.execute(
+            f"SELECT {_COLUMNS} FROM scores WHERE {where}id = ?", params + (int(entry_id),)
+        ).fetchone()
+        if entry is None:
+            return []
+        key = params + _key_params(entry)
+        pos = int(conn.execute(f"SELECT COUNT(*) FROM scores WHERE {where}{_AHEAD}", key).fetchone()[0]) + 1
+        before = conn.execute(
+            f"SELECT {_COLUMNS} FROM scores WHERE {where}{_AHEAD} "
+            "ORDER BY score ASC, timestamp DESC, id DESC LIMIT ?",
+            key + (int(radius),),
+        ).fetchall()
+        after = conn.execute(
+            f"SELECT {_COLUMNS} FROM scores WHERE {where}{_BEHIND} ORDER BY {_ORDER} LIMIT ?",
+            key + (int(radius),),
+        ).fetchall()
+    finally:
+        conn.close()
+    rows = [dict(r, pos=pos - i) for i, r in enumerate(before, start=1)][::-1]
+    rows.append(dict(entry, pos=pos))
+    rows.extend(dict(r, pos=pos + i) for i, r in enumerate(after, start=1))
+    return rows
+
+
+ARCHIVE_COLUMNS = ["id", "name", "score", "rank", "timestamp"]
+
+
+def _write_archive(path: str, rows: Sequence[sqlite3.Row]) -> None:
+    """
+    Deja en path lo que ya tenía más `rows`, reemplazando el archivo de una
+    vez (temporal + os.replace). Las filas con el mismo id se descartan del
+    archivo viejo: son de una corrida que escribió el CSV y no llegó a
+    confirmar el DELETE, y así no quedan repetidas.
+    """
+    new_ids = {str(r["id"]) for r in rows}
+    kept: List[List[str]] = []
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            kept = [row for row in list(csv.reader(f))[1:] if row and row[0] not in new_ids]
+    except FileNotFoundError:
+        pass
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(ARCHIVE_COLUMNS)
+        w.writerows(kept)
+        w.writerows([r["id"], r["name"], r["score"], r["rank"], r["timestamp"]] for r in rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def archive_old(db_path: str, archive_dir: str, keep_weeks: int, now: datetime | None = None) -> int:
+    """
+    Mueve a archive_dir/leaderboard-<semana>.csv las filas de semanas anteriores
+    a las últimas keep_weeks y las borra de la base. Devuelve cuántas movió.
+    Los CSV se escriben antes del DELETE: si la transacción no se confirma,
+    las filas siguen en la base y la próxima corrida las vuelve a escribir
+    en su lugar, sin duplicarlas.
+    """
+    if keep_weeks <= 0:
+        return 0
+    cutoff = period_keys(((now or datetime.now()) - timedelta(weeks=keep_weeks)).isoformat())[1]
+    conn = connect(db_path, synchronous="FULL")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT {_COLUMNS}, week FROM scores WHERE week < ? ORDER BY week, {_ORDER}", (cutoff,)
+            ).fetchall()
+            by_week: Dict[str, list] = {}
+            for r in rows:
+                by_week.setdefault(r["week"], []).append(r)
+            if by_week:
+                os.makedirs(archive_dir, exist_ok=True)
+            for week, week_rows in by_week.items():
+                _write_archive(os.path.join(archive_dir, f"leaderboard-{week}.csv"), week_rows)
+            conn.execute("DELETE FROM scores WHERE week < ?", (cutoff,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return len(rows)
+
+
+# ==========================
+# BACKENDS
+# ==========================
+class LeaderboardBackend(abc.ABC):
+    """
+    Interfaz común. Las filas devueltas son dicts con id, name, score, rank,
+    timestamp y pos. `window` es "day", "week" o "all"; `now` fija el período
+    vigente (por defecto, el momento de la consulta).
+    """
+
+    def ensure(self) -> None:
+        """Crea lo que haga falta (esquema, migraciones). Idempotente."""
+
+    @abc.abstractmethod
+    def add_many(self, entries: Sequence[Entry]) -> List[int]:
+        """Guarda (name, score, rank, timestamp) juntos; devuelve los ids en el mismo orden."""
+
+    def add(self, name: str, score: int, rank: str, ts: str | None = None) -> int:
+        ts = ts or datetime.now().isoformat(timespec="seconds")
+        return self.add_many([(name, int(score), rank, ts)])[0]
+
+    @abc.abstractmethod
+    def top(self, n: int = 5, window: str = "all", now: datetime | None = None) -> List[Dict[str, Any]]:
+        """Los primeros n de la ventana."""
+
+    @abc.abstractmethod
+    def around(
+        self, entry_id: int, radius: int = 2, window: str = "all", now: datetime | None = None
+    ) -> List[Dict[str, Any]]:
+        """La fila entry_id y hasta radius vecinos de cada lado (vacío si no está en la ventana)."""
+
+    @abc.abstractmethod
+    def page(
+        self, page_no: int, size: int = 20, window: str = "all", now: datetime | None = None
+    ) -> List[Dict[str, Any]]:
+        """Página page_no (desde 0) de la ventana."""
+
+    @abc.abstractmethod
+    def count(self, window: str = "all", now: datetime | None = None) -> int:
+        """Filas de la ventana."""
+
+
+class SqliteLeaderboard(LeaderboardBackend):
+    """
+    Con archive_dir y keep_weeks > 0, las semanas más viejas que keep_weeks se
+    mueven a CSV por semana (a lo sumo una vez por día, al guardar). Lo
+    archivado deja de contar en todas las ventanas, también en "all".
+    """
+
+    def __init__(
+        self, db_path: str, csv_path: str | None = None, archive_dir: str | None = None, keep_weeks: int = 0
+    ):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.archive_dir = archive_dir
+        self.keep_weeks = keep_weeks
+        self._writer: sqlite3.Connection | None = None
+        self._writer_lock = threading.Lock()
+        self._archived_on: str | None = None
+
+    def ensure(self) -> None:
+        # no archiva: en el primer arranque acá se importa el CSV legado, y
+        # archivarlo en la misma llamada vaciaría el ranking recién migrado
+        ensure_db(self.db_path, self.csv_path)
+
+    def _maybe_archive(self) -> None:
+        if not self.archive_dir or self.keep_weeks <= 0:
+            return
+        today = window_key("day")
+        if self._archived_on == today:
+            return
+        self._archived_on = today
+        try:
+            moved = archive_old(self.db_path, self.archive_dir, self.keep_weeks)
+            if moved:
+                log.info("leaderboard: %d filas archivadas en %s", moved, self.archive_dir)
+        except (OSError, sqlite3.Error):
+            log.exception("leaderboard: no se pudo archivar")
+
+    def add_many(self, entries: Sequence[Entry]) -> List[int]:
+        # conexión de escritura persistente, con confirmación durable
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = connect(self.db_path, synchronous="FULL")
+            ids = insert_many(self._writer, entries)
+        self._maybe_archive()
+        return ids
+
+    def top(self, n: int = 5, window: str = "all", now: datetime | None = None) -> List[Dict[str, Any]]:
+        return top(self.db_path, n, window, now)
+
+    def around(
+        self, entry_id: int, radius: int = 2, window: str = "all", now: datetime | None = None
+    ) -> List[Dict[str, Any]]:
+        return around(self.db_path, entry_id, radius, window, now)
+
+    def page(
+        self, page_no: int, size: int = 20, window: str = "all", now: datetime | None = None
+    ) -> List[Dict[str, Any]]:
+        return page(self.db_path, page_no, size, window, now)
+
+    def count(self, window: str = "all", now: datetime | None = None) -> int:
+        return count(self.db_path, window, now)
+
+
+class CsvLeaderboard(LeaderboardBackend):
+    """
+    El leaderboard.csv original. Escribir es agregar líneas al final (no se
+    reescribe el archivo); el id de una fila es su número de orden. Las
+    lecturas recorren y ordenan todo el archivo (y filtran por ventana): sirve
+    para instalaciones chicas o de una sola réplica.
+    """
+
+    COLUMNS = ["name", "score", "rank", "timestamp"]
+
+    def __init__(self, csv_path: str):
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+
+    def ensure(self) -> None:
+        with self._lock:
+            if not os.path.exists(self.csv_path) or os.path.getsize(self.csv_path) == 0:
+                with open(self.csv_path, "w", newline="", encoding="utf-8") as f:
+                    csv.writer(f).writerow(self.COLUMNS)
+
+    def _iter_rows(self, window: str = "all", now: datetime | None = None) -> Iterator[Dict[str, Any]]:
+        """Filas válidas de la ventana, en el orden del archivo (sin pos)."""
+        key = window_key(window, now)
+        try:
+            with open(self.csv_path, newline="", encoding="utf-8") as f:
+                for i, row in enumerate(csv.DictReader(f), start=1):
+                    try:
+                        score = int(float(str(row.get("score", "")).strip()))
+                    except (ValueError, OverflowError):  # vacío, texto, inf
+                        continue
+                    ts = (row.get("timestamp") or "").strip()
+                    iso = parse_timestamp(ts) or ts
+                    if key is not None and key not in period_keys(iso):
+                        continue
+                    yield {
+                        "id": i,
+                        "name": (row.get("name") or "").strip(),
+                        "score": score,
+                        "rank": (row.get("rank") or "").strip(),
+                        "timestamp": ts,
+                        "_iso": iso,
+                    }
+        except FileNotFoundError:
+            return
+
+    def _rows(self, window: str = "all", now: datetime | None = None) -> List[Dict[str, Any]]:
+        rows = list(self._iter_rows(window, now))
+        rows.sort(key=lambda r: (-r["score"], r["_iso"], r["id"]))
+        for pos, r in enumerate(rows, start=1):
+            del r["_iso"]
+            r["pos"] = pos
+        return rows
+
+    def _count_lines(self) -> int:
+        try:
+            with open(self.csv_path, newline="", encoding="utf-8") as f:
+                return sum(1 for _ in csv.DictReader(f))
+        except FileNotFoundError:
+            return 0
+
+    def add_many(self, entries: Sequence[Entry]) -> List[int]:
+        with self._lock:
+            first = self._count_lines() + 1
+            with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                for name, score, rank, ts in entries:
+                    w.writerow([name.strip()[:40], int(score), rank, ts])
+                f.flush()
+                os.fsync(f.fileno())
+        return list(range(first, first + len(entries)))
+
+    def top(self, n: int = 5, window: str = "all", now: datetime | None = None) -> List[Dict[str, Any]]:
+        return self._rows(window, now)[:n]
+
+    def around(
+        self, entry_id: int, radius: int = 2, window: str = "all", now: datetime | None = None
+    ) -> List[Dict[str, Any]]:
+        rows = self._rows(window, now)
+        for i, r in enumerate(rows):
+            if r["id"] == entry_id:
+                return rows[max(0, i - radius):i + radius + 1]
+        return []
+
+    def page(
+        self, page_no: int, size: int = 20, window: str = "all", now: datetime | None = None
+    ) -> List[Dict[str, Any]]:
+        start = max(0, int(page_no)) * size
+        return self._rows(window, now)[start:start + size]
+
+    def count(self, window: str = "all", now: datetime | None = None) -> int:
+        # las mismas filas que top/around: una con puntaje ilegible no cuenta
+        return sum(1 for _ in self._iter_rows(window, now))
+
+
+class RedisLeaderboard(LeaderboardBackend):
+    """
+    Ranking en sorted sets de Redis, compartidos por todas las réplicas.
+
+    Claves (con prefix): "<p>:seq" contador de ids, "<p>:e:<id>" hash con la
+    fila, "<p>:rank" el sorted set histórico y "<p>:rank:day:<día>" /
+    "<p>:rank:week:<semana>" los de cada ventana, que vencen solos (EXPIRE)
+    cuando el período ya no se consulta. El score del set combina puntaje y
+    antigüedad (puntaje * 2^32 + (2^32 - 1 - epoch)), así ZREVRANGE devuelve el
+    mismo orden que SQLite; en el mismo segundo desempata el miembro, que es
+    el id invertido y con ceros (el id más chico queda primero).
+
+    `client` permite inyectar un cliente ya armado (por ejemplo
+    fakeredis.FakeRedis() para pruebas); si no, se conecta a `url`.
+    """
+
+    _ID_SPACE = 10 ** 12
+    # vida de los sets por ventana, con un período de margen
+    _WINDOW_TTL = {"day": 2 * 86400, "week": 2 * 7 * 86400}
+
+    def __init__(self, url: str = "redis://localhost:6379/0", client: Any = None, prefix: str = "terra:lb"):
+        if client is None:
+            try:
+                redis = importlib.import_module("redis")
+            except ImportError as e:
+                raise RuntimeError("LEADERBOARD_BACKEND=redis necesita el paquete 'redis' (pip install redis)") from e
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.r = client
+        self.prefix = prefix
+
+    def _key(self, *parts: Any) -> str:
+        return ":".join([self.prefix, *map(str, parts)])
+
+    def _rank_key(self, window: str, now: datetime | None) -> str:
+        key = window_key(window, now)
+        return self._key("rank") if key is None else self._key("rank", window, key)
+
+    def _member(self, entry_id: int) -> str:
+        return f"{self._ID_SPACE - int(entry_id):012d}"
+
+    def _entry_id(self, member: Any) -> int:
+        if isinstance(member, bytes):
+            member = member.decode()
+        return self._ID_SPACE - int(member)
+
+    @staticmethod
+    def _sort_score(score: int, ts: str) -> float:
+        iso = parse_timestamp(ts)
+        epoch = int(datetime.fromisoformat(iso).timestamp()) if iso else 0
+        epoch = max(0, min(epoch, 2 ** 32 - 1))
+        return float(int(score) * 2 ** 32 + (2 ** 32 - 1 - epoch))
+
+    def add_many(self, entries: Sequence[Entry]) -> List[int]:
+        if not entries:
+            return []
+        last = int(self.r.incrby(self._key("seq"), len(entries)))
+        ids = list(range(last - len(entries) + 1, last + 1))
+        pipe = self.r.pipeline(transaction=True)
+        touched = set()
+        for entry_id, (name, score, rank, ts) in zip(ids, entries):
+            pipe.hset(self._key("e", entry_id), mapping={
+                "name": name.strip()[:40], "score": int(score), "rank": rank, "timestamp": ts,
+            })
+            member = {self._member(entry_id): self._sort_score(score, ts)}
+            pipe.zadd(self._key("rank"), member)
+            day, week = period_keys(parse_timestamp(ts) or ts)
+            for window, period in (("day", day), ("week", week)):
+                key = self._key("rank", window, period)
+                pipe.zadd(key, member)
+                touched.add((key, self._WINDOW_TTL[window]))
+        for key, ttl in touched:
+            pipe.expire(key, ttl)
+        pipe.execute()
+        return ids
+
+    def _rows(self, members: Iterable[Any], first_pos: int) -> List[Dict[str, Any]]:
+        ids = [self._entry_id(m) for m in members]
+        pipe = self.r.pipeline(transaction=False)
+        for entry_id in ids:
+            pipe.hgetall(self._key("e", entry_id))
+        rows = []
+        for pos, (entry_id, h) in enumerate(zip(ids, pipe.execute()), start=first_pos):
+            h = {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+                 for k, v in (h or {}).items()}
+            rows.append({
+                "id": entry_id,
+                "name": h.get("name", ""),
+                "score": int(h.get("score", 0) or 0),
+                "rank": h.get("rank", ""),
+                "timestamp": h.get("timestamp", ""),
+                "pos": pos,
+            })
+        return rows
+
+    def top(self, n: int = 5, window: str = "all", now: datetime | None = None) -> List[Dict[str, Any]]:
+        return self._rows(self.r.zrevrange(self._rank_key(window, now), 0, int(n) - 1), 1)
+
+    def around(
+        self, entry_id: int, radius: int = 2, window: str = "all", now: datetime | None = None
+    ) -> List[Dict[str, Any]]:
+        key = self._rank_key(window, now)
+        idx = self.r.zrevrank(key, self._member(entry_id))
+        if idx is None:
+            return []
+        start = max(0, int(idx) - radius)
+        return self._rows(self.r.zrevrange(key, start, int(idx) + radius), start + 1)
+
+    def page(
+        self, page_no: int, size: int = 20, window: str = "all", now: datetime | None = None
+    ) -> List[Dict[str, Any]]:
+        start = max(0, int(page_no)) * size
+        return self._rows(self.r.zrevrange(self._rank_key(window, now), start, start + size - 1), start + 1)
+
+    def count(self, window: str = "all", now: datetime | None = None) -> int:
+        return int(self.r.zcard(self._rank_key(window, now)))
+
+
+def backend_from_env(data_dir: str, env: Dict[str, str] | None = None) -> LeaderboardBackend:
+    """
+    LEADERBOARD_BACKEND = sqlite (default) | csv | redis
+    REDIS_URL para redis (default redis://localhost:6379/0).
+    LEADERBOARD_ARCHIVE_WEEKS semanas que quedan en SQLite antes de pasar a
+    data/archive (default 0: sin archivado).
+    """
+    env = os.environ if env is None else env
+    kind = (env.get("LEADERBOARD_BACKEND") or "sqlite").strip().lower()
+    csv_path = os.path.join(data_dir, "leaderboard.csv")
+    if kind == "csv":
+        return CsvLeaderboard(csv_path)
+    if kind == "redis":
+        return RedisLeaderboard(env.get("REDIS_URL") or "redis://localhost:6379/0")
+    if kind != "sqlite":
+        raise ValueError(f"LEADERBOARD_BACKEND desconocido: {kind!r}")
+    try:
+        keep_weeks = max(0, int(env.get("LEADERBOARD_ARCHIVE_WEEKS") or 0))
+    except ValueError:
+        keep_weeks = 0
+    return SqliteLeaderboard(
+        os.path.join(data_dir, "leaderboard.db"),
+        csv_path,
+        archive_dir=os.path.join(data_dir, "archive"),
+        keep_weeks=keep_weeks,
+    )
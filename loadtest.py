@@ -0,0 +1,239 @@
+"""
+Prueba de carga: N jugadores virtuales hacen el quiz completo contra app.py.
+
+Cada jugador es una sesión de streamlit.testing.v1.AppTest (la app corre en
+un proceso trabajador, sin navegador): entra por la portada, espera unos
+ticks del timer, responde cada pregunta y guarda su puntaje en el ranking.
+AppTest no es thread-safe, así que cada proceso juega de a un jugador por
+vez; --procs es la cantidad de jugadores simultáneos.
+
+Los datos van a una carpeta temporal (TERRA_DATA_DIR) con una copia de
+data/preguntas.csv: el ranking real no se toca.
+
+El resultado es un JSON (a --out o a la consola) para comparar versiones:
+latencia de cada rerun (p50/p90/p99), latencia de guardado en el ranking
+(contención del escritor), CPU, memoria por sesión y errores.
+
+    python loadtest.py --players 20
+    python loadtest.py --players 100 --procs 4 --ticks 2 --out carga.json
+
+En AppTest cada tick es un rerun completo (los fragmentos no se ejecutan
+aparte), así que las latencias son una cota superior de las del navegador.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(HERE, "app.py")
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    """count, media, p50/p90/p99 y máximo (ms) de una lista de muestras."""
+    if not values:
+        return {"count": 0}
+    s = sorted(values)
+
+    def pct(q: float) -> float:
+        return round(s[min(len(s) - 1, int(q * len(s)))], 3)
+
+    return {
+        "count": len(s),
+        "mean": round(sum(s) / len(s), 3),
+        "p50": pct(0.50),
+        "p90": pct(0.90),
+        "p99": pct(0.99),
+        "max": round(s[-1], 3),
+    }
+
+
+def _rss_kb() -> int:
+    """RSS actual en KB (Linux); si no hay /proc, el pico de getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _player_name(i: int) -> str:
+    # NAME_RE solo acepta letras y espacios
+    letters = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        letters = chr(ord("a") + r) + letters
+    return f"Jugador {letters}"
+
+
+def play(player: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Un quiz completo. Devuelve las latencias medidas y el error, si lo hubo."""
+    from streamlit.testing.v1 import AppTest
+
+    reruns: List[float] = []
+    result: Dict[str, Any] = {"player": player, "reruns_ms": reruns, "save_ms": None, "error": None}
+
+    def run(at):
+        t0 = time.perf_counter()
+        at.run(timeout=args.timeout)
+        reruns.append((time.perf_counter() - t0) * 1000)
+        if at.exception:
+            exc = at.exception[0]
+            raise RuntimeError(getattr(exc, "message", None) or str(exc))
+        return at
+
+    try:
+        at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+        run(at)
+        at.button(key="start_btn").click()
+        run(at)
+        total = len(at.session_state["order"])
+        while at.session_state["idx"] < total:
+            idx = at.session_state["idx"]
+            for _ in range(args.ticks):
+                if args.think:
+                    time.sleep(args.think)
+                run(at)
+            at.button(key=f"submit_{idx}").click()
+            run(at)
+        result["score"] = at.session_state["score"]
+
+        if args.save:
+            at.text_input[0].input(_player_name(player))
+            run(at)
+            at.button(key="save_rank_btn").click()
+            t0 = time.perf_counter()
+            run(at)
+            deadline = t0 + args.timeout
+            while at.session_state["saved_pos"] is None and time.perf_counter() < deadline:
+                time.sleep(0.01)
+                run(at)
+            if at.session_state["saved_pos"] is None:
+                raise RuntimeError("el puntaje no se confirmó a tiempo")
+            result["save_ms"] = (time.perf_counter() - t0) * 1000
+    except Exception as e:  # se reporta y sigue con los demás jugadores
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def play_measured(player: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """play() en el proceso trabajador, con la CPU y la memoria que usó."""
+    rss_before = _rss_kb()
+    peak = [rss_before]
+    stop = threading.Event()
+
+    def sample_rss():
+        while not stop.wait(0.2):
+            peak[0] = max(peak[0], _rss_kb())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    ru0 = resource.getrusage(resource.RUSAGE_SELF)
+    result = play(player, args)
+    ru1 = resource.getrusage(resource.RUSAGE_SELF)
+    stop.set()
+    result.update({
+        "pid": os.getpid(),
+        "cpu_s": (ru1.ru_utime - ru0.ru_utime) + (ru1.ru_stime - ru0.ru_stime),
+        "rss_before_kb": rss_before,
+        "rss_peak_kb": max(peak[0], _rss_kb()),
+    })
+    return result
+
+
+def _git_rev() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _prepare_env(args: argparse.Namespace, data_dir: str) -> None:
+    shutil.copy(args.csv, os.path.join(data_dir, "preguntas.csv"))
+    os.environ["TERRA_DATA_DIR"] = data_dir
+    os.environ["TERRA_TIMER_MODE"] = args.timer_mode
+    os.environ["TERRA_METRICS_PORT"] = "0"
+    if args.quiz_size:
+        os.environ["TERRA_QUIZ_SIZE"] = str(args.quiz_size)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="loadtest.py", description="Prueba de carga con jugadores virtuales")
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--procs", type=int, default=4, help="procesos trabajadores (jugadores simultáneos)")
+    parser.add_argument("--ticks", type=int, default=1, help="reruns de timer antes de cada respuesta")
+    parser.add_argument("--think", type=float, default=0.0, help="segundos entre ticks")
+    parser.add_argument("--quiz-size", type=int, default=0, help="TERRA_QUIZ_SIZE para la prueba")
+    parser.add_argument("--timer-mode", choices=("client", "server"), default="server")
+    parser.add_argument("--no-save", dest="save", action="store_false", help="no guarda en el ranking")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--csv", default=os.path.join(HERE, "data", "preguntas.csv"))
+    parser.add_argument("--out", default=None, help="archivo JSON de salida (por defecto, a la consola)")
+    args = parser.parse_args(argv)
+
+    data_dir = tempfile.mkdtemp(prefix="terra-loadtest-")
+    _prepare_env(args, data_dir)
+    procs = max(1, min(args.procs, args.players))
+
+    t0 = time.perf_counter()
+    try:
+        # un AppTest por proceso a la vez: cada trabajador juega sus jugadores en serie.
+        # La tarea se referencia como loadtest.play_measured y no desde __main__:
+        # AppTest reemplaza sys.modules["__main__"] por app.py en el trabajador.
+        task = importlib.import_module("loadtest").play_measured
+        with ProcessPoolExecutor(max_workers=procs) as pool:
+            results = list(pool.map(task, range(args.players), [args] * args.players))
+        wall = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    ok = [r for r in results if not r["error"]]
+    cpu = sum(r["cpu_s"] for r in results)
+    # crecimiento de cada trabajador desde su primer jugador hasta su pico
+    workers: Dict[int, List[int]] = {}
+    for r in results:
+        w = workers.setdefault(r["pid"], [r["rss_before_kb"], r["rss_peak_kb"]])
+        w[0], w[1] = min(w[0], r["rss_before_kb"]), max(w[1], r["rss_peak_kb"])
+    grown_kb = sum(peak - before for before, peak in workers.values())
+    reruns = [ms for r in results for ms in r["reruns_ms"]]
+    report = {
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("csv", "out")},
+        "players": args.players,
+        "completed": len(ok),
+        "errors": sorted({r["error"] for r in results if r["error"]}),
+        "wall_s": round(wall, 3),
+        "reruns_per_s": round(len(reruns) / wall, 2) if wall else None,
+        "rerun_ms": percentiles(reruns),
+        "save_ms": percentiles([r["save_ms"] for r in ok if r["save_ms"] is not None]),
+        "cpu_s": round(cpu, 3),
+        "cpu_ms_per_rerun": round(cpu * 1000 / len(reruns), 3) if reruns else None,
+        "procs": procs,
+        "rss_peak_mb": round(max(peak for _, peak in workers.values()) / 1024, 1),
+        "rss_kb_per_session": round(grown_kb / args.players, 1) if args.players else None,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0 if len(ok) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Métricas del proceso: duración de cada fase del rerun, reruns por sesión,
+sesiones activas, bytes de HTML enviados al navegador y tiempos del arranque.
+
+Registry es thread-safe y barato de actualizar (un lock, unas sumas). Se
+exporta en formato de texto de Prometheus con `render()`; `serve()` levanta
+un endpoint HTTP local (/metrics) en un hilo de fondo.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Tuple
+
+log = logging.getLogger(__name__)
+
+# límites de los histogramas, en segundos
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# una sesión cuenta como activa si tuvo un rerun en esta ventana
+ACTIVE_WINDOW_S = 120.0
+# ventana para la tasa de reruns por sesión
+RATE_WINDOW_S = 60.0
+# muestras recientes por fase para los percentiles de la página de admin
+RECENT_SAMPLES = 1024
+# cada cuánto rerun() barre las sesiones inactivas (sin scraper nadie más lo hace)
+PRUNE_EVERY_S = 30.0
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "n", "recent")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+        self.recent: Deque[float] = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.n += 1
+        self.recent.append(seconds)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases: Dict[str, _Histogram] = {}
+        self._payload: Dict[str, int] = {}
+        self._reruns: Dict[str, int] = {}
+        self._sessions: Dict[str, Deque[float]] = {}
+        self._startup: Dict[str, float] = {}
+        self._pruned_at = time.monotonic()
+        self.started = time.time()
+
+    # ---------- registro ----------
+    def observe(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            h = self._phases.get(phase)
+            if h is None:
+                h = self._phases[phase] = _Histogram()
+            h.observe(seconds)
+
+    def payload(self, phase: str, nbytes: int) -> None:
+        with self._lock:
+            self._payload[phase] = self._payload.get(phase, 0) + nbytes
+
+    def rerun(self, session_id: str, kind: str = "full") -> None:
+        """Un rerun de la sesión (kind: "full" o el nombre del fragmento)."""
+        now = time.monotonic()
+        with self._lock:
+            self._reruns[kind] = self._reruns.get(kind, 0) + 1
+            if kind == "full":
+                seen = self._sessions.get(session_id)
+                if seen is None:
+                    seen = self._sessions[session_id] = deque()
+                seen.append(now)
+                self._trim(seen, now)
+            if now - self._pruned_at > PRUNE_EVERY_S:
+                self._prune(now)
+
+    def startup(self, step: str, seconds: float, once: bool = True) -> None:
+        """Tiempo de un paso del arranque (imports, precalentado, primera portada)."""
+        with self._lock:
+            if once and step in self._startup:
+                return
+            self._startup[step] = seconds
+
+    @staticmethod
+    def _trim(seen: Deque[float], now: float) -> None:
+        while seen and now - seen[0] > max(RATE_WINDOW_S, ACTIVE_WINDOW_S):
+            seen.popleft()
+
+    def _prune(self, now: float) -> None:
+        """Saca las sesiones inactivas (con el lock tomado)."""
+        self._pruned_at = now
+        for sid in list(self._sessions):
+            seen = self._sessions[sid]
+            self._trim(seen, now)
+            if not seen or now - seen[-1] > ACTIVE_WINDOW_S:
+                del self._sessions[sid]
+
+    # ---------- lectura ----------
+    def session_rates(self) -> Dict[str, float]:
+        """Reruns completos por minuto de cada sesión activa."""
+        now = time.monotonic()
+        rates = {}
+        with self._lock:
+            self._prune(now)
+            for sid, seen in self._sessions.items():
+                recent = sum(1 for t in seen if now - t <= RATE_WINDOW_S)
+                rates[sid] = recent * 60.0 / RATE_WINDOW_S
+        return rates
+
+    def phase_summary(self) -> List[Dict[str, float]]:
+        """Por fase: cantidad, media y p50/p95/máximo de las últimas muestras (ms)."""
+        with self._lock:
+            items = [(name, h.n, h.total, sorted(h.recent)) for name, h in self._phases.items()]
+        out = []
+        for name, n, total, recent in sorted(items):
+            def pct(q: float) -> float:
+                return recent[min(len(recent) - 1, int(q * len(recent)))] * 1000 if recent else 0.0
+            out.append({
+                "phase": name, "count": n, "mean_ms": total / n * 1000 if n else 0.0,
+                "p50_ms": pct(0.5), "p95_ms": pct(0.95), "max_ms": recent[-1] * 1000 if recent else 0.0,
+            })
+        return out
+
+    def startup_timings(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._startup)
+
+    def payload_totals(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._payload)
+
+    def render(self) -> str:
+        """Todo en formato de texto de Prometheus (versión 0.0.4)."""
+        rates = self.session_rates()
+        with self._lock:
+            phases: List[Tuple[str, List[int], float, int]] = [
+                (name, list(h.counts), h.total, h.n) for name, h in sorted(self._phases.items())
+            ]
+            payload = sorted(self._payload.items())
+            reruns = sorted(self._reruns.items())
+            startup = sorted(self._startup.items())
+        lines = [
+            "# HELP terra_phase_seconds Duración de cada fase del rerun.",
+            "# TYPE terra_phase_seconds histogram",
+        ]
+        for name, counts, total, n in phases:
+            acc = 0
+            for le, c in zip(BUCKETS, counts):
+                acc += c
+                lines.append(f'terra_phase_seconds_bucket{{phase="{name}",le="{le}"}} {acc}')
+            lines.append(f'terra_phase_seconds_bucket{{phase="{name}",le="+Inf"}} {n}')
+            lines.append(f'terra_phase_seconds_sum{{phase="{name}"}} {total:.6f}')
+            lines.append(f'terra_phase_seconds_count{{phase="{name}"}} {n}')
+        lines += [
+            "# HELP terra_payload_bytes_total Bytes de HTML/CSS enviados, por fase.",
+            "# TYPE terra_payload_bytes_total counter",
+        ]
+        lines += [f'terra_payload_bytes_total{{phase="{name}"}} {v}' for name, v in payload]
+        lines += [
+            "# HELP terra_reruns_total Reruns del script (full) y de cada fragmento.",
+            "# TYPE terra_reruns_total counter",
+        ]
+        lines += [f'terra_reruns_total{{kind="{kind}"}} {v}' for kind, v in reruns]
+        values = sorted(rates.values())
+        lines += [
+            "# HELP terra_active_sessions Sesiones con algún rerun en los últimos 120 s.",
+            "# TYPE terra_active_sessions gauge",
+            f"terra_active_sessions {len(values)}",
+            "# HELP terra_session_reruns_per_minute Reruns completos por minuto de las sesiones activas.",
+            "# TYPE terra_session_reruns_per_minute gauge",
+            f'terra_session_reruns_per_minute{{stat="mean"}} {sum(values) / len(values) if values else 0.0:.3f}',
+            f'terra_session_reruns_per_minute{{stat="max"}} {values[-1] if values else 0.0:.3f}',
+            "# HELP terra_startup_seconds Duración de cada paso del arranque.",
+            "# TYPE terra_startup_seconds gauge",
+            *(f'terra_startup_seconds{{step="{name}"}} {v:.6f}' for name, v in startup),
+            "# HELP terra_process_start_time_seconds Inicio del proceso (epoch).",
+            "# TYPE terra_process_start_time_seconds gauge",
+            f"terra_process_start_time_seconds {self.started:.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def serve(registry: Registry, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer | None:
+    """Sirve GET /metrics en host:port desde un hilo de fondo. None si el puerto está ocupado."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        log.warning("metrics: no se pudo abrir %s:%d (%s)", host, port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="terra-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,740 @@
+"""
+Banco de preguntas compartido.
+
+El CSV se parsea y valida una sola vez por versión del archivo (pasada
+vectorizada con pandas, sin iterrows). El banco es de solo lectura y lo
+comparten todas las sesiones; cada sesión guarda apenas una permutación de
+índices (array de enteros) con las institucionales primero.
+
+BankWatcher vuelve a parsear el archivo en segundo plano cuando cambia y
+reemplaza el banco de una sola vez; las sesiones abiertas siguen con el
+banco que tenían.
+
+El CSV sigue siendo el formato de edición. `python questions.py build-pack`
+lo compila a un pack binario (preguntas.pack) que se abre con mmap y se
+decodifica pregunta por pregunta a medida que se usa.
+
+Para bancos grandes, el CSV se lee en streaming (sin DataFrame) y cada quiz
+toma K preguntas con una estrategia de muestreo (SAMPLING_STRATEGIES) cuyo
+costo depende de K, no del tamaño del banco. Con prefer_pandas=False también
+los CSV chicos se leen con el módulo csv (arranque sin importar pandas).
+
+Las institucionales se marcan al parsear (Classifier: categoría "inst..." o
+algún término de INSTITUTIONAL_TERMS en el texto, sin distinguir mayúsculas
+ni tildes) y el flag queda guardado en cada Question y en el pack: se
+clasifica una vez por versión del banco, no en cada sesión.
+"""
+import argparse
+import csv
+import hashlib
+import logging
+import math
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import threading
+import unicodedata
+from array import array
+from collections import abc
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Tuple
+
+# pandas/numpy se importan recién al parsear con pandas: el pack y el parser
+# con csv no los necesitan, y así no pesan en el arranque de la app
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
+
+MAX_OPTIONS = 4
+OPTION_COLUMNS = [f"option{i}" for i in range(1, MAX_OPTIONS + 1)]
+
+# a partir de este tamaño el CSV se lee en streaming en lugar de con pandas
+STREAMING_THRESHOLD_BYTES = 5 * 1024 * 1024
+
+# se comparan sin tildes ni mayúsculas (ver fold); TERRA_INSTITUTIONAL_TERMS
+# (separados por coma) los reemplaza
+INSTITUTIONAL_TERMS = [
+    "terraloteos", "terra", "institucional", "misión", "vision", "visión",
+    "valores", "empresa", "oficinas", "beneficios", "plusvalía", "rentabilidad"
+]
+INSTITUTIONAL_CATEGORY_PREFIX = "inst"
+
+
+class Question(NamedTuple):
+    qid: str
+    question: str
+    options: tuple
+    answer: int
+    category: str
+    institutional: bool
+
+
+class QuestionBank:
+    """Preguntas validadas (inmutable) + índices precalculados por tipo."""
+
+    def __init__(
+        self,
+        questions: Sequence[Question],
+        version: str = "",
+        errors: Sequence[str] = (),
+        institutional: Sequence[bool] | None = None,
+    ):
+        self.questions = questions if isinstance(questions, PackedQuestions) else tuple(questions)
+        self.version = version
+        self.errors = tuple(errors)
+        if institutional is None:
+            institutional = [q.institutional for q in self.questions]
+        self.institutional_idx = tuple(i for i, flag in enumerate(institutional) if flag)
+        self.other_idx = tuple(i for i, flag in enumerate(institutional) if not flag)
+        self._by_category: Dict[str, Tuple[int, ...]] | None = None
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def __getitem__(self, i: int) -> Question:
+        return self.questions[i]
+
+    def permutation(self, rng: random.Random | None = None) -> array:
+        """Orden para una sesión: institucionales mezcladas primero, después el resto."""
+        rng = rng or random
+        instit = list(self.institutional_idx)
+        otras = list(self.other_idx)
+        rng.shuffle(instit)
+        rng.shuffle(otras)
+        return array(index_typecode(len(self.questions)), instit + otras)
+
+    @property
+    def by_category(self) -> Dict[str, Tuple[int, ...]]:
+        """Índices por categoría (se arma una vez por banco, a la primera consulta)."""
+        if self._by_category is None:
+            groups: Dict[str, List[int]] = {}
+            for i, q in enumerate(self.questions):
+                groups.setdefault(_category_key(q.category), []).append(i)
+            self._by_category = {k: tuple(v) for k, v in groups.items()}
+        return self._by_category
+
+    def sample(self, k: int = 0, strategy: str = "institutional_first", rng: random.Random | None = None) -> array:
+        """Orden de un quiz de k preguntas (k <= 0: todas) según la estrategia."""
+        rng = rng or random
+        if k <= 0 or k >= len(self.questions):
+            if strategy == "institutional_first":
+                return self.permutation(rng)
+            k = len(self.questions)
+        picked = SAMPLING_STRATEGIES[strategy](self, k, rng)
+        return array(index_typecode(len(self.questions)), picked)
+
+
+def _category_key(value: str) -> str:
+    return str(value or "").strip().lower()
+
+
+def _sample_institutional_first(bank: QuestionBank, k: int, rng: random.Random) -> List[int]:
+    """Regla original: primero institucionales (al azar), después el resto."""
+    instit = bank.institutional_idx
+    first = rng.sample(instit, min(k, len(instit)))
+    rest = rng.sample(bank.other_idx, min(k - len(first), len(bank.other_idx)))
+    return first + rest
+
+
+def _allocate(sizes: Dict[str, int], k: int) -> Dict[str, int]:
+    """Reparte k entre estratos en proporción a su tamaño (mayor resto)."""
+    total = sum(sizes.values())
+    if total == 0:
+        return {}
+    quotas = {c: k * n / total for c, n in sizes.items()}
+    alloc = {c: min(sizes[c], int(q)) for c, q in quotas.items()}
+    left = k - sum(alloc.values())
+    for c in sorted(quotas, key=lambda c: quotas[c] - int(quotas[c]), reverse=True):
+        if left <= 0:
+            break
+        if alloc[c] < sizes[c]:
+            alloc[c] += 1
+            left -= 1
+    # si algún estrato se quedó corto, completa con los que tienen lugar
+    for c in sorted(sizes, key=lambda c: sizes[c] - alloc[c], reverse=True):
+        if left <= 0:
+            break
+        extra = min(left, sizes[c] - alloc[c])
+        alloc[c] += extra
+        left -= extra
+    return alloc
+
+
+def _sample_stratified(bank: QuestionBank, k: int, rng: random.Random) -> List[int]:
+    """K preguntas repartidas por category/categoria en proporción al banco."""
+    groups = bank.by_category
+    alloc = _allocate({c: len(idx) for c, idx in groups.items()}, k)
+    picked: List[int] = []
+    for c, n in alloc.items():
+        if n:
+            picked.extend(rng.sample(groups[c], n))
+    rng.shuffle(picked)
+    return picked
+
+
+SAMPLING_STRATEGIES: Dict[str, Callable[[QuestionBank, int, random.Random], List[int]]] = {
+    "institutional_first": _sample_institutional_first,
+    "stratified": _sample_stratified,
+}
+
+
+def index_typecode(n: int) -> str:
+    """El typecode de array más chico que alcanza para n índices."""
+    return "H" if n <= 0xFFFF else "I"
+
+
+def question_id(text: str) -> str:
+    """Id estable de una pregunta (no cambia si se reordena el CSV)."""
+    return hashlib.sha1(text.strip().encode("utf-8")).hexdigest()[:12]
+
+
+# ==========================
+# CLASIFICACIÓN
+# ==========================
+class _StripMarks(dict):
+    """Tabla para str.translate que borra las marcas combinantes (categoría Mn); se llena a medida que aparecen caracteres."""
+
+    def __missing__(self, cp: int):
+        value = None if unicodedata.category(chr(cp)) == "Mn" else cp
+        self[cp] = value
+        return value
+
+
+_MARKS = _StripMarks()
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]+")
+
+
+@lru_cache(maxsize=4096)
+def _fold_run(run: str) -> str:
+    return unicodedata.normalize("NFD", run).translate(_MARKS)
+
+
+def _fold_match(m: re.Match) -> str:
+    return _fold_run(m.group())
+
+
+def _fold_nfd(text: str) -> str:
+    # NFD no mezcla caracteres ASCII con sus vecinos: alcanza con descomponer
+    # los tramos no ASCII (pocos y repetidos en español), no el texto entero
+    return _NON_ASCII_RE.sub(_fold_match, text).lower()
+
+
+# fold de cada carácter Latin-1, que siempre es otro carácter Latin-1 ("Á" -> "a",
+# "¿" -> "¿"): el español entra entero en Latin-1 y se pliega con bytes.translate
+_LATIN1_FOLD = bytes(ord(_fold_nfd(chr(b))) for b in range(256))
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin tildes ("Misión" -> "mision")."""
+    if text.isascii():
+        return text.lower()
+    try:
+        return text.encode("latin-1").translate(_LATIN1_FOLD).decode("latin-1")
+    except UnicodeEncodeError:  # fuera de Latin-1 o ya descompuesto (marcas sueltas)
+        return _fold_nfd(text)
+
+
+class Classifier:
+    """
+    Decide si una pregunta es institucional: categoría que empieza con
+    category_prefix o algún término en el texto. Los términos se normalizan
+    con fold una vez; cada texto se pliega una vez y se busca con `in`, que
+    en CPython es más rápido que una alternativa compilada con re.
+    """
+
+    def __init__(self, terms: Iterable[str] = INSTITUTIONAL_TERMS, category_prefix: str = INSTITUTIONAL_CATEGORY_PREFIX):
+        folded = {fold(t.strip()) for t in terms if t and t.strip()}
+        # orden fijo (los más largos primero): es parte del fingerprint de los packs
+        self.terms: Tuple[str, ...] = tuple(sorted(folded, key=lambda t: (-len(t), t)))
+        self.category_prefix = fold(category_prefix)
+        # para decidir alcanza con los que no contienen a otro ("terra" cubre "terraloteos")
+        self._needles = tuple(t for t in self.terms if not any(o != t and o in t for o in self.terms))
+        self.fingerprint = hashlib.sha256(
+            "\n".join((self.category_prefix, *self.terms)).encode("utf-8")
+        ).digest()
+
+    def __repr__(self) -> str:
+        return f"Classifier({list(self.terms)!r}, category_prefix={self.category_prefix!r})"
+
+    def __call__(self, question: str, category: str = "") -> bool:
+        if category and self.category_prefix and fold(str(category).strip()).startswith(self.category_prefix):
+            return True
+        return self.mentions(question)
+
+    def mentions(self, text: str) -> bool:
+        """Algún término en el texto, sin distinguir mayúsculas ni tildes."""
+        if not text:
+            return False
+        folded = fold(text)
+        for term in self._needles:
+            if term in folded:
+                return True
+        return False
+
+    def mask(self, texts: "pd.Series", categories: "pd.Series") -> "pd.Series":
+        """El mismo criterio sobre columnas enteras (parse_frame)."""
+        import pandas as pd
+
+        if self.category_prefix:
+            by_category = categories.str.strip().map(fold).str.startswith(self.category_prefix)
+        else:
+            by_category = pd.Series(False, index=categories.index)
+        found = [isinstance(t, str) and self.mentions(t) for t in texts.tolist()]
+        return by_category | pd.Series(found, index=texts.index, dtype=bool)
+
+
+@lru_cache(maxsize=None)
+def default_classifier() -> Classifier:
+    """
+    Classifier con los términos de TERRA_INSTITUTIONAL_TERMS o, si no está,
+    INSTITUTIONAL_TERMS. La variable se lee una vez por proceso.
+    """
+    terms = os.environ.get("TERRA_INSTITUTIONAL_TERMS", "")
+    return Classifier(terms.split(",")) if terms.strip() else Classifier()
+
+
+def _is_institutional(question: str, category_val: str) -> bool:
+    return default_classifier()(question, category_val)
+
+
+def _row_errors(df: "pd.DataFrame", reasons: List[Tuple["pd.Series", str]]) -> List[str]:
+    """Un mensaje por fila descartada (número de línea del CSV, contando el encabezado)."""
+    import pandas as pd
+    found = []
+    seen = pd.Series(False, index=df.index)
+    for mask, msg in reasons:
+        mask = mask.fillna(True).astype(bool) & ~seen
+        found.extend((int(i) + 2, msg) for i in df.index[mask])
+        seen |= mask
+    return [f"fila {line}: {msg}" for line, msg in sorted(found)]
+
+
+def parse_frame(df: "pd.DataFrame", classifier: Classifier | None = None) -> Tuple[List[Question], List[str]]:
+    """Valida un DataFrame con el formato de preguntas.csv (vectorizado)."""
+    import numpy as np
+    import pandas as pd
+
+    if "question" not in df.columns:
+        return [], ["falta la columna 'question'"]
+    if df.empty:
+        return [], []
+    for col in OPTION_COLUMNS + ["answer_index"]:
+        if col not in df.columns:
+            df[col] = pd.NA
+    df = df.astype({"question": "string"})
+
+    opts = df[OPTION_COLUMNS]
+    has_opt = opts.notna()
+    n_opts = has_opt.sum(axis=1)
+    answer = pd.to_numeric(df["answer_index"].astype("string").str.strip(), errors="coerce")
+    answer = np.trunc(answer)  # int(float(x)) del loader original
+
+    has_question = df["question"].notna() & (df["question"].str.strip() != "")
+    in_range = (answer >= 0) & (answer < n_opts)
+    valid = (has_question & (n_opts > 0) & answer.notna() & in_range).fillna(False).astype(bool)
+    errors = _row_errors(df, [
+        (~has_question, "falta la pregunta"),
+        (n_opts == 0, "no tiene opciones"),
+        (answer.isna(), "answer_index vacío o no numérico"),
+        (~in_range, "answer_index fuera de rango"),
+    ])
+    df, opts, has_opt, answer = df[valid], opts[valid], has_opt[valid], answer[valid]
+
+    if "category" in df.columns:
+        categories = df["category"]
+    elif "categoria" in df.columns:
+        categories = df["categoria"]
+    else:
+        categories = pd.Series("", index=df.index)
+    categories = categories.fillna("").astype(str)
+    instit = (classifier or default_classifier()).mask(df["question"], categories)
+
+    texts = df["question"].astype(str).tolist()
+    opt_rows = opts.astype(object).where(has_opt, None).values.tolist()
+    return [
+        Question(
+            qid=question_id(text),
+            question=text,
+            options=tuple(str(o) for o in row if o is not None),
+            answer=int(ans),
+            category=cat,
+            institutional=bool(flag),
+        )
+        for text, row, ans, cat, flag in zip(
+            texts, opt_rows, answer.tolist(), categories.tolist(), instit.tolist()
+        )
+    ], errors
+
+
+def _row_to_question(
+    row: Dict[str, str], category_col: str | None, classifier: Classifier
+) -> Tuple[Question | None, str]:
+    """Validación de una fila del CSV (mismas reglas que parse_frame)."""
+    text = (row.get("question") or "").strip()
+    if not text:
+        return None, "falta la pregunta"
+    opts = tuple(v for v in (row.get(c) for c in OPTION_COLUMNS) if v not in (None, ""))
+    if not opts:
+        return None, "no tiene opciones"
+    raw_idx = (row.get("answer_index") or "").strip()
+    try:
+        value = float(raw_idx)
+    except ValueError:
+        return None, "answer_index vacío o no numérico"
+    if math.isnan(value):
+        return None, "answer_index vacío o no numérico"
+    # inf / 1e400: como en parse_frame, número pero fuera de rango (int() daría OverflowError)
+    if not math.isfinite(value) or not 0 <= int(value) < len(opts):
+        return None, "answer_index fuera de rango"
+    ans = int(value)
+    category = (row.get(category_col) or "") if category_col else ""
+    question = row.get("question") or ""
+    return Question(
+        question_id(question), question, opts, ans, category, classifier(question, category)
+    ), ""
+
+
+def iter_csv_questions(
+    path: str, errors: List[str] | None = None, classifier: Classifier | None = None
+) -> Iterator[Question]:
+    """Recorre el CSV fila por fila sin armar un DataFrame."""
+    classifier = classifier or default_classifier()
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fields = reader.fieldnames or []
+        category_col = "category" if "category" in fields else ("categoria" if "categoria" in fields else None)
+        for line, row in enumerate(reader, start=2):
+            q, err = _row_to_question(row, category_col, classifier)
+            if q is not None:
+                yield q
+            elif errors is not None:
+                errors.append(f"fila {line}: {err}")
+
+
+def load_bank_streaming(path: str, version: str = "", classifier: Classifier | None = None) -> QuestionBank:
+    """Como load_bank, pero sin pandas: memoria proporcional a las preguntas válidas."""
+    errors: List[str] = []
+    try:
+        qs = list(iter_csv_questions(path, errors, classifier))
+    except FileNotFoundError:
+        return QuestionBank([], version)
+    except (csv.Error, UnicodeDecodeError) as e:
+        return QuestionBank([], version, [f"no se pudo leer el archivo: {e}"])
+    return QuestionBank(qs, version, errors)
+
+
+def file_version(path: str) -> str:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def load_bank(path: str, version: str = "", classifier: Classifier | None = None) -> QuestionBank:
+    """Parsea preguntas.csv y arma el banco compartido."""
+    import pandas as pd
+
+    try:
+        df = pd.read_csv(path)
+    except (pd.errors.EmptyDataError, FileNotFoundError):
+        return QuestionBank([], version)
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        return QuestionBank([], version, [f"no se pudo leer el archivo: {e}"])
+    qs, errors = parse_frame(df, classifier)
+    return QuestionBank(qs, version, errors)
+
+
+# ==========================
+# PACK BINARIO
+# ==========================
+# Formato (little endian):
+#   header   "<4sHHI32s": magic, versión de formato, reservado, cantidad,
+#            sha256 del CSV de origen y de la clasificación (source_hash)
+#   flags    1 byte por pregunta (bit 0: institucional)
+#   offsets  uint32 por pregunta, posición absoluta del registro
+#   registro "<BBH" (answer, n opciones, reservado) + qid (12 bytes ascii)
+#            + strings "<I"+utf-8: pregunta, categoría, opciones...
+PACK_MAGIC = b"TQPK"
+PACK_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHHI32s")
+_RECORD = struct.Struct("<BBH")
+_STRLEN = struct.Struct("<I")
+_QID_LEN = 12
+
+
+def source_hash(path: str, classifier: Classifier | None = None) -> bytes:
+    """sha256 del CSV y del Classifier: si cambian los términos, el pack queda desactualizado."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        h.update(f.read())
+    h.update((classifier or default_classifier()).fingerprint)
+    return h.digest()
+
+
+def _pack_record(q: Question) -> bytes:
+    parts = [_RECORD.pack(q.answer, len(q.options), 0), q.qid.encode("ascii")[:_QID_LEN].ljust(_QID_LEN, b"0")]
+    for text in (q.question, q.category, *q.options):
+        raw = text.encode("utf-8")
+        parts.append(_STRLEN.pack(len(raw)))
+        parts.append(raw)
+    return b"".join(parts)
+
+
+def write_pack(qs: Sequence[Question], out_path: str, src_hash: bytes) -> None:
+    """
+    Escribe el pack de forma atómica (archivo temporal + os.replace). En
+    Windows no se puede reemplazar un archivo mapeado: si una app corriendo
+    tiene el pack abierto, falla con PermissionError y el pack viejo queda.
+    """
+    n = len(qs)
+    records = [_pack_record(q) for q in qs]
+    flags = bytes(1 if q.institutional else 0 for q in qs)
+    offsets = array("I")
+    pos = _HEADER.size + n + 4 * n
+    for rec in records:
+        offsets.append(pos)
+        pos += len(rec)
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(PACK_MAGIC, PACK_FORMAT_VERSION, 0, n, src_hash))
+        f.write(flags)
+        f.write(offsets.tobytes())
+        for rec in records:
+            f.write(rec)
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        os.replace(tmp, out_path)
+    except PermissionError as e:
+        os.remove(tmp)
+        raise PermissionError(e.errno, "el pack está abierto por otro proceso (¿la app?)", out_path) from None
+
+
+class PackedQuestions(abc.Sequence):
+    """Preguntas de un pack mapeado en memoria; cada una se decodifica al pedirla."""
+
+    def __init__(self, mm: mmap.mmap, count: int):
+        self._mm = mm
+        self._count = count
+        start = _HEADER.size
+        self.flags = bytes(mm[start:start + count])
+        self._offsets = array("I")
+        self._offsets.frombytes(mm[start + count:start + count + 4 * count])
+        if sys.byteorder != "little":
+            self._offsets.byteswap()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        mm = self._mm
+        pos = self._offsets[i]
+        answer, n_opts, _ = _RECORD.unpack_from(mm, pos)
+        pos += _RECORD.size
+        qid = mm[pos:pos + _QID_LEN].decode("ascii")
+        pos += _QID_LEN
+        texts = []
+        for _ in range(2 + n_opts):
+            (ln,) = _STRLEN.unpack_from(mm, pos)
+            pos += _STRLEN.size
+            if pos + ln > len(mm):  # el slice no avisa si el archivo está cortado
+                raise ValueError(f"pack truncado en la pregunta {i}")
+            texts.append(mm[pos:pos + ln].decode("utf-8"))
+            pos += ln
+        return Question(qid, texts[0], tuple(texts[2:]), answer, texts[1], bool(self.flags[i] & 1))
+
+    def __iter__(self) -> Iterator[Question]:
+        for i in range(self._count):
+            yield self[i]
+
+
+def read_pack_header(path: str) -> Tuple[int, int, bytes]:
+    """(versión de formato, cantidad, source_hash del CSV) sin mapear el archivo."""
+    with open(path, "rb") as f:
+        raw = f.read(_HEADER.size)
+    if len(raw) < _HEADER.size:
+        raise ValueError("pack truncado")
+    magic, fmt, _, count, src = _HEADER.unpack(raw)
+    if magic != PACK_MAGIC:
+        raise ValueError("no es un pack de preguntas")
+    return fmt, count, src
+
+
+def load_pack(path: str, version: str = "") -> QuestionBank:
+    """Abre el pack con mmap: solo se leen el header, los flags y los offsets."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, fmt, _, count, _src = _HEADER.unpack_from(mm, 0)
+        if magic != PACK_MAGIC or fmt != PACK_FORMAT_VERSION:
+            raise ValueError(f"{path}: formato de pack no soportado")
+        qs = PackedQuestions(mm, count)
+        _check_layout(qs, len(mm))
+    except (ValueError, struct.error, UnicodeDecodeError) as e:
+        mm.close()
+        raise ValueError(f"{path}: pack inválido ({e})") from None
+    return QuestionBank(qs, version, institutional=qs.flags)
+
+
+def _check_layout(qs: PackedQuestions, size: int) -> None:
+    """
+    Tamaño del archivo contra el header y los offsets: un pack cortado (por
+    ejemplo, un build-pack interrumpido) falla acá y no al pedir una pregunta.
+    """
+    table_end = _HEADER.size + 5 * len(qs)
+    if size < table_end:
+        raise ValueError(f"{size} bytes, la tabla de offsets necesita {table_end}")
+    if not len(qs):
+        return
+    offsets = qs._offsets
+    if min(offsets) < table_end or max(offsets) >= size:
+        raise ValueError("offsets fuera del archivo")
+    qs[offsets.index(max(offsets))]  # el último registro tiene que estar completo
+
+
+def pack_path_for(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".pack"
+
+
+def load_bank_auto(
+    csv_path: str, pack_path: str | None = None, version: str = "", prefer_pandas: bool = True,
+    classifier: Classifier | None = None,
+) -> QuestionBank:
+    """
+    Usa el pack si existe y fue compilado desde este mismo CSV con la misma
+    clasificación (mismo source_hash); si no, parsea el CSV: con pandas si es
+    chico y prefer_pandas, si no con csv.
+    """
+    classifier = classifier or default_classifier()
+    pack_path = pack_path or pack_path_for(csv_path)
+    if os.path.exists(pack_path):
+        try:
+            fmt, _count, src = read_pack_header(pack_path)
+            csv_exists = os.path.exists(csv_path)
+            if fmt == PACK_FORMAT_VERSION and (not csv_exists or src == source_hash(csv_path, classifier)):
+                return load_pack(pack_path, version)
+            log.info("%s desactualizado respecto de %s; se usa el CSV", pack_path, csv_path)
+        except (OSError, ValueError, struct.error) as e:
+            log.warning("no se pudo abrir %s (%s); se usa el CSV", pack_path, e)
+    try:
+        big = os.path.getsize(csv_path) >= STREAMING_THRESHOLD_BYTES
+    except OSError:
+        big = False
+    if big or not prefer_pandas:
+        return load_bank_streaming(csv_path, version, classifier)
+    return load_bank(csv_path, version, classifier)
+
+
+class BankWatcher:
+    """
+    Mantiene el banco vigente de `path` y lo recarga en un hilo de fondo
+    cuando cambia el archivo. Si la versión nueva no tiene ninguna pregunta
+    válida se conserva la anterior; los errores quedan en last_errors.
+    """
+
+    def __init__(
+        self, path: str, interval: float = 2.0, pack_path: str | None = None, prefer_pandas: bool = True,
+        classifier: Classifier | None = None,
+    ):
+        self.path = path
+        self.classifier = classifier or default_classifier()
+        self.pack_path = pack_path or pack_path_for(path)
+        self.interval = interval
+        self.prefer_pandas = prefer_pandas
+        version = self._version()
+        try:
+            self._bank = load_bank_auto(path, self.pack_path, version, prefer_pandas, self.classifier)
+        except Exception as e:  # como en reload: se informa, no tira abajo la app
+            log.exception("error al cargar %s", path)
+            self._bank = QuestionBank([], version, [f"error al cargar: {e}"])
+        self._seen_version = version
+        self.last_errors: Tuple[str, ...] = self._bank.errors
+        self._report(self._bank)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="terra-bank-watcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def bank(self) -> QuestionBank:
+        return self._bank
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _report(self, bank: QuestionBank) -> None:
+        if bank.errors:
+            log.warning("%s: %d filas con errores", self.path, len(bank.errors))
+            for err in bank.errors:
+                log.warning("  %s", err)
+
+    def _version(self) -> str:
+        return f"{file_version(self.path)}/{file_version(self.pack_path)}"
+
+    def reload(self) -> bool:
+        """Vuelve a parsear si cambió el archivo. True si se reemplazó el banco."""
+        version = self._version()
+        if version == self._seen_version:
+            return False
+        self._seen_version = version
+        try:
+            new = load_bank_auto(self.path, self.pack_path, version, self.prefer_pandas, self.classifier)
+        except Exception as e:  # el banco viejo sigue sirviendo
+            self.last_errors = (f"error al recargar: {e}",)
+            log.exception("error al recargar %s", self.path)
+            return False
+        self.last_errors = new.errors
+        self._report(new)
+        if len(new) == 0 and len(self._bank) > 0:
+            log.warning("%s sin preguntas válidas; se mantiene la versión anterior", self.path)
+            return False
+        self._bank = new  # asignación atómica: las sesiones ya abiertas guardan su referencia
+        log.info("%s recargado: %d preguntas", self.path, len(new))
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.reload()
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="questions.py", description="Herramientas del banco de preguntas")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    bp = sub.add_parser("build-pack", help="compila preguntas.csv a un pack binario")
+    here = os.path.dirname(os.path.abspath(__file__))
+    bp.add_argument("--csv", default=os.path.join(here, "data", "preguntas.csv"))
+    bp.add_argument("--out", default=None, help="por defecto, al lado del CSV con extensión .pack")
+    bp.add_argument("--strict", action="store_true", help="falla si hay filas descartadas")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build-pack":
+        classifier = default_classifier()
+        bank = load_bank(args.csv, classifier=classifier)
+        for err in bank.errors:
+            print(f"{args.csv}: {err}", file=sys.stderr)
+        if args.strict and bank.errors:
+            return 1
+        out = args.out or pack_path_for(args.csv)
+        try:
+            write_pack(bank.questions, out, source_hash(args.csv, classifier))
+        except PermissionError as e:
+            print(f"{out}: {e.strerror}; cerrá la app y volvé a compilar", file=sys.stderr)
+            return 1
+        print(f"{out}: {len(bank)} preguntas ({len(bank.errors)} filas descartadas)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
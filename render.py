@@ -0,0 +1,103 @@
+"""
+Piezas puras de la interfaz: el HTML del zorro y del ranking y el rango por
+puntaje. No dependen de Streamlit, así se pueden medir y probar sueltas
+(ver bench.py); app.py las envuelve con sus métricas.
+"""
+import functools
+from typing import Any, Dict, List
+
+RANKS = [
+    (0, 30, "Aprendiz Terra"),
+    (31, 80, "Asesor Jr."),
+    (81, 120, "Asesor Senior."),
+    (121, 9999, "Maestro Terra"),
+]
+
+
+def get_rank(score: int) -> str:
+    for lo, hi, label in RANKS:
+        if lo <= score <= hi:
+            return label
+    return RANKS[-1][2]
+
+
+# ==========================
+# FOX ROAD (GYMTONIC -> Terra)
+# ==========================
+def _trees_positions(n: int = 8) -> list[float]:
+    if n < 1:
+        return []
+    step = 100 / (n + 1)
+    return [round(step * (i + 1), 2) for i in range(n)]
+
+
+@functools.lru_cache(maxsize=16)
+def foxy_scene_static(trees: int = 8) -> str:
+    """
+    Todo lo que no depende del avance, armado una vez por cantidad de árboles.
+    La posición del zorro y el % del título salen de la variable CSS
+    --foxy-p del contenedor (ver .foxy-fox y .foxy-pct en styles.css).
+    """
+    # Árboles alternando arriba/abajo
+    trees_html = "".join(
+        f'<div class="foxy-tree {"top" if i % 2 == 0 else "bottom"}" style="left:{pos}%">🌳</div>'
+        for i, pos in enumerate(_trees_positions(trees))
+    )
+    return (
+        '<div class="foxy-title">Ayudá a Foxy a llegar a tiempo con el cliente — <span class="foxy-pct"></span></div>'
+        '<div class="foxy-endpoints">'
+        # sin texto 'GYMTONIC', solo el emoji de ubicación; texto más grande junto al edificio
+        '<div class="foxy-left">📍</div>'
+        '<div class="foxy-right">🏢<span class="foxy-endcap label-dark big">Oficina de Terraloteos</span></div>'
+        '</div>'
+        f'<div class="foxy-scene"><div class="foxy-road"></div>{trees_html}<div class="foxy-fox">🦊</div></div>'
+    )
+
+
+def foxy_scene_html(progress_pct: int, trees: int = 8) -> str:
+    """
+    Escena del zorro. progress_pct en 0..100 (ligado al avance del quiz). Entre
+    dos avances solo cambia --foxy-p: el navegador conserva la escena y el
+    zorro se desliza con la transición de CSS.
+    """
+    p = max(0, min(100, int(progress_pct)))
+    return f'<div class="foxy-wrap" style="--foxy-p:{p}">{foxy_scene_static(trees)}</div>'
+
+
+# ==========================
+# RANKING
+# ==========================
+def leaderboard_table_html(rows: List[Dict[str, Any] | None], me_id: int | None = None, top_n: int = 5) -> str:
+    """Tabla del ranking; None en rows dibuja un separador. Los primeros top_n se destacan."""
+    rows_html = []
+    for row in rows:
+        if row is None:
+            rows_html.append("<tr class='leaderboard-gap'><td colspan='5'>…</td></tr>")
+            continue
+        pos = int(row["pos"])
+        name = str(row.get("name", ""))
+        rango = str(row.get("rank", ""))
+        puntaje = int(row.get("score", 0))
+        info = str(row.get("timestamp", ""))
+        cls = "leaderboard-row top5" if pos <= top_n else "leaderboard-row"
+        if me_id is not None and row.get("id") == me_id:
+            cls += " me"
+        rows_html.append(
+            f"<tr class='{cls}'>"
+            f"<td class='pos'>#{pos}</td>"
+            f"<td>{name}</td>"
+            f"<td>{rango}</td>"
+            f"<td class='score-cell'>{puntaje}</td>"
+            f"<td class='ts'>{info}</td>"
+            f"</tr>"
+        )
+    return (
+        "<div class='leaderboard-box'>"
+        "<table class='leaderboard-table'>"
+        "<thead><tr>"
+        "<th>#</th><th>Nombre</th><th>Rango</th><th>Puntaje</th><th>Información</th>"
+        "</tr></thead>"
+        f"<tbody>{''.join(rows_html)}</tbody>"
+        "</table>"
+        "</div>"
+    )
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# los módulos de la app viven en la raíz del repo (no es un paquete)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
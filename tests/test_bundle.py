@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+import bundle
+from questions import Question
+
+SECRET = b"s" * 32
+QUESTIONS = [
+    Question("q1", "¿Uno?", ("a", "b", "c"), 1, "", False),
+    Question("q2", "¿Dos?", ("a", "b"), 0, "", True),
+]
+BY_ID = {q.qid: q for q in QUESTIONS}
+NOW = 1_700_000_000.0
+TIME_LIMIT = 30
+
+
+def score_fn(correct: bool, elapsed: float) -> int:
+    return (10 + (5 if elapsed <= 10 else 0)) if correct else 0
+
+
+def make(rng_seed: int = 0):
+    return bundle.make_bundle(QUESTIONS, SECRET, session="abc", rng=random.Random(rng_seed), now=NOW)
+
+
+def submit(b, answers, now=NOW + 20, secret=SECRET, sig=None):
+    return bundle.score_submission(
+        b["token"], b["sig"] if sig is None else sig, answers, secret,
+        BY_ID.get, score_fn, TIME_LIMIT, grace=1.0, now=now,
+    )
+
+
+def shown_index(b, i, original):
+    """Índice mostrado de la opción original `original` en la pregunta i."""
+    return b["token"]["q"][i][1].index(original)
+
+
+def test_bundle_hides_answers_and_keeps_options():
+    b = make()
+    for item, q in zip(b["items"], QUESTIONS):
+        assert item["text"] == q.question
+        assert sorted(item["options"]) == sorted(q.options)
+        assert "answer" not in item
+
+
+def test_scores_correct_and_wrong_answers():
+    b = make()
+    answers = [
+        {"choice": shown_index(b, 0, 1), "ms": 4000},   # correcta y rápida
+        {"choice": shown_index(b, 1, 1), "ms": 12000},  # incorrecta
+    ]
+    scored = submit(b, answers)
+    assert [(s.question.qid, s.selected, s.points) for s in scored] == [("q1", 1, 15), ("q2", 1, 0)]
+    assert scored[0].elapsed == pytest.approx(4.0)
+
+
+def test_timeout_and_elapsed_cap():
+    b = make()
+    answers = [{"choice": None, "ms": 999_999}, {"choice": shown_index(b, 1, 0), "ms": 1000}]
+    scored = submit(b, answers, now=NOW + 40)
+    assert scored[0].selected is None and scored[0].points == 0
+    assert scored[0].elapsed == TIME_LIMIT + 1.0
+
+
+@pytest.mark.parametrize("mutate, message", [
+    (lambda b: b["token"].update(sid="otra"), "firma"),
+    (lambda b: b["token"]["q"][0][1].reverse(), "firma"),
+])
+def test_tampered_token_is_rejected(mutate, message):
+    b = make()
+    mutate(b)
+    with pytest.raises(bundle.BundleError, match=message):
+        submit(b, [{"choice": 0, "ms": 1000}] * 2)
+
+
+def test_wrong_secret_is_rejected():
+    b = make()
+    with pytest.raises(bundle.BundleError, match="firma"):
+        submit(b, [{"choice": 0, "ms": 1000}] * 2, secret=b"x" * 32)
+
+
+@pytest.mark.parametrize("answers, now, message", [
+    ([{"choice": 0, "ms": 1000}], NOW + 20, "respuestas"),
+    ([{"choice": 7, "ms": 1000}, {"choice": 0, "ms": 1000}], NOW + 20, "opción"),
+    ([{"choice": 0, "ms": "x"}, {"choice": 0, "ms": 1000}], NOW + 20, "tiempo mal formado"),
+    ([{"choice": 0, "ms": "nan"}, {"choice": 0, "ms": 1000}], NOW + 20, "tiempo mal formado"),
+    ([{"choice": 0, "ms": float("nan")}, {"choice": 0, "ms": 1000}], NOW + 20, "tiempo mal formado"),
+    ([{"choice": 0, "ms": "inf"}, {"choice": 0, "ms": 1000}], NOW + 20, "tiempo mal formado"),
+    ([{"choice": 0, "ms": [1]}, {"choice": 0, "ms": 1000}], NOW + 20, "tiempo mal formado"),
+    ([{"choice": 0, "ms": 1000}] * 2, NOW + 10_000, "vencido"),
+    ([{"choice": 0, "ms": 1000}] * 2, NOW - 60, "futuro"),
+    ([{"choice": 0, "ms": 30_000}] * 2, NOW + 5, "inconsistentes"),
+])
+def test_invalid_submissions(answers, now, message):
+    b = make()
+    with pytest.raises(bundle.BundleError, match=message):
+        submit(b, answers, now=now)
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+import cssbundle
+
+
+@pytest.mark.parametrize("css, expected", [
+    ("a  {\n  color: red ;\n}\n", "a{color:red}"),
+    ("nav :hover { top: 0 }", "nav :hover{top:0}"),  # "nav :hover" no es "nav:hover"
+    ("/* comentario */ b { margin: 0 }", "b{margin:0}"),
+    ("ul > li , ol > li { x: 1; y: 2; }", "ul>li,ol>li{x:1;y:2}"),
+    ('a::after { content: "  /* no */  ; { " }', 'a::after{content:"  /* no */  ; { "}'),
+    ("a { background: url( 'x y.png' ) }", "a{background:url( 'x y.png' )}"),
+    ("@media (max-width: 640px) { .a { top: 0 } }", "@media (max-width:640px){.a{top:0}}"),
+])
+def test_minify(css, expected):
+    assert cssbundle.minify(css) == expected
+
+
+def test_bundle_digest_follows_content():
+    a = cssbundle.make_bundle("a { color: red }", "", "b { top: 0 }")
+    assert a.css == "a{color:red}b{top:0}"
+    assert a == cssbundle.make_bundle("a{color:red}", "/* x */ b {top:0}")
+    assert a.digest != cssbundle.make_bundle("a { color: blue }").digest
+    assert a.filename == f"styles.{a.digest}.min.css"
+
+
+def test_publish_writes_once_and_prunes_old_versions(tmp_path):
+    old = cssbundle.make_bundle("a { color: red }")
+    new = cssbundle.make_bundle("a { color: blue }")
+    (tmp_path / "otro.css").write_text("x")
+    assert cssbundle.publish(old, str(tmp_path)) == old.filename
+    assert cssbundle.publish(new, str(tmp_path), prune=False) == new.filename
+    assert sorted(os.listdir(tmp_path)) == sorted([old.filename, new.filename, "otro.css"])
+    cssbundle.publish(new, str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == sorted([new.filename, "otro.css"])
+    assert (tmp_path / new.filename).read_text(encoding="utf-8") == new.css
+
+
+def test_cli(tmp_path, capsys):
+    src = tmp_path / "styles.css"
+    src.write_text("/* estilos */\nbody {\n  margin: 0;\n}\n", encoding="utf-8")
+    assert cssbundle.main(["--src", str(src), "--out", str(tmp_path / "static")]) == 0
+    (name,) = os.listdir(tmp_path / "static")
+    assert (tmp_path / "static" / name).read_text(encoding="utf-8") == "body{margin:0}"
+    assert "-> 14 bytes" in capsys.readouterr().out
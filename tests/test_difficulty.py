@@ -0,0 +1,102 @@
+import math
+import random
+import statistics
+from array import array
+
+import pytest
+
+import difficulty
+from questions import Question, QuestionBank
+
+LATENCIES = [1200.0, 3400.0, 800.0, 15000.0, 2200.0, 2200.0, 9100.0]
+
+
+def test_welford_matches_two_pass_stats():
+    stats = difficulty.DifficultyStats()
+    for i, ms in enumerate(LATENCIES):
+        stats.update("q", i % 3 == 0, ms)
+    mean, std = stats.latency("q")
+    assert mean == pytest.approx(statistics.mean(LATENCIES))
+    assert std == pytest.approx(statistics.stdev(LATENCIES))
+    assert stats.answers("q") == len(LATENCIES)
+
+
+def test_accuracy_is_smoothed_by_the_prior():
+    stats = difficulty.DifficultyStats()
+    assert stats.accuracy("nueva") == difficulty.PRIOR_ACCURACY
+    assert all(map(math.isnan, stats.latency("nueva")))
+    stats.update("q", False, 1000)
+    assert stats.latency("q") == (1000.0, 0.0)
+    assert 0 < stats.accuracy("q") < difficulty.PRIOR_ACCURACY
+    for _ in range(1000):
+        stats.update("q", True, 1000)
+    assert stats.difficulty("q") == pytest.approx(0.0, abs=0.01)
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "difficulty.json")
+    stats = difficulty.DifficultyStats(path, save_every=3600)
+    try:
+        for ms in LATENCIES:
+            stats.update("q", True, ms)
+        stats.save()
+    finally:
+        stats.stop()
+    loaded = difficulty.DifficultyStats(path, save_every=3600)
+    try:
+        assert loaded.snapshot() == stats.snapshot()
+    finally:
+        loaded.stop()
+
+
+def test_seed_matches_incremental_updates():
+    np = pytest.importorskip("numpy")
+    qids = ["a", "b", "a", "a", "b", "c"]
+    correct = [True, False, False, True, True, False]
+    incremental = difficulty.DifficultyStats()
+    for q, ok, ms in zip(qids, correct, LATENCIES):
+        incremental.update(q, ok, ms)
+    seeded = difficulty.DifficultyStats()
+    seeded.seed(np.array(qids, dtype="S12"), np.array(correct), np.array(LATENCIES[:6], dtype=np.int32))
+    for q, expected in incremental.snapshot().items():
+        assert seeded.snapshot()[q] == pytest.approx(expected)
+
+
+def _bank_and_stats():
+    # dificultad de qi creciente con i y bien separada del ruido del orden (±0.05)
+    qs = [Question(f"q{i}", f"Pregunta {i}", ("a", "b"), 0, "", i in (1, 4)) for i in range(6)]
+    stats = difficulty.DifficultyStats()
+    for i in range(6):
+        for n in range(100):
+            stats.update(f"q{i}", n >= i * 20, 1000)
+    return QuestionBank(qs), stats
+
+
+def test_ramp_goes_from_easy_to_hard():
+    bank, stats = _bank_and_stats()
+    order = array("H", [3, 0, 5, 1, 4, 2])
+    out = difficulty.reorder(bank, order, stats, "ramp", random.Random(1))
+    assert out.typecode == "H"
+    assert list(out) == [0, 1, 2, 3, 4, 5]
+
+
+def test_mixed_alternates_easy_and_hard():
+    bank, stats = _bank_and_stats()
+    out = difficulty.reorder(bank, array("H", [3, 0, 5, 1, 4, 2]), stats, "mixed", random.Random(1))
+    assert list(out) == [0, 5, 1, 4, 2, 3]
+    odd = difficulty.reorder(bank, array("H", [2, 0, 1]), stats, "mixed", random.Random(1))
+    assert list(odd) == [0, 2, 1]
+
+
+def test_reorder_keeps_institutional_block_first():
+    bank, stats = _bank_and_stats()
+    order = array("H", [4, 1, 3, 0, 5, 2])
+    out = difficulty.reorder(bank, order, stats, "ramp", random.Random(1), institutional_first=True)
+    assert list(out) == [1, 4, 0, 2, 3, 5]
+
+
+@pytest.mark.parametrize("mode", sorted(difficulty.ORDERINGS))
+def test_orderings_are_permutations(mode):
+    bank, stats = _bank_and_stats()
+    order = array("H", [5, 4, 3, 2, 1, 0])
+    assert sorted(difficulty.reorder(bank, order, stats, mode, random.Random(7))) == list(range(6))
@@ -0,0 +1,74 @@
+import glob
+import os
+import time
+
+import pytest
+
+import events
+
+np = pytest.importorskip("numpy")
+
+
+def _event(i: int, qid: str | None = None, selected: int = 0, correct: bool = True, elapsed_ms: int = 1000,
+           points: int = 10, bonus: int = 0) -> events.AnswerEvent:
+    return events.AnswerEvent(time.time(), "s", qid or f"q{i}", selected, correct, elapsed_ms, 30, points, bonus)
+
+
+def test_columns_round_trip(tmp_path):
+    batch = [_event(0, "abcdefabcdef"), _event(1, "x", selected=-1, correct=False, elapsed_ms=31000, points=0)]
+    events.write_part(str(tmp_path / "events-test.npz"), events.to_columns(batch))
+    cols = events.read_parts(str(tmp_path))
+    assert cols["qid"].tolist() == [b"abcdefabcdef", b"x"]
+    assert cols["selected"].tolist() == [0, -1]
+    assert cols["correct"].tolist() == [True, False]
+    assert cols["elapsed_ms"].tolist() == [1000, 31000]
+    assert events.read_parts(str(tmp_path / "vacio"))["ts"].size == 0
+
+
+def test_writer_compacts_its_own_parts(tmp_path):
+    log = events.EventLog(str(tmp_path), max_batch=5, max_wait=0.001, compact_every=3)
+    for i in range(200):
+        log.record(_event(i))
+        if i % 5 == 4:
+            time.sleep(0.005)
+    log.close(10)
+    assert len(glob.glob(os.path.join(tmp_path, events.PART_GLOB))) == 1
+    cols = events.read_parts(str(tmp_path))
+    assert sorted(cols["qid"].tolist()) == sorted(f"q{i}".encode() for i in range(200))
+
+
+def test_manual_compact_keeps_every_event(tmp_path):
+    logs = [events.EventLog(str(tmp_path), max_batch=3, max_wait=0.001, compact_every=0) for _ in range(2)]
+    for i in range(60):
+        for log in logs:
+            log.record(_event(i))
+        time.sleep(0.001)
+    for log in logs:
+        log.close(10)
+    before = len(glob.glob(os.path.join(tmp_path, events.PART_GLOB)))
+    parts, n = events.compact(str(tmp_path))
+    assert (parts, n) == (before, 120)
+    assert events.read_parts(str(tmp_path))["ts"].size == 120
+
+
+def test_question_stats_and_histogram(tmp_path):
+    pytest.importorskip("pandas")
+    import analytics
+
+    batch = [
+        _event(0, "a", elapsed_ms=2000, points=15, bonus=5),
+        _event(1, "a", correct=False, selected=1, elapsed_ms=12000, points=0),
+        _event(2, "b", selected=-1, correct=False, elapsed_ms=31000, points=0),
+    ]
+    events.write_part(str(tmp_path / "events-test.npz"), events.to_columns(batch))
+    df = analytics.load_events(str(tmp_path))
+    stats = analytics.question_stats(df)
+    assert list(stats.index) == ["b", "a"]  # la más difícil primero
+    assert stats.loc["a", "answers"] == 2
+    assert stats.loc["a", "accuracy"] == pytest.approx(0.5)
+    assert stats.loc["a", "bonus_rate"] == pytest.approx(0.5)
+    assert stats.loc["b", "timeout_rate"] == 1.0
+    assert stats.loc["a", "latency_mean"] == pytest.approx(7.0)
+    hist = analytics.latency_histogram(df, bins=3)
+    assert hist.loc["a"].tolist() == [1, 1, 0]
+    assert hist.loc["b"].tolist() == [0, 0, 1]  # pasado el límite cae en el último tramo
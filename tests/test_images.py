@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+
+import images
+
+ENTRY = {
+    "source": "maestro-terra.jpg",
+    "variants": [
+        {"file": "m-760w.c.webp", "format": "webp", "width": 760, "height": 570, "bytes": 30},
+        {"file": "m-260w.a.webp", "format": "webp", "width": 260, "height": 195, "bytes": 10},
+        {"file": "m-380w.b.webp", "format": "webp", "width": 380, "height": 285, "bytes": 20},
+        {"file": "m-380w.d.avif", "format": "avif", "width": 380, "height": 285, "bytes": 15},
+        {"file": "m-260w.e.avif", "format": "avif", "width": 260, "height": 195, "bytes": 8},
+    ],
+}
+
+
+def test_pick_smallest_variant_that_fits():
+    assert images.pick(ENTRY, 300)["file"] == "m-380w.b.webp"
+    assert images.pick(ENTRY, 260, "avif")["file"] == "m-260w.e.avif"
+    assert images.pick(ENTRY, 2000)["file"] == "m-760w.c.webp"  # la más grande
+    assert images.pick(ENTRY, 100, "png") is None
+
+
+def test_srcset_is_sorted_by_width():
+    assert images.srcset(ENTRY, "webp", "/app/static/img") == (
+        "/app/static/img/m-260w.a.webp 260w, /app/static/img/m-380w.b.webp 380w, /app/static/img/m-760w.c.webp 760w"
+    )
+
+
+def test_picture_html_prefers_avif_and_escapes_alt():
+    html = images.picture_html(ENTRY, "/s", "380px", alt='Imagen "Maestro" <Terra>', fallback_width=380)
+    assert html.index('type="image/avif"') < html.index('type="image/webp"')
+    assert '<img src="/s/m-380w.b.webp" width="380" height="285"' in html
+    assert 'alt="Imagen &quot;Maestro&quot; &lt;Terra&gt;"' in html
+    assert "?v=" not in html
+
+
+def test_background_css_has_one_media_rule_per_smaller_width():
+    css = images.background_css(ENTRY, "/s", "body")
+    lines = css.splitlines()
+    assert lines[0].startswith('body { background-image: url("/s/m-760w.c.webp") !important;')
+    assert [line.split(")")[0] for line in lines[1:]] == ["@media (max-width: 380px", "@media (max-width: 260px"]
+    assert 'image-set(url("/s/m-380w.d.avif") type("image/avif"), url("/s/m-380w.b.webp") type("image/webp"))' in css
+
+
+def test_load_manifest_ignores_missing_or_other_versions(tmp_path):
+    assert images.load_manifest(str(tmp_path)) == {}
+    (tmp_path / images.MANIFEST_NAME).write_text(json.dumps({"version": 999, "images": {"x": ENTRY}}))
+    assert images.load_manifest(str(tmp_path)) == {}
+    (tmp_path / images.MANIFEST_NAME).write_text("{roto")
+    assert images.load_manifest(str(tmp_path)) == {}
+
+
+def test_build_is_incremental(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    from PIL import features
+
+    if not features.check("webp"):
+        pytest.skip("Pillow sin soporte WebP")
+    assets, out = tmp_path / "assets", tmp_path / "img"
+    assets.mkdir()
+    Image.new("RGB", (500, 300), (200, 80, 20)).save(assets / "fondo.png")
+    spec = {"fondo": (200, 400, 800), "falta": (100,)}
+
+    entries = images.build(str(assets), str(out), ["webp"], images=spec)
+    assert list(entries) == ["fondo"]
+    assert [(v["width"], v["height"]) for v in entries["fondo"]["variants"]] == [(200, 120), (400, 240), (500, 300)]
+    assert images.load_manifest(str(out)) == entries
+    files = sorted(os.listdir(out))
+
+    (out / "fondo-999w.viejo.webp").write_bytes(b"x")
+    again = images.build(str(assets), str(out), ["webp"], images=spec)
+    assert again == entries
+    assert sorted(os.listdir(out)) == files  # sin regenerar y sin la variante huérfana
+
+    Image.new("RGB", (500, 300), (10, 10, 10)).save(assets / "fondo.png")
+    changed = images.build(str(assets), str(out), ["webp"], images=spec)
+    assert changed["fondo"]["source_hash"] != entries["fondo"]["source_hash"]
+    assert len(os.listdir(out)) == len(files)
@@ -0,0 +1,309 @@
+import csv
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+
+import leaderboard
+
+LEGACY_CSV = (
+    "name,score,rank,timestamp\n"
+    "Juana, 195,Maestro Terra,09/09/2025 at:10:15a.m\n"
+    "Aldo,145,Maestro Terra,09/09/2025 at:10:25a.m\n"
+    "Tati,115,Asesor Senior,09/09/2025 at:2:35p.m\n"
+    "Roto,abc,Aprendiz Terra,09/09/2025 at:10:45a.m\n"
+    "Infinito,inf,Aprendiz Terra,09/09/2025 at:10:55a.m\n"
+)
+
+
+def _legacy_dir(tmp_path):
+    (tmp_path / "leaderboard.csv").write_text(LEGACY_CSV, encoding="utf-8")
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("raw, iso", [
+    ("09/09/2025 at:10:15a.m", "2025-09-09T10:15:00"),
+    ("9/9/2025 at:12:05p.m", "2025-09-09T12:05:00"),
+    ("09/09/2025 at:12:05a.m", "2025-09-09T00:05:00"),
+    ("2025-09-09T14:35:00", "2025-09-09T14:35:00"),
+    ("31/02/2025 at:10:15a.m", ""),
+    ("ayer", ""),
+    (None, ""),
+])
+def test_parse_timestamp(raw, iso):
+    assert leaderboard.parse_timestamp(raw) == iso
+
+
+def test_ensure_migrates_legacy_csv(tmp_path):
+    data_dir = _legacy_dir(tmp_path)
+    board = leaderboard.backend_from_env(data_dir, env={})
+    board.ensure()
+    assert board.count("all") == 3  # "abc" e "inf" se descartan
+    top = board.top(5, "all")
+    assert [(r["name"], r["score"], r["pos"]) for r in top] == [
+        ("Juana", 195, 1), ("Aldo", 145, 2), ("Tati", 115, 3),
+    ]
+    assert top[2]["timestamp"] == "2025-09-09T14:35:00"
+
+
+def test_ensure_is_idempotent(tmp_path):
+    data_dir = _legacy_dir(tmp_path)
+    board = leaderboard.backend_from_env(data_dir, env={})
+    board.ensure()
+    board.ensure()
+    assert board.count("all") == 3
+
+
+def _board_with(tmp_path, scores):
+    board = leaderboard.SqliteLeaderboard(str(tmp_path / "leaderboard.db"))
+    board.ensure()
+    ids = board.add_many([(f"p{i}", s, "", f"2025-09-09T10:{i:02d}:00") for i, s in enumerate(scores)])
+    return board, ids
+
+
+def test_top_and_around_use_the_ranking_order(tmp_path):
+    board, ids = _board_with(tmp_path, [50, 90, 70, 90, 10, 30])
+    assert [r["name"] for r in board.top(3)] == ["p1", "p3", "p2"]  # empate: el más antiguo primero
+    rows = board.around(ids[5], 1)
+    assert [(r["name"], r["pos"]) for r in rows] == [("p0", 4), ("p5", 5), ("p4", 6)]
+    assert [r["name"] for r in board.around(ids[1], 2)] == ["p1", "p3", "p2"]
+    assert board.around(999, 2) == []
+
+
+def test_page(tmp_path):
+    board, _ = _board_with(tmp_path, [50, 90, 70, 90, 10, 30])
+    assert [(r["name"], r["pos"]) for r in board.page(1, size=4)] == [("p5", 5), ("p4", 6)]
+    assert board.page(2, size=4) == []
+
+
+class _RecordingBackend(leaderboard.SqliteLeaderboard):
+    """Anota cada lote y, con `gate`, frena el primero (avisa en `entered`) hasta que se libere."""
+
+    def __init__(self, db_path, gate=None, fail=False):
+        super().__init__(db_path)
+        self.batches = []
+        self.gate = gate
+        self.fail = fail
+        self.entered = threading.Event()
+
+    def add_many(self, entries):
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+            self.gate = None
+        self.batches.append(list(entries))
+        if self.fail:
+            raise sqlite3.OperationalError("database is locked")
+        return super().add_many(entries)
+
+
+def test_score_writer_resolves_futures_with_ids(tmp_path):
+    backend = _RecordingBackend(str(tmp_path / "lb.db"))
+    backend.ensure()
+    writer = leaderboard.ScoreWriter(backend, max_wait=0.01)
+    try:
+        fut = writer.submit("Ana", 120, "Asesor Jr", "2025-09-09T10:00:00")
+        entry_id = fut.result(5)
+        assert backend.around(entry_id, 0)[0]["name"] == "Ana"
+    finally:
+        writer.close(5)
+
+
+def test_score_writer_batches_concurrent_saves(tmp_path):
+    gate = threading.Event()
+    backend = _RecordingBackend(str(tmp_path / "lb.db"), gate=gate)
+    backend.ensure()
+    writer = leaderboard.ScoreWriter(backend, max_batch=50, max_wait=0.01)
+    try:
+        first = writer.submit("p0", 10, "")
+        assert backend.entered.wait(5)  # el escritor ya tomó p0 y espera en gate
+        rest = [writer.submit(f"p{i}", 10 + i, "") for i in range(1, 21)]
+        gate.set()
+        ids = [f.result(5) for f in [first, *rest]]
+    finally:
+        writer.close(5)
+    assert len(set(ids)) == 21
+    assert [len(b) for b in backend.batches] == [1, 20]
+
+
+def test_score_writer_close_flushes_pending(tmp_path):
+    gate = threading.Event()
+    backend = _RecordingBackend(str(tmp_path / "lb.db"), gate=gate)
+    backend.ensure()
+    writer = leaderboard.ScoreWriter(backend, max_wait=0.01)
+    futures = [writer.submit(f"p{i}", i, "") for i in range(5)]
+    gate.set()
+    writer.close(5)
+    assert all(f.done() for f in futures)
+    assert backend.count() == 5
+
+
+def test_score_writer_propagates_errors_and_skips_cancelled(tmp_path):
+    gate = threading.Event()
+    backend = _RecordingBackend(str(tmp_path / "lb.db"), gate=gate, fail=True)
+    backend.ensure()
+    writer = leaderboard.ScoreWriter(backend, max_wait=0.01)
+    try:
+        first = writer.submit("p0", 1, "")
+        assert backend.entered.wait(5)
+        cancelled = writer.submit("p1", 2, "")
+        kept = writer.submit("p2", 3, "")
+        assert cancelled.cancel()
+        gate.set()
+        for fut in (first, kept):
+            with pytest.raises(sqlite3.OperationalError):
+                fut.result(5)
+    finally:
+        writer.close(5)
+    assert [[e[0] for e in b] for b in backend.batches] == [["p0"], ["p2"]]
+
+
+def test_csv_backend_count_matches_rows(tmp_path):
+    board = leaderboard.CsvLeaderboard(os.path.join(_legacy_dir(tmp_path), "leaderboard.csv"))
+    rows = board.top(10, "all")
+    assert board.count("all") == len(rows) == 3
+    assert [r["pos"] for r in rows] == [1, 2, 3]
+    new_id = board.add("Nuevo", 150, "Maestro Terra", "2025-09-09T11:00:00")
+    assert new_id == 6  # número de fila, contando las que no se pueden leer
+    assert [r["name"] for r in board.around(new_id, 1)] == ["Juana", "Nuevo", "Aldo"]
+    assert board.count("all") == 4
+
+
+@pytest.fixture(params=[True, False], ids=["str", "bytes"])
+def redis_board(request):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis(decode_responses=request.param)
+    return leaderboard.RedisLeaderboard(client=client, prefix="test:lb")
+
+
+def test_redis_add_top_around_page_count(redis_board):
+    ids = redis_board.add_many([
+        ("Ana", 50, "Asesor Jr", "2025-09-09T10:00:00"),
+        ("Beto", 90, "Maestro Terra", "2025-09-09T10:01:00"),
+        ("Caro", 70, "Asesor Senior", "2025-09-09T10:02:00"),
+        ("Dani", 90, "Maestro Terra", "2025-09-09T10:03:00"),
+    ])
+    assert ids == [1, 2, 3, 4]
+    assert redis_board.add_many([]) == []
+    top = redis_board.top(2)
+    assert [(r["id"], r["name"], r["score"], r["rank"], r["pos"]) for r in top] == [
+        (2, "Beto", 90, "Maestro Terra", 1), (4, "Dani", 90, "Maestro Terra", 2),
+    ]
+    assert top[0]["timestamp"] == "2025-09-09T10:01:00"
+    assert [(r["name"], r["pos"]) for r in redis_board.around(1, 1)] == [("Caro", 3), ("Ana", 4)]
+    assert redis_board.around(99, 1) == []
+    assert [(r["name"], r["pos"]) for r in redis_board.page(1, size=3)] == [("Ana", 4)]
+    assert redis_board.count() == 4
+    assert redis_board.add("Eli", 95, "Maestro Terra", "2025-09-10T09:00:00") == 5
+    assert redis_board.top(1)[0]["name"] == "Eli"
+
+
+def test_redis_window_sets_expire(redis_board):
+    redis_board.add("Ana", 50, "", "2025-09-09T10:00:00")
+    assert redis_board.r.ttl("test:lb:rank:day:2025-09-09") > 0
+    assert redis_board.r.ttl("test:lb:rank:week:2025-W37") > 0
+    assert redis_board.r.ttl("test:lb:rank") == -1
+
+
+PARITY_ENTRIES = [
+    # mismo puntaje y mismo segundo: desempata el id
+    ("p0", 80, "", "2025-09-08T09:00:00"),
+    ("p1", 80, "", "2025-09-08T09:00:00"),
+    ("p2", 80, "", "2025-09-07T23:59:59"),  # domingo: semana anterior
+    ("p3", 120, "", "2025-09-10T12:00:00"),
+    ("p4", 60, "", "2025-09-10T08:30:00"),
+    ("p5", 120, "", "2025-09-10T11:59:00"),
+    ("p6", 0, "", "2025-09-10T13:00:00"),
+    ("p7", 60, "", "2025-09-01T10:00:00"),
+    ("p8", 80, "", "2025-09-10T07:00:00"),
+]
+
+
+@pytest.mark.parametrize("window", leaderboard.WINDOWS)
+def test_redis_matches_sqlite_ordering(tmp_path, redis_board, window):
+    sqlite_board = leaderboard.SqliteLeaderboard(str(tmp_path / "lb.db"))
+    sqlite_board.ensure()
+    assert sqlite_board.add_many(PARITY_ENTRIES) == redis_board.add_many(PARITY_ENTRIES)
+    now = datetime(2025, 9, 10, 18, 0)
+
+    def view(rows):
+        return [(r["id"], r["name"], r["score"], r["timestamp"], r["pos"]) for r in rows]
+
+    assert redis_board.count(window, now) == sqlite_board.count(window, now)
+    assert view(redis_board.top(20, window, now)) == view(sqlite_board.top(20, window, now))
+    for page_no in range(3):
+        assert view(redis_board.page(page_no, 3, window, now)) == view(sqlite_board.page(page_no, 3, window, now))
+    for entry_id in range(1, len(PARITY_ENTRIES) + 1):
+        assert view(redis_board.around(entry_id, 2, window, now)) == view(sqlite_board.around(entry_id, 2, window, now))
+
+
+def test_windows_after_add(tmp_path):
+    board = leaderboard.backend_from_env(_legacy_dir(tmp_path), env={})
+    board.ensure()
+    now = datetime(2025, 9, 10, 12, 0)
+    new_id = board.add("Nuevo", 150, "Maestro Terra", now.isoformat(timespec="seconds"))
+    assert board.count("day", now) == 1
+    assert board.count("week", now) == 4  # 2025-09-09 y 2025-09-10 son de la misma semana ISO
+    assert board.count("week", datetime(2025, 9, 15)) == 0
+    assert [(r["name"], r["pos"]) for r in board.around(new_id, 1, "day", now)] == [("Nuevo", 1)]
+    assert board.around(1, 1, "day", now) == []  # Juana no jugó ese día
+    with pytest.raises(ValueError):
+        board.top(5, "month")
+
+
+def test_ensure_never_archives_what_it_just_migrated(tmp_path):
+    data_dir = _legacy_dir(tmp_path)
+    board = leaderboard.backend_from_env(data_dir, env={"LEADERBOARD_ARCHIVE_WEEKS": "1"})
+    board.ensure()
+    assert board.count("all") == 3
+    assert not os.path.exists(os.path.join(data_dir, "archive"))
+
+
+@pytest.mark.parametrize("raw, weeks", [(None, 0), ("0", 0), ("12", 12), ("-3", 0), ("x", 0)])
+def test_archive_weeks_defaults_to_off(tmp_path, raw, weeks):
+    env = {} if raw is None else {"LEADERBOARD_ARCHIVE_WEEKS": raw}
+    assert leaderboard.backend_from_env(str(tmp_path), env=env).keep_weeks == weeks
+
+
+def test_archive_old_moves_old_weeks(tmp_path):
+    board = leaderboard.SqliteLeaderboard(str(tmp_path / "lb.db"))
+    board.ensure()
+    board.add_many([
+        ("viejo", 10, "", "2025-08-01T10:00:00"),
+        ("viejo2", 20, "", "2025-08-02T10:00:00"),
+        ("nuevo", 30, "", "2025-09-09T10:00:00"),
+    ])
+    archive = tmp_path / "archive"
+    moved = leaderboard.archive_old(board.db_path, str(archive), 2, now=datetime(2025, 9, 10))
+    assert moved == 2
+    assert [r["name"] for r in board.top(10)] == ["nuevo"]
+    with open(archive / "leaderboard-2025-W31.csv", newline="", encoding="utf-8") as f:
+        assert [r["name"] for r in csv.DictReader(f)] == ["viejo2", "viejo"]
+
+
+def test_archive_old_does_not_duplicate_after_a_failed_delete(tmp_path):
+    board = leaderboard.SqliteLeaderboard(str(tmp_path / "lb.db"))
+    board.ensure()
+    board.add_many([("viejo", 10, "", "2025-08-01T10:00:00"), ("viejo2", 20, "", "2025-08-02T10:00:00")])
+    archive = tmp_path / "archive"
+    week_csv = archive / "leaderboard-2025-W31.csv"
+    now = datetime(2025, 9, 10)
+
+    conn = leaderboard.connect(board.db_path)
+    conn.execute("CREATE TRIGGER no_delete BEFORE DELETE ON scores BEGIN SELECT RAISE(ABORT, 'sin lugar'); END")
+    with pytest.raises(sqlite3.IntegrityError):
+        leaderboard.archive_old(board.db_path, str(archive), 2, now=now)
+    assert board.count() == 2  # el DELETE no se confirmó
+    assert week_csv.exists()  # pero el CSV ya estaba escrito
+
+    conn.execute("DROP TRIGGER no_delete")
+    conn.close()
+    assert leaderboard.archive_old(board.db_path, str(archive), 2, now=now) == 2
+    board.add("otro", 5, "", "2025-08-03T10:00:00")
+    assert leaderboard.archive_old(board.db_path, str(archive), 2, now=now) == 1
+    with open(week_csv, newline="", encoding="utf-8") as f:
+        assert [r["name"] for r in csv.DictReader(f)] == ["viejo2", "viejo", "otro"]
+    assert board.count() == 0
+    assert os.listdir(archive) == ["leaderboard-2025-W31.csv"]
@@ -0,0 +1,97 @@
+import re
+import urllib.error
+import urllib.request
+
+import pytest
+
+import metrics
+
+SAMPLE_RE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? -?[0-9.e+-]+$')
+
+
+def _samples(text):
+    out = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            assert re.match(r"^# (HELP|TYPE) terra_[a-z_]+ .+$", line), line
+            continue
+        assert SAMPLE_RE.match(line), line
+        name, value = line.rsplit(" ", 1)
+        out[name] = float(value)
+    return out
+
+
+def test_histogram_buckets_are_cumulative():
+    reg = metrics.Registry()
+    for s in (0.0005, 0.003, 0.003, 0.2, 30.0):
+        reg.observe("script", s)
+    samples = _samples(reg.render())
+    assert samples['terra_phase_seconds_bucket{phase="script",le="0.001"}'] == 1
+    assert samples['terra_phase_seconds_bucket{phase="script",le="0.005"}'] == 3
+    assert samples['terra_phase_seconds_bucket{phase="script",le="0.25"}'] == 4
+    assert samples['terra_phase_seconds_bucket{phase="script",le="10.0"}'] == 4
+    assert samples['terra_phase_seconds_bucket{phase="script",le="+Inf"}'] == 5
+    assert samples['terra_phase_seconds_count{phase="script"}'] == 5
+    assert samples['terra_phase_seconds_sum{phase="script"}'] == pytest.approx(30.2065)
+
+
+def test_counters_gauges_and_startup():
+    reg = metrics.Registry()
+    reg.payload("css", 100)
+    reg.payload("css", 20)
+    reg.rerun("s1")
+    reg.rerun("s1")
+    reg.rerun("s2")
+    reg.rerun("s1", "timer")
+    reg.startup("imports", 0.5)
+    reg.startup("imports", 9.0)  # once=True: queda el primero
+    reg.startup("first_landing", 1.25, once=False)
+    samples = _samples(reg.render())
+    assert samples['terra_payload_bytes_total{phase="css"}'] == 120
+    assert samples['terra_reruns_total{kind="full"}'] == 3
+    assert samples['terra_reruns_total{kind="timer"}'] == 1
+    assert samples["terra_active_sessions"] == 2
+    assert samples['terra_session_reruns_per_minute{stat="max"}'] == 2
+    assert samples['terra_session_reruns_per_minute{stat="mean"}'] == 1.5
+    assert samples['terra_startup_seconds{step="imports"}'] == 0.5
+    assert samples['terra_startup_seconds{step="first_landing"}'] == 1.25
+
+
+def test_phase_summary():
+    reg = metrics.Registry()
+    for ms in range(1, 101):
+        reg.observe("save_score", ms / 1000)
+    (row,) = reg.phase_summary()
+    assert row["phase"] == "save_score" and row["count"] == 100
+    assert row["mean_ms"] == pytest.approx(50.5)
+    assert row["p50_ms"] == pytest.approx(51)
+    assert row["max_ms"] == pytest.approx(100)
+
+
+def test_inactive_sessions_are_pruned_on_rerun(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(metrics.time, "monotonic", lambda: clock[0])
+    reg = metrics.Registry()
+    for i in range(50):
+        reg.rerun(f"viejo{i}")
+    clock[0] += metrics.ACTIVE_WINDOW_S + metrics.PRUNE_EVERY_S + 1
+    reg.rerun("nuevo")
+    assert list(reg._sessions) == ["nuevo"]
+    assert reg.session_rates() == {"nuevo": 1.0}
+
+
+def test_serve_exposes_metrics():
+    reg = metrics.Registry()
+    reg.observe("script", 0.01)
+    server = metrics.serve(reg, 0)
+    assert server is not None
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base}/metrics", timeout=5) as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert 'terra_phase_seconds_count{phase="script"} 1' in resp.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{base}/otra", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,271 @@
+import csv
+import os
+import random
+
+import pytest
+
+import questions
+
+ROWS = [
+    ["question", "option1", "option2", "option3", "option4", "answer_index", "category"],
+    ["¿Cuál es la misión de Terraloteos?", "a", "b", "", "", "0", ""],
+    ["¿Qué es una cuota?", "a", "b", "c", "", "2", "Institucional"],
+    ["Pregunta sin opciones", "", "", "", "", "0", ""],
+    ["", "a", "b", "", "", "0", ""],
+    ["Índice con texto", "a", "b", "", "", "abc", ""],
+    ["Índice vacío", "a", "b", "", "", "", ""],
+    ["Índice infinito", "a", "b", "", "", "inf", ""],
+    ["Índice enorme", "a", "b", "", "", "1e400", ""],
+    ["Índice nan", "a", "b", "", "", "nan", ""],
+    ["Índice negativo", "a", "b", "", "", "-1", ""],
+    ["Índice fuera de rango", "a", "b", "", "", "2", ""],
+    ["Índice con decimales", "a", "b", "", "", "1.7", "comercial"],
+    ["  Espacios y PLUSVALIA  ", "a", "b", "", "", " 1 ", ""],
+]
+
+
+@pytest.fixture
+def bank_csv(tmp_path):
+    path = tmp_path / "preguntas.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(ROWS)
+    return str(path)
+
+
+def test_permutation_puts_institutional_first():
+    qs = [questions.Question(str(i), f"q{i}", ("a", "b"), 0, "", i % 3 == 0) for i in range(10)]
+    bank = questions.QuestionBank(qs)
+    order = bank.permutation(random.Random(1))
+    assert order.typecode == "H"
+    assert sorted(order) == list(range(10))
+    assert set(order[:4]) == {0, 3, 6, 9}
+
+
+def test_question_id_ignores_surrounding_spaces():
+    assert questions.question_id("  ¿Qué es?\n") == questions.question_id("¿Qué es?")
+    assert len(questions.question_id("x")) == 12
+
+
+def _write_rows(path, rows, mtime):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows([ROWS[0], *rows])
+    os.utime(path, (mtime, mtime))
+
+
+def test_bank_watcher_reloads_and_keeps_last_good_bank(tmp_path):
+    path = tmp_path / "preguntas.csv"
+    _write_rows(path, [["Una", "a", "b", "", "", "0", ""]], 1_000)
+    watcher = questions.BankWatcher(str(path), interval=60, prefer_pandas=False)
+    try:
+        first = watcher.bank
+        assert watcher.reload() is False  # sin cambios
+        _write_rows(path, [["Una", "a", "b", "", "", "0", ""], ["Dos", "a", "b", "", "", "1", ""]], 2_000)
+        assert watcher.reload() is True
+        assert [q.question for q in watcher.bank] == ["Una", "Dos"]
+        assert len(first) == 1  # las sesiones abiertas siguen con su banco
+
+        _write_rows(path, [["Rota", "", "", "", "", "0", ""]], 3_000)
+        assert watcher.reload() is False
+        assert len(watcher.bank) == 2
+        assert watcher.last_errors == ("fila 2: no tiene opciones",)
+    finally:
+        watcher.stop()
+
+
+def test_bank_watcher_survives_unreadable_csv(tmp_path):
+    path = tmp_path / "preguntas.csv"
+    path.mkdir()  # open() falla con IsADirectoryError
+    watcher = questions.BankWatcher(str(path), interval=60, prefer_pandas=False)
+    try:
+        assert len(watcher.bank) == 0
+        assert watcher.last_errors and watcher.last_errors[0].startswith("error al cargar")
+    finally:
+        watcher.stop()
+
+
+def test_pack_round_trip(bank_csv):
+    bank = questions.load_bank_streaming(bank_csv)
+    pack = questions.pack_path_for(bank_csv)
+    questions.write_pack(bank.questions, pack, questions.source_hash(bank_csv))
+    packed = questions.load_bank_auto(bank_csv, prefer_pandas=False)
+    assert isinstance(packed.questions, questions.PackedQuestions)
+    assert list(packed.questions) == list(bank.questions)
+    assert packed.institutional_idx == bank.institutional_idx
+
+
+def test_stale_pack_is_ignored(bank_csv):
+    bank = questions.load_bank_streaming(bank_csv)
+    pack = questions.pack_path_for(bank_csv)
+    questions.write_pack(bank.questions, pack, questions.source_hash(bank_csv))
+    with open(bank_csv, "a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(["Nueva", "a", "b", "", "", "1", ""])
+    fresh = questions.load_bank_auto(bank_csv, prefer_pandas=False)
+    assert not isinstance(fresh.questions, questions.PackedQuestions)
+    assert fresh[len(fresh) - 1].question == "Nueva"
+
+
+@pytest.mark.parametrize("cut", [1, 10, 40])
+def test_truncated_pack_falls_back_to_csv(bank_csv, cut):
+    bank = questions.load_bank_streaming(bank_csv)
+    pack = questions.pack_path_for(bank_csv)
+    questions.write_pack(bank.questions, pack, questions.source_hash(bank_csv))
+    with open(pack, "rb") as f:
+        data = f.read()
+    with open(pack, "wb") as f:
+        f.write(data[:-cut])
+    with pytest.raises(ValueError):
+        questions.load_pack(pack)
+    fallback = questions.load_bank_auto(bank_csv, prefer_pandas=False)
+    assert list(fallback.questions) == list(bank.questions)
+
+
+def test_locked_pack_is_left_untouched(bank_csv, monkeypatch, capsys):
+    bank = questions.load_bank_streaming(bank_csv)
+    pack = questions.pack_path_for(bank_csv)
+    questions.write_pack(bank.questions, pack, questions.source_hash(bank_csv))
+    with open(pack, "rb") as f:
+        before = f.read()
+
+    def locked(src, dst):  # como en Windows con el pack mapeado por la app
+        raise PermissionError(13, "Access is denied", dst)
+
+    monkeypatch.setattr(questions.os, "replace", locked)
+    with pytest.raises(PermissionError, match="abierto por otro proceso"):
+        questions.write_pack(bank.questions[:1], pack, b"\0" * 32)
+    with open(pack, "rb") as f:
+        assert f.read() == before
+    assert not [p for p in os.listdir(os.path.dirname(pack)) if p.endswith(".tmp")]
+    assert questions.main(["build-pack", "--csv", bank_csv]) == 1
+    assert "cerrá la app" in capsys.readouterr().err
+
+
+def test_pandas_and_csv_parsers_agree(bank_csv):
+    pytest.importorskip("pandas")
+    by_pandas = questions.load_bank(bank_csv)
+    by_csv = questions.load_bank_streaming(bank_csv)
+    assert list(by_pandas.questions) == list(by_csv.questions)
+    assert by_pandas.errors == by_csv.errors
+    assert by_pandas.institutional_idx == by_csv.institutional_idx
+
+
+def test_invalid_rows_are_reported_not_raised(bank_csv):
+    bank = questions.load_bank_streaming(bank_csv)
+    assert len(bank) == 4
+    assert "fila 8: answer_index fuera de rango" in bank.errors  # inf
+    assert "fila 9: answer_index fuera de rango" in bank.errors  # 1e400
+    assert "fila 10: answer_index vacío o no numérico" in bank.errors  # nan
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("inf", (None, "answer_index fuera de rango")),
+    ("-inf", (None, "answer_index fuera de rango")),
+    ("1e400", (None, "answer_index fuera de rango")),
+    ("nan", (None, "answer_index vacío o no numérico")),
+])
+def test_row_to_question_non_finite_index(raw, expected):
+    row = {"question": "q", "option1": "a", "option2": "b", "answer_index": raw}
+    assert questions._row_to_question(row, None, questions.Classifier()) == expected
+
+
+def _categorized_bank():
+    qs = [
+        questions.Question(str(i), f"q{i}", ("a", "b"), 0, cat, cat == "Institucional")
+        for i, cat in enumerate(["Institucional"] * 10 + ["Comercial"] * 30 + ["Legal"] * 60)
+    ]
+    return questions.QuestionBank(qs)
+
+
+@pytest.mark.parametrize("strategy", sorted(questions.SAMPLING_STRATEGIES))
+def test_sampling_strategies_pick_k_distinct(strategy):
+    bank = _categorized_bank()
+    order = bank.sample(20, strategy, random.Random(3))
+    assert len(order) == len(set(order)) == 20
+    assert all(0 <= i < len(bank) for i in order)
+
+
+def test_sample_institutional_first():
+    bank = _categorized_bank()
+    order = bank.sample(12, "institutional_first", random.Random(3))
+    assert sorted(order[:10]) == list(bank.institutional_idx)
+    assert not any(bank[i].institutional for i in order[10:])
+
+
+def test_sample_stratified_is_proportional():
+    bank = _categorized_bank()
+    order = bank.sample(20, "stratified", random.Random(3))
+    by_category = {}
+    for i in order:
+        by_category[bank[i].category] = by_category.get(bank[i].category, 0) + 1
+    assert by_category == {"Institucional": 2, "Comercial": 6, "Legal": 12}
+
+
+def test_sample_whole_bank():
+    bank = _categorized_bank()
+    assert sorted(bank.sample(0, "stratified", random.Random(3))) == list(range(len(bank)))
+    assert sorted(bank.sample(500, "institutional_first", random.Random(3))) == list(range(len(bank)))
+
+
+@pytest.mark.parametrize("sizes, k, expected", [
+    ({"a": 10, "b": 30, "c": 60}, 10, {"a": 1, "b": 3, "c": 6}),
+    ({"a": 1, "b": 1, "c": 1}, 2, {"a": 1, "b": 1, "c": 0}),
+    ({"a": 1, "b": 50}, 10, {"a": 0, "b": 10}),
+    ({}, 5, {}),
+])
+def test_allocate(sizes, k, expected):
+    assert questions._allocate(sizes, k) == expected
+
+
+@pytest.mark.parametrize("text, folded", [
+    ("Misión", "mision"),
+    ("PLUSVALÍA", "plusvalia"),
+    ("¿Año?", "¿ano?"),
+    ("Über", "uber"),
+    ("é", "e"),  # ya descompuesto
+    ("Nguyễn", "nguyen"),  # fuera de Latin-1
+    ("ÀÉÎÕÜÇÑÿ ¿¡ºª", "aeioucny ¿¡ºª"),
+    ("ascii Only", "ascii only"),
+    ("", ""),
+])
+def test_fold(text, folded):
+    assert questions.fold(text) == folded
+
+
+def test_classifier_is_accent_and_case_insensitive():
+    classify = questions.Classifier(["misión", "Plusvalia"])
+    assert classify("¿Cuál es la MISION?")
+    assert classify("La plusvalía del lote")
+    assert classify("La PLUSVALÍA del lote")
+    assert not classify("Nada que ver")
+    assert classify("Nada que ver", "  Institucional ")
+    assert classify("Nada que ver", "ÍNST")
+    assert not classify("", "")
+
+
+def test_default_classifier_matches_the_original_rule():
+    # la regla de antes: "inst..." en la categoría o algún término en minúsculas
+    terms = [t.lower() for t in questions.INSTITUTIONAL_TERMS]
+    texts = [
+        "¿Cuál es la misión de la empresa?", "¿Qué VISIÓN tiene Terraloteos?", "Beneficios del plan",
+        "¿Qué es una cuota?", "Rentabilidad esperada", "Dónde quedan las oficinas", "Nada que ver",
+        "Terraza con vista", "Valores de referencia",
+    ]
+    for text in texts:
+        assert questions._is_institutional(text, "") == any(t in text.lower() for t in terms), text
+
+
+def test_classifier_fingerprint_invalidates_pack(bank_csv):
+    default = questions.Classifier()
+    other = questions.Classifier(["cuota"])
+    assert questions.source_hash(bank_csv, default) != questions.source_hash(bank_csv, other)
+    bank = questions.load_bank_streaming(bank_csv, classifier=default)
+    questions.write_pack(bank.questions, questions.pack_path_for(bank_csv), questions.source_hash(bank_csv, default))
+    reloaded = questions.load_bank_auto(bank_csv, prefer_pandas=False, classifier=other)
+    assert not isinstance(reloaded.questions, questions.PackedQuestions)
+    assert [q.question for q in reloaded.questions if q.institutional] == [
+        "¿Qué es una cuota?",  # por la categoría y por el término
+    ]
+
+
+def test_latin1_fold_matches_nfd_fold():
+    for cp in range(256):
+        assert questions.fold(chr(cp) + "é") == questions._fold_nfd(chr(cp) + "é"), hex(cp)
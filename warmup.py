@@ -0,0 +1,163 @@
+"""
+Arranque en frío: precalentado y tiempos.
+
+Dentro de la app, `start` corre los pasos de precalentado (banco de
+preguntas, assets, ranking, escritor, registro de respuestas) en un hilo de
+fondo apenas arranca el primer rerun, así la portada no los espera y el
+primer "Responder" o "Guardar" ya los encuentra listos. Cada paso informa su
+duración (ver metrics.Registry.startup).
+
+Antes de levantar el servidor conviene dejar listo lo que persiste en disco:
+
+    python warmup.py && streamlit run app.py
+
+compila el pack de preguntas si está desactualizado, genera las variantes
+optimizadas de las imágenes (images.py, si hay Pillow), migra/crea la base
+del ranking, arma data/difficulty.json desde el registro si falta, une las
+partes sueltas del registro de respuestas e informa cuánto tardan los
+imports pesados.
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Sequence
+
+log = logging.getLogger(__name__)
+
+Steps = Dict[str, Callable[[], object]]
+
+
+def run_steps(steps: Steps, record: Callable[[str, float], None] | None = None) -> Dict[str, float]:
+    """Corre los pasos en orden; un paso que falla se informa y no corta los demás."""
+    timings: Dict[str, float] = {}
+    for name, step in steps.items():
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            log.exception("warmup: falló %s", name)
+            continue
+        timings[name] = time.perf_counter() - t0
+        if record is not None:
+            record(name, timings[name])
+    return timings
+
+
+def start(steps: Steps, record: Callable[[str, float], None] | None = None) -> threading.Thread:
+    """run_steps en un hilo de fondo."""
+    thread = threading.Thread(target=run_steps, args=(steps, record), name="terra-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def time_import(module: str) -> float:
+    """Segundos que tarda importar `module` (0 si ya estaba importado)."""
+    if module in sys.modules:
+        return 0.0
+    t0 = time.perf_counter()
+    importlib.import_module(module)
+    return time.perf_counter() - t0
+
+
+# ==========================
+# CLI (antes del deploy)
+# ==========================
+def _build_pack(csv_path: str) -> str:
+    import questions
+
+    pack_path = questions.pack_path_for(csv_path)
+    classifier = questions.default_classifier()
+    if os.path.exists(pack_path):
+        try:
+            fmt, _count, src = questions.read_pack_header(pack_path)
+            if fmt == questions.PACK_FORMAT_VERSION and src == questions.source_hash(csv_path, classifier):
+                return "al día"
+        except (OSError, ValueError):
+            pass
+    bank = questions.load_bank_streaming(csv_path, classifier=classifier)
+    questions.write_pack(bank.questions, pack_path, questions.source_hash(csv_path, classifier))
+    return f"compilado ({len(bank)} preguntas)"
+
+
+def _build_images(here: str) -> str:
+    import images
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return "sin Pillow: se usan los originales"
+    entries = images.build(os.path.join(here, "assets"), os.path.join(here, "static", "img"))
+    return f"{sum(len(e['variants']) for e in entries.values())} variantes"
+
+
+def _compact_events(data_dir: str) -> str:
+    import events
+
+    events_dir = os.path.join(data_dir, "events")
+    if not os.path.isdir(events_dir):
+        return "sin registro"
+    parts, n = events.compact(events_dir)
+    return f"{parts} partes -> 1 ({n} eventos)" if parts else "sin cambios"
+
+
+def _seed_difficulty(data_dir: str) -> str:
+    import difficulty
+    import events
+
+    path = os.path.join(data_dir, "difficulty.json")
+    events_dir = os.path.join(data_dir, "events")
+    if os.path.exists(path) or not os.path.isdir(events_dir):
+        return "sin cambios"
+    cols = events.read_parts(events_dir)
+    stats = difficulty.DifficultyStats()
+    stats.seed(cols["qid"], cols["correct"], cols["elapsed_ms"])
+    stats.path = path
+    stats.save()
+    return f"{len(stats)} preguntas"
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(prog="warmup.py", description="Deja listo en disco lo que usa el arranque")
+    parser.add_argument("--data-dir", default=os.environ.get("TERRA_DATA_DIR") or os.path.join(here, "data"))
+    parser.add_argument("--imports", default="streamlit,pandas,numpy",
+                        help="módulos cuyo import se mide (separados por coma)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    import leaderboard
+
+    csv_path = os.path.join(args.data_dir, "preguntas.csv")
+    notes: Dict[str, str] = {}
+    steps: Steps = {
+        "question_pack": lambda: notes.__setitem__("question_pack", _build_pack(csv_path)),
+        "images": lambda: notes.__setitem__("images", _build_images(here)),
+        "leaderboard": lambda: leaderboard.backend_from_env(args.data_dir).ensure(),
+        "difficulty": lambda: notes.__setitem__("difficulty", _seed_difficulty(args.data_dir)),
+        # lo que quedó sin compactar (por ejemplo, de un proceso que se cortó)
+        "events": lambda: notes.__setitem__("events", _compact_events(args.data_dir)),
+    }
+    timings = run_steps(steps)
+    imports = {}
+    for module in filter(None, (m.strip() for m in args.imports.split(","))):
+        try:
+            imports[module] = round(time_import(module) * 1000, 1)
+        except ImportError:
+            imports[module] = None
+    report = {
+        "steps_ms": {k: round(v * 1000, 1) for k, v in timings.items()},
+        "notes": notes,
+        "import_ms": imports,
+        "failed": sorted(set(steps) - set(timings)),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())